@@ -1,22 +1,120 @@
 # database.py
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # Por defecto usamos SQLite en ./data/nortsur.db
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/nortsur.db")
 
-connect_args = {}
-if DATABASE_URL.startswith("sqlite"):
-    connect_args = {"check_same_thread": False}
-
-engine = create_engine(
-    DATABASE_URL,
-    connect_args=connect_args,
+# URL del engine async (rutas /bot/*). Por defecto la misma base con el
+# driver async equivalente: sqlite -> aiosqlite.
+ASYNC_DATABASE_URL = os.getenv(
+    "ASYNC_DATABASE_URL",
+    DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if DATABASE_URL.startswith("sqlite://")
+    else DATABASE_URL,
 )
 
+# Perfil de SQLite:
+# - "produccion": WAL + pragmas para que el bot y el back office puedan
+#   escribir a la vez sin "database is locked" (lectores no bloquean al escritor).
+# - "basico": como antes (rollback journal, defaults de SQLite).
+SQLITE_PERFIL = os.getenv("SQLITE_PERFIL", "produccion")
+
+
+def _pragmas_produccion() -> dict[str, str]:
+    return {
+        "journal_mode": "WAL",
+        # Con WAL, NORMAL sigue siendo consistente ante caídas del proceso;
+        # sólo un corte de luz puede perder las últimas transacciones.
+        "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),
+        # Espera (ms) al lock de escritura en vez de fallar al instante
+        "busy_timeout": os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"),
+        "foreign_keys": "ON",
+        # Negativo = KiB (64 MiB de cache de páginas por conexión)
+        "cache_size": str(-int(os.getenv("SQLITE_CACHE_KB", "65536"))),
+        "mmap_size": os.getenv("SQLITE_MMAP_BYTES", str(256 * 1024 * 1024)),
+        "temp_store": "MEMORY",
+    }
+
+
+PERFILES_SQLITE = {
+    "basico": dict,
+    "produccion": _pragmas_produccion,
+}
+
+
+def _es_sqlite_en_memoria(url: str) -> bool:
+    return url in ("sqlite://", "sqlite:///:memory:") or "mode=memory" in url
+
+
+def _pool_kwargs(url: str) -> dict:
+    # SQLite en memoria usa un pool propio de una conexión: no se toca
+    if url.startswith("sqlite") and _es_sqlite_en_memoria(url):
+        return {}
+    return {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    }
+
+
+def _registrar_pragmas(eng: Engine, perfil: str) -> None:
+    """
+    Aplica los pragmas del perfil en cada conexión nueva del pool.
+    """
+    if perfil not in PERFILES_SQLITE:
+        raise ValueError(f"SQLITE_PERFIL inválido: {perfil} (opciones: {', '.join(PERFILES_SQLITE)})")
+    pragmas = PERFILES_SQLITE[perfil]()
+    if not pragmas:
+        return
+
+    @event.listens_for(eng, "connect")
+    def _aplicar_pragmas(dbapi_conn, _record):
+        cur = dbapi_conn.cursor()
+        try:
+            for nombre, valor in pragmas.items():
+                cur.execute(f"PRAGMA {nombre}={valor}")
+        finally:
+            cur.close()
+
+
+def crear_engine(url: str = DATABASE_URL, perfil: str = SQLITE_PERFIL) -> Engine:
+    """
+    Arma el engine. Para SQLite aplica los pragmas del perfil en cada
+    conexión nueva del pool; para otras bases sólo el tamaño del pool.
+    """
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args = {"check_same_thread": False}
+
+    eng = create_engine(url, connect_args=connect_args, **_pool_kwargs(url))
+    if url.startswith("sqlite"):
+        _registrar_pragmas(eng, perfil)
+    return eng
+
+
+def crear_engine_async(url: str = ASYNC_DATABASE_URL, perfil: str = SQLITE_PERFIL) -> AsyncEngine:
+    """
+    Igual que crear_engine() pero async (aiosqlite para SQLite); los pragmas
+    se registran sobre el engine sync subyacente.
+    """
+    eng = create_async_engine(url, **_pool_kwargs(url))
+    if url.startswith("sqlite"):
+        _registrar_pragmas(eng.sync_engine, perfil)
+    return eng
+
+
+engine = crear_engine()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+async_engine = crear_engine_async()
+# expire_on_commit=False: después del commit no hay lazy-load implícito en async
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 
@@ -26,3 +124,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,11 +1,45 @@
 # importar_datos.py
+"""
+Importación / re-sincronización de clientes y productos.
+
+Es un pipeline por chunks: se leen N filas, se buscan las existentes por
+clave natural (numero_cliente / codigo) en una sola query, y se hace
+INSERT / UPDATE masivo (executemany) con un commit por chunk.
+
+Acepta los CSV convertidos a mano (clientes_nortsur.csv / productos_nortsur.csv)
+o directamente los export de ventas (lista_clientes.txt /
+lista_general_productos.txt). Cada fila guarda un hash de su contenido
+(hash_contenido): si el archivo trae la fila igual que la última vez, no se
+escribe nada.
+
+Uso: python importar_datos.py [clientes.csv|.txt] [productos.csv|.txt]
+"""
 import csv
+import hashlib
+import re
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from typing import Iterable, Iterator
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.orm import Session
 
 from database import SessionLocal, engine
 import models
+from services.busqueda import crear_indices_fts
+from services.catalogo import bump_version
+from services.clientes_services import telefonos_de
+from services.secuencias import NUMERO_CLIENTE, ajustar_minimo, siguiente
+from utils.geo import columnas_geo
+from utils.texto import normalizar_texto
 
-# Aseguramos tablas
+# Aseguramos tablas (+ índices FTS, que se actualizan por triggers al importar)
 models.Base.metadata.create_all(bind=engine)
+crear_indices_fts(engine)
 
 
 def safe_int(value: str | None) -> int | None:
@@ -66,6 +100,7 @@ def to_descuento(value: str | None) -> float | None:
 def get_dict_reader(csv_path: str):
     """
     Abre el CSV, detecta el delimitador (; , o TAB) y devuelve un DictReader.
+    Cada fila trae además "_linea": el renglón del archivo donde empieza.
     """
     with open(csv_path, newline="", encoding="utf-8") as f:
         sample = f.read(4096)
@@ -76,91 +111,623 @@ def get_dict_reader(csv_path: str):
             dialect = csv.excel  # por defecto, coma
 
         reader = csv.DictReader(f, dialect=dialect)
+        linea = 2  # después del encabezado
         for row in reader:
+            row["_linea"] = linea
+            linea = reader.line_num + 1
             yield row
 
 
-def importar_clientes(csv_path: str = "clientes_nortsur.csv"):
+CHUNK_SIZE = 2000
+
+CAMPOS_CLIENTE = (
+    "numero_cliente", "nombre", "direccion", "barrio", "telefono", "vendedor",
+    "descuento_porcentaje", "comentario", "coordenadas", "deuda_centavos", "entrega_info",
+)
+CAMPOS_PRODUCTO = ("codigo", "nombre", "categoria", "presentacion", "precio_centavos")
+
+
+@dataclass
+class ResultadoImportacion:
+    insertados: int = 0
+    actualizados: int = 0
+    sin_cambios: int = 0
+    omitidos: int = 0     # filas sin nombre, o productos sin codigo
+    duplicados: int = 0   # misma clave repetida en el archivo (vale la primera)
+    numerados: int = 0    # clientes sin numero_cliente: se les asignó uno
+    desactivados: int = 0  # productos que ya no están en la lista de precios
+    reactivados: int = 0   # productos desactivados que volvieron a la lista
+    detalle: list[str] = field(default_factory=list)  # una línea por fila salteada o numerada
+
+    @property
+    def salteados(self) -> int:
+        return self.sin_cambios + self.omitidos + self.duplicados
+
+    def __str__(self) -> str:
+        texto = (
+            f"insertados={self.insertados} actualizados={self.actualizados} "
+            f"salteados={self.salteados} (sin cambios={self.sin_cambios}, "
+            f"omitidos={self.omitidos}, duplicados={self.duplicados})"
+        )
+        for nombre in ("numerados", "desactivados", "reactivados"):
+            if getattr(self, nombre):
+                texto += f" {nombre}={getattr(self, nombre)}"
+        return texto
+
+
+def en_chunks(filas: Iterable, size: int = CHUNK_SIZE) -> Iterator[list]:
+    it = iter(filas)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def hash_fila(fila: dict, campos: tuple[str, ...]) -> str:
+    """
+    Hash del contenido importable de una fila: si coincide con el guardado
+    en la última importación, la fila no cambió y no se toca.
+    """
+    partes = []
+    for c in campos:
+        v = fila.get(c)
+        if isinstance(v, (float, Decimal)):
+            v = f"{float(v):g}"
+        partes.append("" if v is None else str(v))
+    return hashlib.sha1("\x1f".join(partes).encode("utf-8")).hexdigest()
+
+
+# ---------------------------------------------------------------------
+# Mapeo fila CSV -> dict de columnas
+# ---------------------------------------------------------------------
+def fila_cliente_csv(row: dict) -> dict:
     """
     Espera columnas:
     id, numero_cliente, nombre, direccion, barrio, telefono,
     vendedor, tiene_descuento, comentario_adicional,
     deuda, tipo_entrega, coordenadas_lat, coordenadas_lng
     """
-    db = SessionLocal()
-    try:
-        for idx, row in enumerate(get_dict_reader(csv_path), start=1):
-            raw_num = row.get("numero_cliente")
-            raw_desc = row.get("tiene_descuento")
-            raw_deuda = row.get("deuda")
-            lat = row.get("coordenadas_lat")
-            lng = row.get("coordenadas_lng")
-
-            # Armamos un solo campo de coordenadas "lat,lng"
-            coords = None
-            if lat or lng:
-                lat_txt = (lat or "").strip()
-                lng_txt = (lng or "").strip()
-                if lat_txt or lng_txt:
-                    coords = f"{lat_txt},{lng_txt}"
-
-            cliente = models.Cliente(
-                numero_cliente=safe_int(raw_num),
-                nombre=(row.get("nombre") or "").strip(),
-                direccion=row.get("direccion") or None,
-                barrio=row.get("barrio") or None,
-                telefono=row.get("telefono") or None,
-                vendedor=row.get("vendedor") or None,
-                descuento_porcentaje=to_descuento(raw_desc),
-                comentario=row.get("comentario_adicional") or None,
-                coordenadas=coords,
-                # deuda del CSV ya viene como entero grande (ej 725400),
-                # lo guardamos tal cual en centavos. Si después vemos que está desfasado,
-                # ajustamos la escala.
-                deuda_centavos=safe_int(raw_deuda) or 0,
-                entrega_info=row.get("tipo_entrega") or None,
-            )
-            db.add(cliente)
+    lat = row.get("coordenadas_lat")
+    lng = row.get("coordenadas_lng")
 
-        db.commit()
-        print("Clientes importados OK")
-    finally:
-        db.close()
+    # Armamos un solo campo de coordenadas "lat,lng"
+    coords = None
+    if lat or lng:
+        lat_txt = (lat or "").strip()
+        lng_txt = (lng or "").strip()
+        if lat_txt or lng_txt:
+            coords = f"{lat_txt},{lng_txt}"
+
+    return {
+        "linea": row.get("_linea"),
+        "numero_cliente": safe_int(row.get("numero_cliente")),
+        "nombre": (row.get("nombre") or "").strip(),
+        "direccion": row.get("direccion") or None,
+        "barrio": row.get("barrio") or None,
+        "telefono": row.get("telefono") or None,
+        "vendedor": row.get("vendedor") or None,
+        "descuento_porcentaje": to_descuento(row.get("tiene_descuento")),
+        "comentario": row.get("comentario_adicional") or None,
+        "coordenadas": coords,
+        # deuda del CSV ya viene como entero grande (ej 725400),
+        # lo guardamos tal cual en centavos. Si después vemos que está desfasado,
+        # ajustamos la escala.
+        "deuda_centavos": safe_int(row.get("deuda")) or 0,
+        "entrega_info": row.get("tipo_entrega") or None,
+    }
 
 
-def importar_productos(csv_path: str = "productos_nortsur.csv"):
+def fila_producto_csv(row: dict) -> dict:
     """
     Asumimos columnas algo así:
     codigo, nombre, categoria, presentacion, precio
     (si cambian, ajustamos luego los nombres en row.get)
     """
-    db = SessionLocal()
-    try:
-        for idx, row in enumerate(get_dict_reader(csv_path), start=1):
-            raw_precio = (
-                row.get("precio")
-                or row.get("precio_lista")
-                or row.get("PRECIO")
-                or ""
+    raw_precio = (
+        row.get("precio")
+        or row.get("precio_lista")
+        or row.get("PRECIO")
+        or ""
+    )
+    return {
+        "linea": row.get("_linea"),
+        "codigo": (row.get("codigo") or row.get("CODIGO") or "").strip(),
+        "nombre": (row.get("nombre") or row.get("NOMBRE") or "").strip(),
+        "categoria": row.get("categoria") or row.get("CATEGORIA") or None,
+        "presentacion": row.get("presentacion") or row.get("PRESENTACION") or None,
+        "precio_centavos": to_centavos(raw_precio),
+    }
+
+
+# ---------------------------------------------------------------------
+# Carga masiva (upsert por clave natural), común a todos los formatos
+# ---------------------------------------------------------------------
+def _upsert_chunks(
+    db: Session,
+    modelo,
+    clave: str,
+    campos: tuple[str, ...],
+    filas: Iterable[dict],
+    chunk_size: int,
+    res: ResultadoImportacion,
+    despues_de_escribir=None,
+    sin_clave: list[dict] | None = None,
+) -> set:
+    """
+    Por chunk: una query trae (id, clave, hash) de las filas existentes, y se
+    hace INSERT ... RETURNING / UPDATE por PK masivos sólo de las que cambiaron.
+    `despues_de_escribir(db, insertados, actualizados)` corre antes del commit
+    del chunk, con listas de (id, fila).
+
+    Las filas sin clave van a `sin_clave` si se pasa (el llamador les asigna
+    una); si no, se omiten. Devuelve las claves que trajo el archivo.
+    """
+    tabla = modelo.__table__
+    col_clave = tabla.c[clave]
+    vistos: set = set()
+
+    for chunk in en_chunks(filas, chunk_size):
+        nuevos: dict = {}
+        for fila in chunk:
+            linea = fila.pop("linea", None)
+            k = fila.get(clave)
+            if not fila.get("nombre"):
+                res.omitidos += 1
+                res.detalle.append(f"línea {linea}: sin nombre, no se importó")
+                continue
+            if k in (None, ""):
+                if sin_clave is not None:
+                    sin_clave.append({**fila, "linea": linea})
+                    continue
+                res.omitidos += 1
+                res.detalle.append(f"línea {linea}: '{fila['nombre']}' sin {clave}, no se importó")
+                continue
+            if k in vistos:
+                res.duplicados += 1
+                res.detalle.append(f"línea {linea}: {clave} {k} repetido, '{fila['nombre']}' no se importó")
+                continue
+            vistos.add(k)
+            nuevos[k] = fila
+
+        if not nuevos:
+            continue
+
+        existentes = {
+            k: (id_, h)
+            for id_, k, h in db.execute(
+                select(tabla.c.id, col_clave, tabla.c.hash_contenido).where(col_clave.in_(list(nuevos)))
+            )
+        }
+
+        ahora = datetime.utcnow()
+        a_insertar: list[dict] = []
+        a_actualizar: list[dict] = []
+        for k, fila in nuevos.items():
+            h = hash_fila(fila, campos)
+            actual = existentes.get(k)
+            if actual is None:
+                a_insertar.append({**fila, "hash_contenido": h, "creado_en": ahora, "actualizado_en": ahora})
+            elif actual[1] != h:
+                a_actualizar.append({**fila, "id": actual[0], "hash_contenido": h, "actualizado_en": ahora})
+            else:
+                res.sin_cambios += 1
+
+        insertados: list[tuple[int, dict]] = []
+        if a_insertar:
+            ids = dict(
+                (k, id_)
+                for id_, k in db.execute(
+                    insert(modelo).returning(tabla.c.id, col_clave), a_insertar
+                )
+            )
+            insertados = [(ids[f[clave]], f) for f in a_insertar]
+            res.insertados += len(a_insertar)
+        if a_actualizar:
+            db.execute(update(modelo), a_actualizar)
+            res.actualizados += len(a_actualizar)
+
+        if despues_de_escribir and (insertados or a_actualizar):
+            despues_de_escribir(db, insertados, [(f["id"], f) for f in a_actualizar])
+        db.commit()
+
+    return vistos
+
+
+def _rearmar_telefonos(db: Session, insertados, actualizados) -> None:
+    if actualizados:
+        db.execute(
+            delete(models.ClienteTelefono).where(
+                models.ClienteTelefono.cliente_id.in_([cid for cid, _ in actualizados])
+            )
+        )
+    filas = [
+        {"cliente_id": cid, "telefono": raw, "telefono_normalizado": norm}
+        for cid, f in (*insertados, *actualizados)
+        for raw, norm in telefonos_de(f["telefono"])
+    ]
+    if filas:
+        db.execute(insert(models.ClienteTelefono), filas)
+
+
+def _clave_sin_numero(nombre: str | None, direccion: str | None) -> tuple[str, str]:
+    return normalizar_texto(nombre), normalizar_texto(direccion)
+
+
+def _numerar_sin_clave(db: Session, filas: list[dict], numeros_archivo: set) -> list[dict]:
+    """
+    Asigna numero_cliente a las filas que vienen sin número. Si ya hay un
+    cliente con el mismo nombre y dirección (importado sin número la vez
+    anterior) se reusa el suyo, así recargar el archivo no lo duplica; si no,
+    sale de la secuencia. No reusa números que el archivo trae en otra fila.
+    """
+    existentes: dict[tuple[str, str], list[int]] = defaultdict(list)
+    nombres = list({f["nombre"] for f in filas})
+    for numero, nombre, direccion in db.execute(
+        select(models.Cliente.numero_cliente, models.Cliente.nombre, models.Cliente.direccion)
+        .where(models.Cliente.nombre.in_(nombres), models.Cliente.numero_cliente.is_not(None))
+        .order_by(models.Cliente.numero_cliente)
+    ):
+        if numero not in numeros_archivo:
+            existentes[_clave_sin_numero(nombre, direccion)].append(numero)
+
+    numeradas = []
+    for fila in filas:
+        previos = existentes.get(_clave_sin_numero(fila["nombre"], fila.get("direccion")))
+        numero = previos.pop(0) if previos else siguiente(db, NUMERO_CLIENTE)
+        numeradas.append({**fila, "numero_cliente": numero})
+    return numeradas
+
+
+def cargar_clientes(filas: Iterable[dict], chunk_size: int = CHUNK_SIZE) -> ResultadoImportacion:
+    """
+    Upsert de clientes por numero_cliente. `filas` son dicts con CAMPOS_CLIENTE.
+    Las filas sin numero_cliente se cargan igual, con un número de la secuencia
+    (ver _numerar_sin_clave); cada una queda en res.detalle.
+    """
+    res = ResultadoImportacion()
+    filas = (
+        {
+            **f,
+            **columnas_geo(f.get("coordenadas")),
+        }
+        for f in filas
+    )
+    sin_numero: list[dict] = []
+    with SessionLocal() as db:
+        numeros_archivo = _upsert_chunks(
+            db, models.Cliente, "numero_cliente", CAMPOS_CLIENTE, filas, chunk_size, res,
+            despues_de_escribir=_rearmar_telefonos, sin_clave=sin_numero,
+        )
+        # Los números vienen del archivo: que la API (y los sin número) sigan después del mayor
+        ajustar_minimo(db, NUMERO_CLIENTE)
+        if sin_numero:
+            numeradas = _numerar_sin_clave(db, sin_numero, numeros_archivo)
+            for fila in numeradas:
+                res.detalle.append(
+                    f"línea {fila['linea']}: '{fila['nombre']}' sin numero_cliente, "
+                    f"cargado como N° {fila['numero_cliente']}"
+                )
+            res.numerados += len(numeradas)
+            _upsert_chunks(
+                db, models.Cliente, "numero_cliente", CAMPOS_CLIENTE, numeradas, chunk_size, res,
+                despues_de_escribir=_rearmar_telefonos,
             )
+        db.commit()
+    return res
+
+
+def cargar_productos(filas: Iterable[dict], chunk_size: int = CHUNK_SIZE) -> ResultadoImportacion:
+    """
+    Upsert de productos por codigo. `filas` son dicts con CAMPOS_PRODUCTO.
+    Si hubo cambios, incrementa la versión del catálogo (invalida los caches).
+    """
+    res = ResultadoImportacion()
+    with SessionLocal() as db:
+        _upsert_chunks(
+            db, models.Producto, "codigo", CAMPOS_PRODUCTO, filas, chunk_size, res,
+            despues_de_escribir=lambda db, *_: bump_version(db),
+        )
+    return res
+
 
-            prod = models.Producto(
-                codigo=(row.get("codigo") or row.get("CODIGO") or "").strip(),
-                nombre=(row.get("nombre") or row.get("NOMBRE") or "").strip(),
-                categoria=row.get("categoria") or row.get("CATEGORIA") or None,
-                presentacion=row.get("presentacion")
-                or row.get("PRESENTACION")
-                or None,
-                precio_centavos=to_centavos(raw_precio),
+def _asignar_codigos(
+    filas: Iterable[dict],
+    existentes: dict[tuple, list[str]],
+    ultimo: dict[str, int],
+    res: ResultadoImportacion,
+) -> Iterator[dict]:
+    """
+    Agrega el código a cada fila de la lista de precios a medida que se lee:
+    el que ya tenía (sección + nombre + presentación) o el siguiente libre
+    del prefijo. Las filas de secciones desconocidas se omiten.
+    """
+    for fila in filas:
+        prefijo = fila.pop("seccion")
+        if prefijo is None:
+            res.omitidos += 1
+            res.detalle.append(
+                f"línea {fila['linea']}: '{fila['nombre']}' fuera de las secciones conocidas, no se importó"
             )
-            db.add(prod)
+            continue
+        clave = (prefijo, normalizar_texto(fila["nombre"]), normalizar_texto(fila["presentacion"]))
+        previos = existentes.get(clave)
+        if previos:
+            codigo = previos.pop(0)
+        else:
+            ultimo[prefijo] += 1
+            codigo = f"{prefijo}{ultimo[prefijo]:03d}"
+            res.detalle.append(f"línea {fila['linea']}: '{fila['nombre']}' es nuevo, código {codigo}")
+        yield {**fila, "codigo": codigo}
+
+
+def cargar_lista_productos(filas: Iterable[dict], chunk_size: int = CHUNK_SIZE) -> ResultadoImportacion:
+    """
+    Carga la lista de precios por secciones (leer_lista_productos), que no
+    trae códigos. Dentro de cada sección un producto se reconoce por nombre +
+    presentación normalizados: conserva su código (y sólo se actualiza precio
+    y datos), los nuevos toman el siguiente número libre del prefijo, y los
+    de la sección que ya no están en la lista se desactivan (nunca se pisan
+    con otro producto: pedido_items y los códigos del bot siguen valiendo).
+    """
+    res = ResultadoImportacion()
+    prefijos = {prefijo for _, prefijo, _ in SECCIONES_PRODUCTOS}
+    codigo_seccion = re.compile(r"^(" + "|".join(sorted(prefijos)) + r")(\d+)$")
 
+    with SessionLocal() as db:
+        existentes: dict[tuple, list[str]] = defaultdict(list)
+        activos: dict[str, bool] = {}
+        ultimo: dict[str, int] = defaultdict(int)
+        for codigo, nombre, presentacion, activo in db.execute(
+            select(
+                models.Producto.codigo, models.Producto.nombre,
+                models.Producto.presentacion, models.Producto.activo,
+            ).order_by(models.Producto.codigo)
+        ):
+            m = codigo_seccion.match(codigo or "")
+            if not m:
+                continue  # productos cargados a mano o de otro origen: no se tocan
+            prefijo = m.group(1)
+            existentes[(prefijo, normalizar_texto(nombre), normalizar_texto(presentacion))].append(codigo)
+            activos[codigo] = activo
+            ultimo[prefijo] = max(ultimo[prefijo], int(m.group(2)))
+
+        en_lista = _upsert_chunks(
+            db, models.Producto, "codigo", CAMPOS_PRODUCTO,
+            _asignar_codigos(filas, existentes, ultimo, res), chunk_size, res,
+            despues_de_escribir=lambda db, *_: bump_version(db),
+        )
+
+        reactivar = [c for c in en_lista if activos.get(c) is False]
+        desactivar = [c for c, activo in activos.items() if activo and c not in en_lista]
+        for codigos, activo in ((reactivar, True), (desactivar, False)):
+            if codigos:
+                db.execute(
+                    update(models.Producto)
+                    .where(models.Producto.codigo.in_(codigos))
+                    .values(activo=activo, actualizado_en=datetime.utcnow())
+                )
+        res.reactivados, res.desactivados = len(reactivar), len(desactivar)
+        res.detalle.extend(f"{c} ya no está en la lista: desactivado" for c in desactivar)
+        if reactivar or desactivar:
+            bump_version(db)
         db.commit()
-        print("Productos importados OK")
-    finally:
-        db.close()
+    return res
+
+
+# ---------------------------------------------------------------------
+# lista_clientes.txt (export TSV del equipo de ventas)
+# ---------------------------------------------------------------------
+# Encabezado del export (normalizado) -> columna
+_COLUMNAS_TSV_CLIENTES = {
+    "numero de cliente": "numero_cliente",
+    "nombre": "nombre",
+    "direccion": "direccion",
+    "barrio": "barrio",
+    "telefono": "telefono",
+    "vendedor": "vendedor",
+    "tiene descuento": "tiene_descuento",
+    "comentario adicional": "comentario",
+    "coordenadas": "coordenadas",
+    "deuda": "deuda",
+    "entrega": "entrega_info",
+}
+
+
+def leer_lista_clientes(path: str) -> Iterator[dict]:
+    """
+    Lee lista_clientes.txt: separado por TAB, encabezados con espacios de más,
+    celdas multilínea entre comillas y COORDENADAS como "lat, lng".
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f, delimiter="\t")
+        header = next(reader, None)
+        if header is None:
+            return
+        columnas = [_COLUMNAS_TSV_CLIENTES.get(normalizar_texto(h)) for h in header]
+
+        siguiente_linea = reader.line_num + 1
+        for celdas in reader:
+            linea, siguiente_linea = siguiente_linea, reader.line_num + 1
+            row = {
+                col: " ".join(valor.split())
+                for col, valor in zip(columnas, celdas)
+                if col
+            }
+            coords = row.get("coordenadas") or ""
+            if coords:
+                coords = ",".join(p.strip() for p in coords.split(","))
+
+            yield {
+                "linea": linea,
+                "numero_cliente": safe_int(row.get("numero_cliente")),
+                "nombre": row.get("nombre") or "",
+                "direccion": row.get("direccion") or None,
+                "barrio": row.get("barrio") or None,
+                "telefono": row.get("telefono") or None,
+                "vendedor": row.get("vendedor") or None,
+                "descuento_porcentaje": to_descuento(row.get("tiene_descuento")),
+                "comentario": row.get("comentario") or None,
+                "coordenadas": coords or None,
+                "deuda_centavos": safe_int(row.get("deuda")) or 0,
+                "entrega_info": row.get("entrega_info") or None,
+            }
+
+
+# ---------------------------------------------------------------------
+# lista_general_productos.txt (lista de precios por secciones)
+# ---------------------------------------------------------------------
+# Título de sección (normalizado, empieza con) -> (prefijo de código, categoría).
+# Ordenado del más específico al más general. La lista no trae códigos: al
+# cargarla (cargar_lista_productos) cada producto conserva el código que ya
+# tenía su nombre + presentación en la sección, y los nuevos toman el siguiente
+# libre del prefijo. Agregar o mover renglones no cambia ningún código.
+SECCIONES_PRODUCTOS = [
+    ("combos de panchos", "CB", "COMBO"),
+    ("panificados", "PN", "PAN"),
+    ("aderezos", "AD", "ADEREZO"),
+    ("adicionales", "AC", "ADICIONAL"),
+    ("pan de hamburguesa maxi", "HX", "PAN_HAMBURGUESA_MAXI"),
+    ("pan de hamburguesa", "HB", "PAN_HAMBURGUESA"),
+    ("pan de sandwich", "PS", "PAN_SANDWICH"),
+    ("salsas especiales", "SS", "SALSA_ESPECIAL"),
+    ("productos regionales", "RG", "REGIONAL"),
+]
+
+_PRECIO = re.compile(r"\$\s*([\d.,]+|a consulta)", re.IGNORECASE)
+_OPCION_PAQUETE = re.compile(r"^opci[oó]n en paquetes?\s+(x\s*\d+)", re.IGNORECASE)
+_PARENTESIS = re.compile(r"\s*\([^)]*\)")
+
+
+def _seccion(titulo: str) -> tuple[str, str] | None:
+    t = normalizar_texto(titulo)
+    for inicio, prefijo, categoria in SECCIONES_PRODUCTOS:
+        if t.startswith(inicio):
+            return prefijo, categoria
+    return None
+
+
+def _variantes(texto: str) -> list[tuple[str, str | None, str]]:
+    """
+    "Mayonesa 500ml  $ 1660   /  3kg  $ 5400"
+        -> [("Mayonesa", "500ml", "1660"), ("Mayonesa", "3kg", "5400")]
+    "Chimichurri 500ml  $ 1860" -> [("Chimichurri 500ml", None, "1860")]
+    """
+    partes: list[tuple[str, str]] = []
+    inicio = 0
+    for m in _PRECIO.finditer(texto):
+        desc = texto[inicio:m.start()].strip().lstrip("/").strip()
+        precio = m.group(1)
+        partes.append((desc, "" if precio.lower() == "a consulta" else precio))
+        inicio = m.end()
+
+    if len(partes) == 1:
+        return [(partes[0][0], None, partes[0][1])]
+
+    # Varias presentaciones en un renglón: la primera trae el nombre
+    nombre, _, presentacion = partes[0][0].rpartition(" ")
+    salida = [(nombre.strip(), presentacion, partes[0][1])]
+    salida.extend((nombre.strip(), desc, precio) for desc, precio in partes[1:])
+    return salida
+
+
+def leer_lista_productos(path: str) -> Iterator[dict]:
+    """
+    Lee lista_general_productos.txt:
+
+        COMBOS DE PANCHOS                      <- sección (después de renglón vacío)
+
+        - COMBO PANCHO DOBLE (...)  $ 20700    <- producto
+          Opción en paquetes x3  $ 21500       <- variante "COMBO PANCHO DOBLE x3"
+        - COMBO MEGA PANCHO PARMESANO 44 cm    <- nombre sin precio:
+          (18 panes + ...)  $ 34800               el precio viene en el renglón siguiente
+        - Mayonesa 500ml  $ 1660  /  3kg  $ 5400   <- dos presentaciones
+
+    Cada producto sale con "seccion" (prefijo de código, None si la sección es
+    desconocida) y sin código: lo asigna cargar_lista_productos.
+    """
+    seccion: tuple[str, str] | None = None
+    numero_linea = 0
+    pendiente: str | None = None  # producto cuyo precio está en el renglón siguiente
+    ultimo: str | None = None     # último producto, para las "Opción en paquetes"
+    anterior_vacio = True
+
+    def producto(nombre: str, presentacion: str | None, precio: str) -> dict:
+        prefijo, categoria = seccion or (None, None)
+        return {
+            "linea": numero_linea,
+            "seccion": prefijo,
+            "codigo": None,
+            "nombre": nombre,
+            "categoria": categoria,
+            "presentacion": presentacion,
+            "precio_centavos": to_centavos(precio),
+        }
+
+    with open(path, encoding="utf-8") as f:
+        for numero_linea, linea in enumerate(f, 1):
+            texto = linea.strip()
+            if not texto:
+                anterior_vacio = True
+                pendiente = None
+                continue
+
+            tiene_precio = _PRECIO.search(texto) is not None
+
+            if texto.startswith("-"):
+                cuerpo = texto[1:].strip()
+                if tiene_precio:
+                    for nombre, presentacion, precio in _variantes(cuerpo):
+                        ultimo = nombre
+                        yield producto(nombre, presentacion, precio)
+                    pendiente = None
+                else:
+                    pendiente = ultimo = cuerpo
+            elif linea[:1].isspace():
+                m = _OPCION_PAQUETE.match(texto)
+                if m and ultimo and tiene_precio:
+                    base = _PARENTESIS.sub("", ultimo).strip()
+                    variante = m.group(1).replace(" ", "")
+                    yield producto(f"{base} {variante}", None, _PRECIO.search(texto).group(1))
+                elif pendiente and tiene_precio:
+                    yield producto(pendiente, None, _PRECIO.search(texto).group(1))
+                    pendiente = None
+                # otro renglón indentado: aclaración del producto ("IDEAL PARA SANDWICH")
+            elif anterior_vacio:
+                seccion = _seccion(texto)
+                pendiente = ultimo = None
+            # renglón suelto debajo del título ("10 cm de diámetro"): se ignora
+
+            anterior_vacio = False
+
+
+# ---------------------------------------------------------------------
+# Entradas por archivo
+# ---------------------------------------------------------------------
+def importar_clientes(path: str = "clientes_nortsur.csv") -> ResultadoImportacion:
+    if path.endswith(".txt"):
+        filas = leer_lista_clientes(path)
+    else:
+        filas = (fila_cliente_csv(row) for row in get_dict_reader(path))
+    res = cargar_clientes(filas)
+    print(f"Clientes importados OK: {res}")
+    for linea in res.detalle:
+        print(f"  {linea}")
+    return res
+
+
+def importar_productos(path: str = "productos_nortsur.csv") -> ResultadoImportacion:
+    if path.endswith(".txt"):
+        res = cargar_lista_productos(leer_lista_productos(path))
+    else:
+        res = cargar_productos(fila_producto_csv(row) for row in get_dict_reader(path))
+    print(f"Productos importados OK: {res}")
+    for linea in res.detalle:
+        print(f"  {linea}")
+    return res
 
 
 if __name__ == "__main__":
-    importar_clientes()
-    importar_productos()
+    args = sys.argv[1:]
+    importar_clientes(*args[:1])
+    importar_productos(*args[1:2])
@@ -7,10 +7,19 @@ from fastapi.templating import Jinja2Templates
 
 import models
 from database import engine
-from routers import clientes, pedidos, productos, bot
+from routers import clientes, pedidos, productos, bot, reparto, reportes
+from services.busqueda import crear_indices_fts
+from services.catalogo import inicializar_version
+from services.pedidos_services import verificar_referencia_unica
+from services.secuencias import inicializar_secuencias
 
 # Crear tablas si no existen
 models.Base.metadata.create_all(bind=engine)
+# Índices full-text (FTS5) + triggers de sincronización
+crear_indices_fts(engine)
+inicializar_version(engine)
+inicializar_secuencias(engine)
+verificar_referencia_unica(engine)
 
 app = FastAPI(title="Nortsur Pedidos")
 
@@ -21,6 +30,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # paginación por cursor
 )
 
 templates = Jinja2Templates(directory="templates")
@@ -30,6 +40,8 @@ app.include_router(clientes.router)
 app.include_router(pedidos.router)
 app.include_router(productos.router)  # 👈 importante
 app.include_router(bot.router)  # 👈 NUEVO
+app.include_router(reportes.router)
+app.include_router(reparto.router)
 
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request):
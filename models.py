@@ -1,7 +1,7 @@
 from datetime import datetime
 from sqlalchemy import (
-    Column, Integer, String, DateTime, ForeignKey,
-    BigInteger, Numeric, Text, CheckConstraint, Boolean
+    Column, Integer, String, DateTime, Date, ForeignKey,
+    BigInteger, Numeric, Float, Text, CheckConstraint, Boolean, Index
 )
 from sqlalchemy.orm import relationship
 
@@ -10,9 +10,14 @@ from database import Base  # 👈 IMPORTANTE: usamos el Base del database.py
 
 class Cliente(Base):
     __tablename__ = "clientes"
+    __table_args__ = (
+        # Prefiltro por caja (bounding box) de /clientes/cerca
+        Index("ix_clientes_lat_lng", "lat", "lng"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    numero_cliente = Column(Integer, index=True, nullable=True)
+    # Se asigna con services.secuencias (nunca max()+1)
+    numero_cliente = Column(Integer, index=True, unique=True, nullable=True)
     nombre = Column(String, nullable=False)
     direccion = Column(String, nullable=True)
     barrio = Column(String, nullable=True)
@@ -21,8 +26,15 @@ class Cliente(Base):
     descuento_porcentaje = Column(Numeric(5, 2), nullable=True)
     comentario = Column(Text, nullable=True)
     coordenadas = Column(String, nullable=True)
+    # Derivadas de coordenadas ("lat,lng"), ver utils.geo.columnas_geo:
+    # numéricas para calcular distancias y geohash para buscar por zona
+    lat = Column(Float, nullable=True)
+    lng = Column(Float, nullable=True)
+    geocelda = Column(String(12), nullable=True, index=True)
     deuda_centavos = Column(BigInteger, default=0, nullable=False)
     entrega_info = Column(Text, nullable=True)
+    # Hash de la fila en la última importación (ver importar_datos.hash_fila)
+    hash_contenido = Column(String(40), nullable=True)
     creado_en = Column(DateTime, default=datetime.utcnow)
     activo = Column(Boolean, default=True, nullable=False)
     actualizado_en = Column(
@@ -30,6 +42,27 @@ class Cliente(Base):
     )
 
     pedidos = relationship("Pedido", back_populates="cliente")
+    telefonos = relationship(
+        "ClienteTelefono",
+        back_populates="cliente",
+        cascade="all, delete-orphan",
+        order_by="ClienteTelefono.id",
+    )
+
+
+class ClienteTelefono(Base):
+    """
+    Un número por fila (normalizado) para clientes con varios teléfonos
+    en la misma celda ("11 3320-3652 / 1154659954").
+    """
+    __tablename__ = "cliente_telefonos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=False, index=True)
+    telefono = Column(String, nullable=True)  # fragmento tal como vino
+    telefono_normalizado = Column(String, nullable=False, index=True)
+
+    cliente = relationship("Cliente", back_populates="telefonos")
 
 
 class Producto(Base):
@@ -41,6 +74,8 @@ class Producto(Base):
     categoria = Column(String, nullable=True)
     presentacion = Column(String, nullable=True)
     precio_centavos = Column(BigInteger, nullable=False)
+    # Hash de la fila en la última importación (ver importar_datos.hash_fila)
+    hash_contenido = Column(String(40), nullable=True)
     creado_en = Column(DateTime, default=datetime.utcnow)
     activo = Column(Boolean, default=True, nullable=False)
     actualizado_en = Column(
@@ -50,12 +85,35 @@ class Producto(Base):
     items = relationship("PedidoItem", back_populates="producto")
 
 
+class CatalogoVersion(Base):
+    """
+    Fila única (id=1) con un contador que se incrementa cada vez que cambia
+    el catálogo. Lo usa services.catalogo para invalidar su cache en todos
+    los workers.
+    """
+    __tablename__ = "catalogo_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class Secuencia(Base):
+    """
+    Contadores con nombre (ej "numero_cliente"). Se incrementan con un
+    UPDATE ... RETURNING atómico: O(1) y sin carrera entre altas concurrentes.
+    """
+    __tablename__ = "secuencias"
+
+    nombre = Column(String, primary_key=True)
+    valor = Column(BigInteger, nullable=False, default=0)
+
+
 class Pedido(Base):
     __tablename__ = "pedidos"
 
     id = Column(Integer, primary_key=True, index=True)
-    cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=False)
-    fecha_creacion = Column(DateTime, default=datetime.utcnow, nullable=False)
+    cliente_id = Column(Integer, ForeignKey("clientes.id"), nullable=False, index=True)
+    fecha_creacion = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     canal = Column(String, nullable=False)  # 'whatsapp', 'web', 'manual', etc.
     estado = Column(String, nullable=False, default="pendiente")
 
@@ -65,7 +123,9 @@ class Pedido(Base):
     total_neto_cent = Column(BigInteger, nullable=False, default=0)
 
     observaciones = Column(Text, nullable=True)
-    origen_referencia = Column(String, nullable=True)
+    # Clave de idempotencia del origen (ej "whatsapp:<id de mensaje>"):
+    # un reintento del gateway con la misma clave no crea otro pedido.
+    origen_referencia = Column(String, nullable=True, unique=True, index=True)
 
     creado_en = Column(DateTime, default=datetime.utcnow)
     actualizado_en = Column(
@@ -80,14 +140,24 @@ class Pedido(Base):
             "estado IN ('NUEVO','CONFIRMADO','ENTREGADO','CANCELADO')",
             name="ck_pedidos_estado",
         ),
+        # Pedidos por estado (picking de CONFIRMADO, listados filtrados)
+        Index("ix_pedidos_estado_id", "estado", "id"),
+        # Export por estado en orden de fecha sin ordenar en memoria (/pedidos/export)
+        Index("ix_pedidos_estado_fecha_creacion", "estado", "fecha_creacion"),
+        # Último pedido de cada cliente sin recorrer su historial (/clientes/cerca)
+        Index("ix_pedidos_cliente_id_fecha_creacion", "cliente_id", "fecha_creacion"),
     )
 
 class PedidoItem(Base):
     __tablename__ = "pedido_items"
+    __table_args__ = (
+        # Cubre la agregación del picking: cantidades por pedido sin ir a la tabla
+        Index("ix_pedido_items_pedido_producto_cantidad", "pedido_id", "producto_id", "cantidad"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    pedido_id = Column(Integer, ForeignKey("pedidos.id"), nullable=False)
-    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False)
+    pedido_id = Column(Integer, ForeignKey("pedidos.id"), nullable=False, index=True)
+    producto_id = Column(Integer, ForeignKey("productos.id"), nullable=False, index=True)
 
     cantidad = Column(Integer, nullable=False)
     precio_unitario_cent = Column(BigInteger, nullable=False)
@@ -97,3 +167,79 @@ class PedidoItem(Base):
 
     pedido = relationship("Pedido", back_populates="items")
     producto = relationship("Producto", back_populates="items")
+
+
+class PedidoEvento(Base):
+    """
+    Historial append-only del pedido: cambios de estado y notas (motivo de
+    cancelación, etc.). Reemplaza las líneas que se concatenaban en
+    Pedido.observaciones, que queda sólo para la nota del cliente/usuario.
+    """
+    __tablename__ = "pedido_eventos"
+    __table_args__ = (
+        Index("ix_pedido_eventos_pedido_id_id", "pedido_id", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    pedido_id = Column(Integer, ForeignKey("pedidos.id"), nullable=False)
+    tipo = Column(String, nullable=False)  # 'estado' | 'nota'
+    estado_anterior = Column(String, nullable=True)
+    estado_nuevo = Column(String, nullable=True)
+    nota = Column(Text, nullable=True)
+    usuario = Column(String, nullable=True)  # header X-Usuario (si viene)
+    creado_en = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+# ---------------------------------------------------------------------
+# Rollups diarios de ventas (services.reportes): se actualizan en la misma
+# transacción que el alta / cambio de estado del pedido. La fecha es el
+# día local de fecha_creacion y el estado es el estado actual del pedido,
+# así los reportes pueden excluir cancelados sin tocar pedidos.
+# ---------------------------------------------------------------------
+class VentaDiaria(Base):
+    """
+    Día × canal × estado.
+    """
+    __tablename__ = "ventas_diarias"
+
+    fecha = Column(Date, primary_key=True)
+    canal = Column(String, primary_key=True)
+    estado = Column(String, primary_key=True)
+
+    pedidos = Column(Integer, nullable=False, default=0)
+    unidades = Column(BigInteger, nullable=False, default=0)
+    total_bruto_cent = Column(BigInteger, nullable=False, default=0)
+    total_descuento_cent = Column(BigInteger, nullable=False, default=0)
+    total_neto_cent = Column(BigInteger, nullable=False, default=0)
+
+
+class VentaDiariaProducto(Base):
+    """
+    Día × producto × estado (importes a precio de lista, sin el descuento
+    del cliente, que es por pedido).
+    """
+    __tablename__ = "ventas_diarias_producto"
+
+    fecha = Column(Date, primary_key=True)
+    producto_id = Column(Integer, ForeignKey("productos.id"), primary_key=True)
+    estado = Column(String, primary_key=True)
+
+    pedidos = Column(Integer, nullable=False, default=0)
+    unidades = Column(BigInteger, nullable=False, default=0)
+    total_cent = Column(BigInteger, nullable=False, default=0)
+
+
+class VentaDiariaCliente(Base):
+    """
+    Día × cliente × estado (el reporte por vendedor sale de acá + clientes).
+    """
+    __tablename__ = "ventas_diarias_cliente"
+
+    fecha = Column(Date, primary_key=True)
+    cliente_id = Column(Integer, ForeignKey("clientes.id"), primary_key=True)
+    estado = Column(String, primary_key=True)
+
+    pedidos = Column(Integer, nullable=False, default=0)
+    unidades = Column(BigInteger, nullable=False, default=0)
+    total_bruto_cent = Column(BigInteger, nullable=False, default=0)
+    total_neto_cent = Column(BigInteger, nullable=False, default=0)
@@ -3,59 +3,45 @@ from __future__ import annotations
 
 from typing import List
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 import models
 import schemas
-from database import get_db
-from services.pedidos_services import create_pedido
-from utils.telefonos import normalize_phone
-
+from database import get_async_db
+from services.clientes_services import find_cliente_by_phone
+from services.matcher import CONFIANZA_ALTA, obtener_matcher
+from services.parser_pedidos import parsear_pedido
+from services.pedidos_services import crear_o_recuperar_pedido_async
+
+# Rutas async (engine aiosqlite): un pico de webhooks de WhatsApp no ocupa
+# un hilo del threadpool por request mientras espera a la base.
+# Los servicios sync se reutilizan con AsyncSession.run_sync.
 router = APIRouter(prefix="/bot", tags=["bot"])
 
 
-def find_cliente_by_phone(db: Session, wa_phone: str) -> models.Cliente | None:
-    """
-    Busca el cliente comparando por los últimos 10 dígitos del teléfono.
-    Usa la misma lógica que /clientes/by-phone.
-    """
-    objetivo = normalize_phone(wa_phone)
-    clientes = db.query(models.Cliente).all()
-    for c in clientes:
-        if not c.telefono:
-            continue
-        if normalize_phone(c.telefono) == objetivo:
-            return c
-    return None
-
-
 @router.get("/productos/buscar")
-def bot_buscar_productos(texto: str, db: Session = Depends(get_db)):
+async def bot_buscar_productos(
+    texto: str,
+    limit: int = Query(default=5, ge=1, le=20),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    Devuelve hasta 5 productos que matcheen por nombre/presentación/categoría.
+    Devuelve hasta `limit` productos ordenados por similitud con el texto
+    (tolerante a plurales, errores de tipeo y jerga: "hot dog doble").
     Lo vamos a usar desde el bot para 'pedido por descripción'.
+
+    `confianza` va de 0 a 1: por debajo de CONFIANZA_ALTA el bot debería
+    pedirle al cliente que confirme el producto.
     """
     q = (texto or "").strip()
     if not q:
         return []
 
-    like = f"%{q}%"
-
-    productos = (
-        db.query(models.Producto)
-        .filter(
-            or_(
-                models.Producto.nombre.ilike(like),
-                models.Producto.presentacion.ilike(like),
-                models.Producto.categoria.ilike(like),
-            )
-        )
-        .order_by(models.Producto.nombre)
-        .limit(5)
-        .all()
-    )
+    # Matcher precalculado sobre el cache de catálogo (se rearma sólo si cambia)
+    matcher = await db.run_sync(obtener_matcher)
+    resultados = matcher.buscar(q, limit=limit)
 
     return [
         {
@@ -63,15 +49,141 @@ def bot_buscar_productos(texto: str, db: Session = Depends(get_db)):
             "nombre": p.nombre,
             "presentacion": p.presentacion,
             "precio_centavos": p.precio_centavos,
+            "confianza": confianza,
+            "confirmar": confianza < CONFIANZA_ALTA,
         }
-        for p in productos
+        for p, confianza in resultados
     ]
 
 
+def _candidato(producto, confianza: float) -> schemas.BotProductoCandidato:
+    return schemas.BotProductoCandidato(
+        codigo=producto.codigo,
+        nombre=producto.nombre,
+        presentacion=producto.presentacion,
+        precio_centavos=producto.precio_centavos,
+        confianza=confianza,
+    )
+
+
+@router.post("/pedidos/parse", response_model=schemas.BotParseResponse)
+async def parsear_pedido_whatsapp(
+    data: schemas.BotParseRequest,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Interpreta un mensaje libre ("2 combo pancho doble, 3 bolsones x15")
+    y devuelve los ítems con cantidad, producto resuelto y confianza,
+    en una sola llamada. No crea el pedido: el bot confirma con el cliente
+    y después usa /bot/pedidos/from-whatsapp con los códigos.
+    """
+    matcher = await db.run_sync(obtener_matcher)
+    items, no_reconocidos = parsear_pedido(matcher, data.texto)
+
+    return schemas.BotParseResponse(
+        items=[
+            schemas.BotItemParseado(
+                linea=it.linea,
+                cantidad=it.cantidad,
+                producto=_candidato(it.producto, it.confianza),
+                confirmar=it.confirmar,
+                alternativas=[_candidato(p, c) for p, c in it.alternativas],
+            )
+            for it in items
+        ],
+        no_reconocidos=no_reconocidos,
+        total_estimado_cent=sum(it.cantidad * it.producto.precio_centavos for it in items),
+    )
+
+
+def _mensaje_pedido(
+    cliente_nombre: str,
+    pedido_id: int,
+    items: list[tuple[int, str | None, str | None, int, int]],
+    total_neto_cent: int,
+) -> str:
+    """
+    Texto de confirmación para el cliente. items: (cantidad, codigo,
+    nombre del producto, producto_id, subtotal_cent).
+    """
+    lineas: list[str] = []
+    lineas.append(f"Hola {cliente_nombre}, tu pedido #{pedido_id} fue registrado ✅")
+    lineas.append("")
+    lineas.append("Detalle:")
+
+    for cantidad, codigo, nombre, producto_id, subtotal_cent in items:
+        desc_prod = f"{codigo} {nombre}" if nombre else f"ID {producto_id}"
+        lineas.append(f"- x{cantidad} {desc_prod} = ${subtotal_cent/100:.2f}")
+
+    lineas.append("")
+    lineas.append(f"TOTAL: ${total_neto_cent/100:.2f}")
+
+    return "\n".join(lineas)
+
+
+def _respuesta(pedido: models.Pedido, cliente_nombre: str, duplicado: bool) -> schemas.BotPedidoResponse:
+    items = [
+        (
+            it.cantidad,
+            it.producto.codigo if it.producto else None,
+            it.producto.nombre if it.producto else None,
+            it.producto_id,
+            it.subtotal_cent,
+        )
+        for it in pedido.items
+    ]
+    return schemas.BotPedidoResponse(
+        ok=True,
+        pedido_id=pedido.id,
+        cliente_id=pedido.cliente_id,
+        mensaje_respuesta=_mensaje_pedido(cliente_nombre, pedido.id, items, pedido.total_neto_cent),
+        duplicado=duplicado,
+    )
+
+
+async def _replay_whatsapp(db: AsyncSession, referencia: str) -> schemas.BotPedidoResponse | None:
+    """
+    Respuesta original de un mensaje ya procesado, en una sola query
+    (índice único de origen_referencia + ítems + productos + cliente).
+    """
+    filas = (
+        await db.execute(
+            select(
+                models.Pedido.id,
+                models.Pedido.cliente_id,
+                models.Pedido.total_neto_cent,
+                models.Cliente.nombre.label("cliente_nombre"),
+                models.PedidoItem.cantidad,
+                models.Producto.codigo,
+                models.Producto.nombre,
+                models.PedidoItem.producto_id,
+                models.PedidoItem.subtotal_cent,
+            )
+            .join(models.Cliente, models.Cliente.id == models.Pedido.cliente_id)
+            .outerjoin(models.PedidoItem, models.PedidoItem.pedido_id == models.Pedido.id)
+            .outerjoin(models.Producto, models.Producto.id == models.PedidoItem.producto_id)
+            .where(models.Pedido.origen_referencia == referencia)
+            .order_by(models.PedidoItem.id)
+        )
+    ).all()
+    if not filas:
+        return None
+
+    cab = filas[0]
+    items = [tuple(f[4:]) for f in filas if f.producto_id is not None]
+    return schemas.BotPedidoResponse(
+        ok=True,
+        pedido_id=cab.id,
+        cliente_id=cab.cliente_id,
+        mensaje_respuesta=_mensaje_pedido(cab.cliente_nombre, cab.id, items, cab.total_neto_cent),
+        duplicado=True,
+    )
+
+
 @router.post("/pedidos/from-whatsapp", response_model=schemas.BotPedidoResponse)
-def crear_pedido_from_whatsapp(
+async def crear_pedido_from_whatsapp(
     data: schemas.BotPedidoFromWhatsApp,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Endpoint pensado para que lo llame el BOT de WhatsApp.
@@ -80,40 +192,36 @@ def crear_pedido_from_whatsapp(
     - wa_phone: número de WhatsApp del cliente (ej: "5491155732845")
     - observaciones: texto libre
     - items: lista de {codigo, cantidad}
+    - mensaje_id: id del mensaje (opcional). Si el gateway reintenta con el
+      mismo id, se devuelve la respuesta del pedido original (duplicado=true)
+      sin volver a crearlo.
 
     Devuelve:
     - ok, pedido_id, cliente_id, mensaje_respuesta (texto para enviar al cliente)
     """
+    # 0) Reintento de un mensaje ya procesado: una lectura por índice
+    referencia = f"whatsapp:{data.mensaje_id}" if data.mensaje_id else None
+    if referencia:
+        replay = await _replay_whatsapp(db, referencia)
+        if replay:
+            return replay
+
     # 1) Buscar cliente por teléfono
-    cliente = find_cliente_by_phone(db, data.wa_phone)
+    cliente = await db.run_sync(find_cliente_by_phone, data.wa_phone)
     if not cliente:
         raise HTTPException(
             status_code=404,
             detail="Cliente no encontrado para ese teléfono",
         )
 
-    # 2) Convertir items por código → PedidoItemCreate (producto_id + cantidad)
-    items_in: List[schemas.PedidoItemCreate] = []
-
-    for item in data.items:
-        producto = (
-            db.query(models.Producto)
-            .filter(models.Producto.codigo == item.codigo)
-            .first()
-        )
-        if not producto:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Producto con código '{item.codigo}' no encontrado",
-            )
+    # (se guarda antes: un rollback por reintento concurrente expira el objeto)
+    cliente_nombre = cliente.nombre
 
-        items_in.append(
-            schemas.PedidoItemCreate(
-                producto_id=producto.id,
-                cantidad=item.cantidad,
-                descripcion_extra=None,
-            )
-        )
+    # 2) Items por código: el servicio los resuelve todos en una sola query
+    items_in: List[schemas.PedidoItemCreate] = [
+        schemas.PedidoItemCreate(codigo=item.codigo, cantidad=item.cantidad)
+        for item in data.items
+    ]
 
     if not items_in:
         raise HTTPException(status_code=400, detail="El pedido no tiene ítems válidos")
@@ -124,35 +232,11 @@ def crear_pedido_from_whatsapp(
         canal="whatsapp",
         observaciones=data.observaciones,
         items=items_in,
+        origen_referencia=referencia,
     )
 
-    pedido = create_pedido(db, pedido_in)
+    pedido, creado = await crear_o_recuperar_pedido_async(db, pedido_in)
 
     # 4) Armar texto de respuesta para el cliente
-    lineas: list[str] = []
-    lineas.append(f"Hola {cliente.nombre}, tu pedido #{pedido.id} fue registrado ✅")
-    lineas.append("")
-    lineas.append("Detalle:")
-
-    # Como 'pedido' es un modelo SQLAlchemy, podemos acceder a las relaciones
-    for it in pedido.items:
-        producto = it.producto
-        desc_prod = (
-            f"{producto.codigo} {producto.nombre}"
-            if producto
-            else f"ID {it.producto_id}"
-        )
-        linea = f"- x{it.cantidad} {desc_prod} = ${it.subtotal_cent/100:.2f}"
-        lineas.append(linea)
-
-    lineas.append("")
-    lineas.append(f"TOTAL: ${pedido.total_neto_cent/100:.2f}")
-
-    mensaje = "\n".join(lineas)
-
-    return schemas.BotPedidoResponse(
-        ok=True,
-        pedido_id=pedido.id,
-        cliente_id=cliente.id,
-        mensaje_respuesta=mensaje,
-    )
+    # (ítems y productos ya vienen cargados: no hay lazy-load en async)
+    return _respuesta(pedido, cliente_nombre, duplicado=not creado)
@@ -1,27 +1,57 @@
 # routers/clientes.py
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from sqlalchemy import or_, func
+from sqlalchemy import or_
 
 import models
 import schemas
 from database import get_db
-from utils.telefonos import normalize_phone
+from services.busqueda import fts_activo, fts_query, match_clientes
+from services.clientes_services import buscar_cercanos, find_cliente_by_phone, set_telefonos, telefonos_de
+from services.secuencias import NUMERO_CLIENTE, ajustar_minimo, siguiente
+from utils.geo import columnas_geo
+from utils.paginacion import paginar, set_next_cursor
 
 router = APIRouter(prefix="/clientes", tags=["clientes"])
 
 
 @router.get("/", response_model=list[schemas.ClienteRead])
 def listar_clientes(
-    q: str | None = Query(default=None, description="Buscar por nombre o teléfono"),
+    response: Response,
+    q: str | None = Query(default=None, description="Buscar por nombre, teléfono o barrio (sin importar acentos)"),
+    orden: str = Query(default="reciente", pattern="^(reciente|relevancia)$"),
     limit: int = Query(default=50, ge=1, le=200),
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None, description="Cursor opaco (header X-Next-Cursor de la página anterior)"),
     db: Session = Depends(get_db),
 ):
+    """
+    Lista clientes (más nuevos primero). Con `q` busca por palabras al
+    inicio ("pep" encuentra "Pepe", no "epe"); si alguna palabra tiene
+    menos de 3 letras busca la subcadena. orden=relevancia se pagina con
+    offset: no acepta cursor ni devuelve X-Next-Cursor.
+    """
+    if cursor and orden == "relevancia":
+        raise HTTPException(
+            status_code=400,
+            detail="orden=relevancia se pagina con offset; cursor sólo vale con orden=reciente",
+        )
+
     query = db.query(models.Cliente)
 
-    if q:
+    if q and fts_activo(db) and fts_query(q):
+        match = match_clientes(q.strip())
+        query = query.join(match, match.c.id == models.Cliente.id)
+        if orden == "relevancia":
+            return (
+                query.order_by(match.c.rank, models.Cliente.id.desc())
+                .offset(offset)
+                .limit(limit)
+                .all()
+            )
+    elif q:
         q2 = q.strip()
         like = f"%{q2}%"
         query = query.filter(
@@ -31,7 +61,9 @@ def listar_clientes(
             )
         )
 
-    return query.order_by(models.Cliente.id.desc()).offset(offset).limit(limit).all()
+    clientes = paginar(query, models.Cliente.id, limit, offset, cursor).all()
+    set_next_cursor(response, clientes, limit)
+    return clientes
 
 
 @router.post("/", response_model=schemas.ClienteRead)
@@ -41,9 +73,9 @@ def crear_cliente(
 ):
     """
     Crea un nuevo cliente.
-    - Normaliza el teléfono con normalize_phone.
-    - Evita duplicar clientes con el mismo teléfono.
-    - Si existe la columna numero_cliente, le asigna el siguiente número.
+    - Normaliza el/los teléfonos con normalize_phone ("11 3320-3652 / 1154659954").
+    - Evita duplicar clientes con alguno de esos teléfonos.
+    - Le asigna el siguiente numero_cliente de la secuencia (services.secuencias).
     """
     if not cliente_in.telefono:
         raise HTTPException(
@@ -51,33 +83,30 @@ def crear_cliente(
             detail="El teléfono es obligatorio para crear un cliente que use el bot.",
         )
 
-    telefono_normalizado = normalize_phone(cliente_in.telefono)
+    normalizados = [norm for _, norm in telefonos_de(cliente_in.telefono)]
+    if not normalizados:
+        raise HTTPException(status_code=400, detail="El teléfono no tiene un número válido.")
 
     existente = (
-        db.query(models.Cliente)
-        .filter(models.Cliente.telefono == telefono_normalizado)
+        db.query(models.ClienteTelefono.id)
+        .filter(models.ClienteTelefono.telefono_normalizado.in_(normalizados))
         .first()
     )
     if existente:
         raise HTTPException(status_code=400, detail="Ya existe un cliente con ese teléfono.")
 
-    # Calcular siguiente numero_cliente si la columna existe
-    nuevo_numero = None
-    if hasattr(models.Cliente, "numero_cliente"):
-        max_num = db.query(func.max(models.Cliente.numero_cliente)).scalar()
-        nuevo_numero = (max_num or 0) + 1
-
     cliente = models.Cliente(
         nombre=cliente_in.nombre,
         direccion=cliente_in.direccion,
         barrio=cliente_in.barrio,
-        telefono=telefono_normalizado,
+        telefono=" / ".join(normalizados),
         descuento_porcentaje=cliente_in.descuento_porcentaje,
         # si tu schema trae más campos, acá los sumamos (vendedor, comentario, etc.)
     )
 
-    if nuevo_numero is not None:
-        cliente.numero_cliente = nuevo_numero
+    cliente.numero_cliente = siguiente(db, NUMERO_CLIENTE)
+
+    set_telefonos(cliente, cliente.telefono)
 
     db.add(cliente)
     db.commit()
@@ -91,19 +120,41 @@ def obtener_cliente_por_telefono(telefono: str, db: Session = Depends(get_db)):
     Busca el cliente por teléfono usando normalización:
     - quita espacios, +, -, etc.
     - compara por los últimos 10 dígitos (según normalize_phone).
+    - matchea cualquiera de los números del cliente (cliente_telefonos).
     """
-    objetivo = normalize_phone(telefono)
-
-    clientes = db.query(models.Cliente).all()
-    for c in clientes:
-        if not c.telefono:
-            continue
-        if normalize_phone(c.telefono) == objetivo:
-            return c
+    cliente = find_cliente_by_phone(db, telefono)
+    if cliente:
+        return cliente
 
     raise HTTPException(status_code=404, detail="Cliente no encontrado para ese teléfono")
 
 
+@router.get("/cerca", response_model=list[schemas.ClienteCercaRead])
+def clientes_cerca(
+    lat: float = Query(..., ge=-90, le=90),
+    lng: float = Query(..., ge=-180, le=180),
+    radio_km: float = Query(default=5, gt=0, le=200),
+    sin_pedidos_dias: int | None = Query(default=None, ge=1, le=3650, description="Sólo los que no pidieron en los últimos N días"),
+    solo_activos: bool = Query(default=True),
+    limit: int = Query(default=100, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """
+    Clientes dentro de radio_km de (lat, lng), del más cercano al más lejano.
+    """
+    cercanos = buscar_cercanos(db, lat, lng, radio_km, sin_pedidos_dias, solo_activos, limit)
+    return [
+        schemas.ClienteCercaRead(
+            **schemas.ClienteRead.model_validate(cliente).model_dump(),
+            lat=cliente.lat,
+            lng=cliente.lng,
+            distancia_km=round(distancia, 3),
+            ultimo_pedido=ultimo,
+        )
+        for cliente, distancia, ultimo in cercanos
+    ]
+
+
 @router.get("/{cliente_id}", response_model=schemas.ClienteRead)
 def obtener_cliente(cliente_id: int, db: Session = Depends(get_db)):
     cliente = db.query(models.Cliente).filter(models.Cliente.id == cliente_id).first()
@@ -129,11 +180,46 @@ def editar_cliente(
     if "nombre" in data and (data["nombre"] is None or str(data["nombre"]).strip() == ""):
         raise HTTPException(status_code=422, detail="El nombre no puede estar vacío")
 
+    numero = data.get("numero_cliente")
+    if numero is not None and numero != cliente.numero_cliente:
+        otro = db.query(models.Cliente.id).filter(models.Cliente.numero_cliente == numero).first()
+        if otro:
+            raise HTTPException(
+                status_code=409,
+                detail=f"El numero_cliente {numero} ya es del cliente id={otro.id}",
+            )
+
     for k, v in data.items():
         setattr(cliente, k, v)
 
+    # Editado a mano: sin hash, la próxima importación vuelve a escribir la
+    # fila del archivo en vez de tomarla como "sin cambios"
+    if data.keys() - {"activo"}:
+        cliente.hash_contenido = None
+
+    # Mantener sincronizados los teléfonos indexados (cliente_telefonos)
+    if "telefono" in data:
+        set_telefonos(cliente, data["telefono"])
+
+    # lat / lng / geocelda salen de coordenadas
+    if "coordenadas" in data:
+        for k, v in columnas_geo(data["coordenadas"]).items():
+            setattr(cliente, k, v)
+
     db.add(cliente)
-    db.commit()
+    try:
+        if numero is not None:
+            # Un número cargado a mano por encima de la secuencia la adelanta:
+            # si no, una próxima alta recibiría ese mismo número
+            db.flush()
+            ajustar_minimo(db, NUMERO_CLIENTE)
+        db.commit()
+    except IntegrityError as exc:
+        db.rollback()
+        # El chequeo de arriba no cubre dos PATCH simultáneos con el mismo número
+        if numero is not None and "numero_cliente" in str(exc.orig):
+            raise HTTPException(status_code=409, detail=f"El numero_cliente {numero} ya está en uso")
+        raise HTTPException(status_code=409, detail="El cliente no se pudo guardar: conflicto con otro registro")
     db.refresh(cliente)
     return cliente
 
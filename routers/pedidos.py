@@ -4,16 +4,23 @@ from __future__ import annotations
 
 from typing import Optional
 
-from datetime import datetime, timezone
+from datetime import date, datetime, timedelta
+from itertools import groupby
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import func, insert, or_, select, union_all, update
 
 import models
 import schemas
-from database import get_db
-from services.pedidos_services import create_pedido
+from database import SessionLocal, get_db
+from services.busqueda import fts_activo, fts_query, match_clientes, match_productos
+from services.escritor import escribir
+from services.pedidos_services import create_pedido, crear_pedidos_bulk
+from services.reportes import inicio_dia_utc, mover_estado
+from utils.cache import LRUCache
+from utils.paginacion import paginar, set_next_cursor
+from utils.streaming import respuesta_streaming
 
 router = APIRouter(prefix="/pedidos", tags=["pedidos"])
 
@@ -31,6 +38,13 @@ TRANSICIONES = {
 }
 
 
+def usuario_actual(x_usuario: str | None = Header(default=None)) -> str | None:
+    """
+    Quién hace el cambio (header X-Usuario, opcional): queda en pedido_eventos.
+    """
+    return (x_usuario or "").strip() or None
+
+
 def normalizar_estado(valor: Optional[str]) -> str:
     """
     Normaliza estados entrantes para evitar fallos por CHECK constraint.
@@ -40,7 +54,8 @@ def normalizar_estado(valor: Optional[str]) -> str:
     """
     if valor is None:
         return "NUEVO"
-    s = str(valor).strip().upper()
+    # schemas.PedidoEstado: str(Enum) en 3.11 da "PedidoEstado.X", usamos .value
+    s = str(getattr(valor, "value", valor)).strip().upper()
     if s == "":
         return "NUEVO"
     if s == "PENDIENTE":
@@ -48,8 +63,19 @@ def normalizar_estado(valor: Optional[str]) -> str:
     return s
 
 
+def estado_filtro(valor: str) -> str:
+    """
+    Estado de un query param de filtro: sin importar mayúsculas (como el
+    resto de los filtros de este router), 422 si no es un estado válido.
+    """
+    estado = normalizar_estado(valor)
+    if estado not in schemas.PedidoEstado.__members__:
+        raise HTTPException(status_code=422, detail=f"Estado inválido: {valor!r}")
+    return estado
+
+
 # ---------------------------------------------------------------------
-# Helpers: observaciones + resumen (para WhatsApp / UI)
+# Helpers: resumen (para WhatsApp / UI)
 # ---------------------------------------------------------------------
 def _money(cent: int | None) -> str:
     # 20700 -> "$20.700,00"
@@ -60,58 +86,120 @@ def _money(cent: int | None) -> str:
     return f"${s}"
 
 
-def _append_obs(pedido: models.Pedido, texto: str) -> None:
-    texto = (texto or "").strip()
-    if not texto:
-        return
-    base = (pedido.observaciones or "").rstrip()
-    stamp = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%MZ")
-    linea = f"[{stamp}] {texto}"
-    pedido.observaciones = (base + "\n" + linea).strip() if base else linea
+# Resúmenes ya renderizados: {pedido_id: (actualizado_en, texto)}.
+# El bot pide el mismo resumen muchas veces mientras chatea con el cliente.
+_RESUMEN_CACHE = LRUCache(maxsize=512)
 
 
-def _build_resumen_texto(pedido: models.Pedido, db: Session) -> str:
-    cliente = (
-        db.query(models.Cliente)
-        .filter(models.Cliente.id == pedido.cliente_id)
-        .first()
+def _invalidar_resumen(pedido_id: int) -> None:
+    _RESUMEN_CACHE.pop(pedido_id)
+
+
+def _build_resumenes(db: Session, pedidos: list[models.Pedido]) -> dict[int, str]:
+    """
+    Resúmenes de varios pedidos: los que no están en cache salen de una
+    sola query (pedido + cliente + ítems + nombre de producto).
+    """
+    textos: dict[int, str] = {}
+    faltan: dict[int, models.Pedido] = {}
+    for pedido in pedidos:
+        cacheado = _RESUMEN_CACHE.get(pedido.id)
+        if cacheado and cacheado[0] == pedido.actualizado_en:
+            textos[pedido.id] = cacheado[1]
+        else:
+            faltan[pedido.id] = pedido
+    if not faltan:
+        return textos
+
+    filas = (
+        db.query(
+            models.Pedido.id.label("pedido_id"),
+            models.Pedido.estado,
+            models.Pedido.total_neto_cent,
+            models.Pedido.observaciones,
+            models.Cliente.nombre.label("cliente_nombre"),
+            models.Cliente.telefono.label("cliente_telefono"),
+            models.PedidoItem.producto_id,
+            models.PedidoItem.cantidad,
+            models.PedidoItem.precio_unitario_cent,
+            models.PedidoItem.subtotal_cent,
+            models.Producto.nombre.label("producto_nombre"),
+        )
+        .select_from(models.Pedido)
+        .outerjoin(models.Cliente, models.Cliente.id == models.Pedido.cliente_id)
+        .outerjoin(models.PedidoItem, models.PedidoItem.pedido_id == models.Pedido.id)
+        .outerjoin(models.Producto, models.Producto.id == models.PedidoItem.producto_id)
+        .filter(models.Pedido.id.in_(list(faltan)))
+        .order_by(models.Pedido.id, models.PedidoItem.id)
+        .all()
     )
-    nombre = (cliente.nombre if cliente else "Cliente")
-    tel = (cliente.telefono if cliente and cliente.telefono else "")
+
+    por_pedido: dict[int, list] = {}
+    for fila in filas:
+        por_pedido.setdefault(fila.pedido_id, []).append(fila)
+
+    for pedido_id, pedido in faltan.items():
+        texto = _render_resumen(pedido_id, por_pedido.get(pedido_id, []))
+        if texto:
+            _RESUMEN_CACHE.set(pedido_id, (pedido.actualizado_en, texto))
+        textos[pedido_id] = texto
+    return textos
+
+
+def _render_resumen(pedido_id: int, filas: list) -> str:
+    if not filas:
+        return ""
+
+    cab = filas[0]
+    nombre = cab.cliente_nombre or "Cliente"
+    tel = cab.cliente_telefono or ""
 
     lines: list[str] = []
-    lines.append(f"Pedido #{pedido.id} – {pedido.estado}")
+    lines.append(f"Pedido #{pedido_id} – {cab.estado}")
     lines.append(f"Cliente: {nombre}" + (f" ({tel})" if tel else ""))
     lines.append("")
 
-    items = (
-        db.query(models.PedidoItem)
-        .filter(models.PedidoItem.pedido_id == pedido.id)
-        .all()
-    )
-
-    for it in items:
-        prod = (
-            db.query(models.Producto)
-            .filter(models.Producto.id == it.producto_id)
-            .first()
-        )
-        prod_nombre = prod.nombre if prod else f"Producto {it.producto_id}"
+    for it in filas:
+        if it.producto_id is None:  # pedido sin ítems (outer join)
+            continue
+        prod_nombre = it.producto_nombre or f"Producto {it.producto_id}"
 
         lines.append(
             f"- {it.cantidad}x {prod_nombre} | {_money(it.precio_unitario_cent)} | Sub: {_money(it.subtotal_cent)}"
         )
 
     lines.append("")
-    lines.append(f"Total: {_money(pedido.total_neto_cent)}")
+    lines.append(f"Total: {_money(cab.total_neto_cent)}")
 
-    if pedido.observaciones:
+    if cab.observaciones:
         lines.append("")
-        lines.append(f"Obs: {pedido.observaciones}")
+        lines.append(f"Obs: {cab.observaciones}")
 
     return "\n".join(lines).strip()
 
 
+def _build_resumen_texto(pedido: models.Pedido, db: Session) -> str:
+    return _build_resumenes(db, [pedido])[pedido.id]
+
+
+def _query_pedidos(db: Session, include_items: bool = True):
+    """
+    Query base de lectura de pedidos. Con include_items carga los ítems
+    de toda la página en una sola query extra (selectin) en vez de un
+    lazy-load por pedido al serializar PedidoRead.
+    """
+    query = db.query(models.Pedido)
+    if include_items:
+        query = query.options(selectinload(models.Pedido.items))
+    return query
+
+
+def _serializar_pedidos(pedidos: list[models.Pedido], include_items: bool):
+    if include_items:
+        return pedidos
+    return [schemas.PedidoHeaderRead.model_validate(p) for p in pedidos]
+
+
 # ---------------------------------------------------------------------
 # CRUD base
 # ---------------------------------------------------------------------
@@ -123,16 +211,37 @@ def crear_pedido(
     return create_pedido(db, pedido_in)
 
 
-@router.get("/", response_model=list[schemas.PedidoRead])
+@router.post("/bulk", response_model=schemas.PedidosBulkResponse)
+def crear_pedidos_masivo(
+    data: schemas.PedidosBulkCreate,
+    db: Session = Depends(get_db),
+):
+    """
+    Crea muchos pedidos en una sola transacción, con las mismas reglas de
+    precios y descuentos que POST /pedidos/. Devuelve el resultado de cada
+    pedido (por índice); con modo=todo_o_nada un error cancela el lote.
+    """
+    return crear_pedidos_bulk(db, data)
+
+
+@router.get("/", response_model=list[schemas.PedidoRead] | list[schemas.PedidoHeaderRead])
 def listar_pedidos(
+    response: Response,
     q: str | None = Query(default=None, description="Buscar por cliente (nombre/teléfono)"),
     estado: str | None = Query(default=None),
     cliente_id: int | None = Query(default=None),
+    include_items: bool = Query(default=True, description="false = solo cabeceras (más liviano)"),
     limit: int = Query(default=50, ge=1, le=200),
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None, description="Cursor opaco (header X-Next-Cursor de la página anterior)"),
     db: Session = Depends(get_db),
 ):
-    query = db.query(models.Pedido)
+    """
+    Lista pedidos (más nuevos primero). Con `q` busca clientes por palabras
+    al inicio ("pep" encuentra "Pepe", no "epe"); si alguna palabra tiene
+    menos de 3 letras busca la subcadena en nombre y teléfono.
+    """
+    query = _query_pedidos(db, include_items)
 
     if cliente_id is not None:
         query = query.filter(models.Pedido.cliente_id == cliente_id)
@@ -140,7 +249,10 @@ def listar_pedidos(
     if estado:
         query = query.filter(models.Pedido.estado == estado.strip().upper())
 
-    if q:
+    if q and fts_activo(db) and fts_query(q):
+        match = match_clientes(q.strip())
+        query = query.filter(models.Pedido.cliente_id.in_(select(match.c.id)))
+    elif q:
         like = f"%{q.strip()}%"
         query = (
             query.join(models.Cliente, models.Cliente.id == models.Pedido.cliente_id)
@@ -152,20 +264,32 @@ def listar_pedidos(
             )
         )
 
-    return query.order_by(models.Pedido.id.desc()).offset(offset).limit(limit).all()
+    pedidos = paginar(query, models.Pedido.id, limit, offset, cursor).all()
+    set_next_cursor(response, pedidos, limit)
+    return _serializar_pedidos(pedidos, include_items)
 
 
-@router.get("/search", response_model=list[schemas.PedidoRead])
+@router.get("/search", response_model=list[schemas.PedidoRead] | list[schemas.PedidoHeaderRead])
 def buscar_pedidos_avanzado(
-    q: str = Query(..., description="Buscar por cliente o producto"),
+    q: str = Query(..., description="Buscar por cliente o producto (sin importar acentos)"),
+    orden: str = Query(default="reciente", pattern="^(reciente|relevancia)$"),
+    include_items: bool = Query(default=True, description="false = solo cabeceras (más liviano)"),
     limit: int = Query(default=50, ge=1, le=200),
     offset: int = Query(default=0, ge=0),
     db: Session = Depends(get_db),
 ):
+    """
+    Pedidos cuyo cliente o algún producto matchea `q`, por palabras al
+    inicio (como GET /pedidos/?q=); palabras de menos de 3 letras buscan la
+    subcadena. Se pagina con offset/limit (también con orden=relevancia).
+    """
+    if fts_activo(db) and fts_query(q):
+        return _buscar_pedidos_fts(db, q.strip(), orden, include_items, limit, offset)
+
     like = f"%{q.strip()}%"
 
     query = (
-        db.query(models.Pedido)
+        _query_pedidos(db, include_items)
         .join(models.Cliente, models.Cliente.id == models.Pedido.cliente_id)
         .join(models.PedidoItem, models.PedidoItem.pedido_id == models.Pedido.id)
         .join(models.Producto, models.Producto.id == models.PedidoItem.producto_id)
@@ -179,7 +303,50 @@ def buscar_pedidos_avanzado(
         .distinct()
     )
 
-    return query.order_by(models.Pedido.id.desc()).offset(offset).limit(limit).all()
+    pedidos = query.order_by(models.Pedido.id.desc()).offset(offset).limit(limit).all()
+    return _serializar_pedidos(pedidos, include_items)
+
+
+def _buscar_pedidos_fts(
+    db: Session,
+    q: str,
+    orden: str,
+    include_items: bool,
+    limit: int,
+    offset: int,
+):
+    """
+    Pedidos cuyo cliente o alguno de sus productos matchea en FTS.
+    Parte de los (pocos) clientes/productos que matchean y llega a los pedidos
+    por índice (pedidos.cliente_id, pedido_items.producto_id), sin escanear el join.
+    """
+    # bm25() sólo vale en el SELECT que hace el MATCH: los matches van a CTEs
+    # materializadas y después se usan como tablas comunes (join / rank)
+    m_cli = match_clientes(q).element.cte("m_cli").prefix_with("MATERIALIZED")
+    m_prod = match_productos(q).element.cte("m_prod").prefix_with("MATERIALIZED")
+
+    # Mejor rank (bm25) por pedido entre su cliente y sus productos
+    rangos = union_all(
+        select(models.Pedido.id.label("pedido_id"), m_cli.c.rank)
+        .join(m_cli, m_cli.c.id == models.Pedido.cliente_id),
+        select(models.PedidoItem.pedido_id, m_prod.c.rank)
+        .join(m_prod, m_prod.c.id == models.PedidoItem.producto_id),
+    ).subquery()
+    mejores = (
+        select(rangos.c.pedido_id, func.min(rangos.c.rank).label("rank"))
+        .group_by(rangos.c.pedido_id)
+        .subquery()
+    )
+
+    query = _query_pedidos(db, include_items).join(mejores, mejores.c.pedido_id == models.Pedido.id)
+
+    if orden == "relevancia":
+        query = query.order_by(mejores.c.rank, models.Pedido.id.desc())
+    else:
+        query = query.order_by(models.Pedido.id.desc())
+
+    pedidos = query.offset(offset).limit(limit).all()
+    return _serializar_pedidos(pedidos, include_items)
 
 
 @router.get("/estados")
@@ -192,12 +359,168 @@ def listar_transiciones():
     return {k: sorted(list(v)) for k, v in TRANSICIONES.items()}
 
 
+# ---------------------------------------------------------------------
+# Picking (depósito): cantidades a preparar de los pedidos CONFIRMADO
+# ---------------------------------------------------------------------
+AGRUPAR_PICKING = {
+    "producto": None,
+    "barrio": models.Cliente.barrio,
+    "vendedor": models.Cliente.vendedor,
+}
+COLUMNAS_PICKING = ["grupo", "producto_id", "codigo", "nombre", "presentacion", "cantidad", "pedidos"]
+
+
+def _filas_picking(agrupar: str, estado: str, canal: str | None):
+    """
+    Una sola agregación sobre pedido_items + pedidos (+ clientes para
+    agrupar). Abre su propia sesión: corre mientras se envía la respuesta.
+    """
+    grupo = AGRUPAR_PICKING[agrupar]
+    columnas = [
+        models.PedidoItem.producto_id,
+        models.Producto.codigo,
+        models.Producto.nombre,
+        models.Producto.presentacion,
+        func.sum(models.PedidoItem.cantidad).label("cantidad"),
+        func.count(func.distinct(models.PedidoItem.pedido_id)).label("pedidos"),
+    ]
+    query = (
+        select(*([grupo.label("grupo")] if grupo is not None else []), *columnas)
+        .select_from(models.PedidoItem)
+        .join(models.Pedido, models.Pedido.id == models.PedidoItem.pedido_id)
+        .join(models.Producto, models.Producto.id == models.PedidoItem.producto_id)
+        .where(models.Pedido.estado == estado)
+    )
+    if grupo is not None:
+        query = query.join(models.Cliente, models.Cliente.id == models.Pedido.cliente_id)
+    if canal:
+        query = query.where(models.Pedido.canal == canal)
+
+    orden = [models.Producto.codigo, models.PedidoItem.producto_id]
+    claves = [models.PedidoItem.producto_id, models.Producto.codigo, models.Producto.nombre, models.Producto.presentacion]
+    if grupo is not None:
+        orden.insert(0, grupo)
+        claves.insert(0, grupo)
+    query = query.group_by(*claves).order_by(*orden)
+
+    with SessionLocal() as db:
+        for fila in db.execute(query).yield_per(500):
+            yield fila._asdict()
+
+
+@router.get("/picking")
+def picking(
+    agrupar: str = Query(default="producto", pattern="^(producto|barrio|vendedor)$"),
+    formato: str = Query(default="json", pattern="^(json|csv)$"),
+    estado: str = Query(default="CONFIRMADO", description="NUEVO | CONFIRMADO | ENTREGADO | CANCELADO"),
+    canal: str | None = Query(default=None),
+):
+    """
+    Total por producto de los pedidos en `estado` (CONFIRMADO por defecto),
+    opcionalmente por barrio o vendedor del cliente. Se envía en streaming
+    (JSON array o CSV).
+    """
+    filas = _filas_picking(agrupar, estado_filtro(estado), canal)
+    columnas = COLUMNAS_PICKING if agrupar != "producto" else COLUMNAS_PICKING[1:]
+    nombre = f"picking_{agrupar}" if formato == "csv" else None
+    return respuesta_streaming(filas, formato, columnas, nombre_archivo=nombre)
+
+
+# ---------------------------------------------------------------------
+# Export (contabilidad): pedidos + ítems en streaming, memoria constante
+# ---------------------------------------------------------------------
+EXPORT_YIELD_PER = 2000
+
+COLUMNAS_EXPORT_PEDIDO = [
+    "pedido_id", "fecha_creacion", "cliente_id", "numero_cliente", "cliente_nombre",
+    "canal", "estado", "total_bruto_cent", "descuento_cliente", "total_descuento_cent",
+    "total_neto_cent", "observaciones", "origen_referencia",
+]
+COLUMNAS_EXPORT_ITEM = [
+    "item_id", "producto_id", "codigo", "producto_nombre",
+    "cantidad", "precio_unitario_cent", "subtotal_cent", "descripcion_extra",
+]
+
+
+def _filas_export(formato: str, desde: date | None, hasta: date | None, estado: str | None):
+    """
+    Una sola query pedidos LEFT JOIN ítems, en orden de fecha y leída por
+    bloques (yield_per): nunca hay más de un bloque en memoria. En CSV va
+    una fila por ítem (con la cabecera repetida); en NDJSON, una línea por
+    pedido con sus ítems anidados (las filas de un pedido vienen juntas).
+    Abre su propia sesión: corre mientras se envía la respuesta.
+    """
+    P, I, C, Pr = models.Pedido, models.PedidoItem, models.Cliente, models.Producto
+    query = (
+        select(
+            P.id.label("pedido_id"), P.fecha_creacion, P.cliente_id,
+            C.numero_cliente, C.nombre.label("cliente_nombre"),
+            P.canal, P.estado, P.total_bruto_cent, P.descuento_cliente,
+            P.total_descuento_cent, P.total_neto_cent, P.observaciones, P.origen_referencia,
+            I.id.label("item_id"), I.producto_id, Pr.codigo, Pr.nombre.label("producto_nombre"),
+            I.cantidad, I.precio_unitario_cent, I.subtotal_cent, I.descripcion_extra,
+        )
+        .select_from(P)
+        .outerjoin(C, C.id == P.cliente_id)
+        .outerjoin(I, I.pedido_id == P.id)
+        .outerjoin(Pr, Pr.id == I.producto_id)
+        .order_by(P.fecha_creacion, P.id, I.id)
+    )
+    if desde:
+        query = query.where(P.fecha_creacion >= inicio_dia_utc(desde))
+    if hasta:
+        query = query.where(P.fecha_creacion < inicio_dia_utc(hasta + timedelta(days=1)))
+    if estado:
+        query = query.where(P.estado == estado)
+
+    n = len(COLUMNAS_EXPORT_PEDIDO)
+    with SessionLocal() as db:
+        filas = db.execute(query).yield_per(EXPORT_YIELD_PER)
+        if formato == "csv":
+            # Las columnas del select están en el orden del CSV: van las tuplas tal cual
+            yield from filas
+            return
+
+        for _, grupo in groupby(filas, key=lambda f: f[0]):
+            primera = next(grupo)
+            pedido = dict(zip(COLUMNAS_EXPORT_PEDIDO, primera[:n]))
+            pedido["items"] = [
+                dict(zip(COLUMNAS_EXPORT_ITEM, f[n:]))
+                for f in (primera, *grupo)
+                if f[n] is not None  # pedido sin ítems (LEFT JOIN)
+            ]
+            yield pedido
+
+
+@router.get("/export")
+def exportar_pedidos(
+    formato: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    desde: date | None = Query(default=None, description="Día local (YYYY-MM-DD), por fecha de creación"),
+    hasta: date | None = Query(default=None, description="Día local (YYYY-MM-DD), inclusive"),
+    estado: str | None = Query(default=None, description="NUEVO | CONFIRMADO | ENTREGADO | CANCELADO"),
+):
+    """
+    Historial de pedidos con sus ítems para contabilidad, en streaming:
+    NDJSON (un pedido por línea, ítems anidados) o CSV (una fila por ítem).
+    A diferencia de paginar /pedidos, no arma objetos ORM ni modelos
+    Pydantic y la memoria no depende del rango.
+    """
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=422, detail="desde no puede ser posterior a hasta")
+
+    filas = _filas_export(formato, desde, hasta, estado_filtro(estado) if estado else None)
+    nombre = "pedidos" + (f"_{desde}" if desde else "") + (f"_{hasta}" if hasta else "")
+    return respuesta_streaming(
+        filas, formato, COLUMNAS_EXPORT_PEDIDO + COLUMNAS_EXPORT_ITEM, nombre_archivo=nombre
+    )
+
+
 @router.get("/{pedido_id}", response_model=schemas.PedidoRead)
 def obtener_pedido(
     pedido_id: int,
     db: Session = Depends(get_db),
 ):
-    pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
+    pedido = _query_pedidos(db).filter(models.Pedido.id == pedido_id).first()
     if not pedido:
         raise HTTPException(status_code=404, detail="Pedido no encontrado")
     return pedido
@@ -209,21 +532,21 @@ def editar_pedido(
     payload: schemas.PedidoUpdate,
     db: Session = Depends(get_db),
 ):
-    pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
-    if not pedido:
-        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+    def trabajo(s: Session) -> None:
+        pedido = s.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
+        if not pedido:
+            raise HTTPException(status_code=404, detail="Pedido no encontrado")
 
-    # 🔒 Solo editable si está en NUEVO
-    if (pedido.estado or "").strip().upper() != "NUEVO":
-        raise HTTPException(status_code=409, detail="Solo se pueden modificar pedidos en estado NUEVO")
+        # 🔒 Solo editable si está en NUEVO
+        if (pedido.estado or "").strip().upper() != "NUEVO":
+            raise HTTPException(status_code=409, detail="Solo se pueden modificar pedidos en estado NUEVO")
 
-    if payload.observaciones is not None:
-        pedido.observaciones = payload.observaciones
+        if payload.observaciones is not None:
+            pedido.observaciones = payload.observaciones
 
-    db.add(pedido)
-    db.commit()
-    db.refresh(pedido)
-    return pedido
+    escribir(db, trabajo)
+    _invalidar_resumen(pedido_id)
+    return _query_pedidos(db).filter(models.Pedido.id == pedido_id).one()
 
 
 # ---------------------------------------------------------------------
@@ -242,16 +565,122 @@ def resumen_pedido(
     return {"pedido_id": pedido.id, "texto": texto}
 
 
+# ---------------------------------------------------------------------
+# Historial (pedido_eventos): cambios de estado y notas, más nuevo primero
+# ---------------------------------------------------------------------
+@router.get("/{pedido_id}/eventos", response_model=list[schemas.PedidoEventoRead])
+def listar_eventos_pedido(
+    pedido_id: int,
+    response: Response,
+    limit: int = Query(default=50, ge=1, le=200),
+    offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None, description="Cursor de X-Next-Cursor (keyset por id)"),
+    db: Session = Depends(get_db),
+):
+    if db.get(models.Pedido, pedido_id) is None:
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+
+    query = db.query(models.PedidoEvento).filter(models.PedidoEvento.pedido_id == pedido_id)
+    eventos = paginar(query, models.PedidoEvento.id, limit, offset, cursor).all()
+    set_next_cursor(response, eventos, limit)
+    return eventos
+
+
+@router.post("/{pedido_id}/eventos", response_model=schemas.PedidoEventoRead, status_code=201)
+def agregar_nota_pedido(
+    pedido_id: int,
+    payload: schemas.PedidoNotaCreate,
+    db: Session = Depends(get_db),
+    usuario: str | None = Depends(usuario_actual),
+):
+    def trabajo(s: Session) -> int | None:
+        if s.get(models.Pedido, pedido_id) is None:
+            return None
+        evento = models.PedidoEvento(
+            pedido_id=pedido_id, tipo="nota", nota=payload.nota.strip(), usuario=usuario
+        )
+        s.add(evento)
+        s.flush()
+        return evento.id
+
+    evento_id = escribir(db, trabajo)
+    if evento_id is None:
+        raise HTTPException(status_code=404, detail="Pedido no encontrado")
+    return db.get(models.PedidoEvento, evento_id)
+
+
 # ---------------------------------------------------------------------
 # Cambios de estado (dos formas):
 # A) Genérico PATCH /{id}/estado (para UI/admin)
 # B) Acciones POST /confirmar /entregar /cancelar /reabrir (para bot)
 # ---------------------------------------------------------------------
+def _accion_estado(
+    db: Session,
+    pedido_id: int,
+    destino: str,
+    nota: str | None = None,
+    validar=None,
+    usuario: str | None = None,
+) -> tuple[models.Pedido | None, dict | None]:
+    """
+    Pasa el pedido a `destino` como trabajo de escritura (services.escritor).
+    `validar(actual)` devuelve un dict de error o None; por defecto se usa
+    la tabla TRANSICIONES. Devuelve (pedido recargado, None) o (None, error).
+    """
+    def trabajo(s: Session) -> dict | None:
+        pedido = s.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
+        if not pedido:
+            return {"ok": False, "error": "Pedido no encontrado", "pedido_id": pedido_id}
+
+        actual = (pedido.estado or "").strip().upper()
+        if validar is not None:
+            error = validar(actual)
+        elif destino not in TRANSICIONES.get(actual, set()):
+            error = {
+                "error": f"Transición inválida: {actual} -> {destino}",
+                "estado_actual": actual,
+                "permitidos": sorted(list(TRANSICIONES.get(actual, set()))),
+            }
+        else:
+            error = None
+        if error:
+            return {"ok": False, "error": error.pop("error"), "pedido_id": pedido.id, **error}
+
+        pedido.estado = destino
+        mover_estado(s, [pedido.id], actual, destino)
+        s.add(
+            models.PedidoEvento(
+                pedido_id=pedido.id,
+                tipo="estado",
+                estado_anterior=actual,
+                estado_nuevo=destino,
+                nota=nota,
+                usuario=usuario,
+            )
+        )
+        return None
+
+    error = escribir(db, trabajo)
+    if error:
+        return None, error
+
+    _invalidar_resumen(pedido_id)
+    pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).one()
+    return pedido, None
+
+
+def _motivo(payload: schemas.PedidoCancelar | None) -> str | None:
+    if payload and getattr(payload, "motivo", None):
+        return (payload.motivo or "").strip() or None
+    return None
+
+
 @router.patch("/{pedido_id}/estado", response_model=schemas.PedidoRead)
 def cambiar_estado_pedido(
     pedido_id: int,
     payload: schemas.PedidoEstadoUpdate,
     db: Session = Depends(get_db),
+    usuario: str | None = Depends(usuario_actual),
 ):
     estado = normalizar_estado(payload.estado)
 
@@ -261,71 +690,153 @@ def cambiar_estado_pedido(
             detail=f"Estado inválido: {estado!r}. Válidos: {sorted(ESTADOS_VALIDOS)}",
         )
 
-    pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
-    if not pedido:
+    def validar(actual: str) -> dict | None:
+        permitidos = TRANSICIONES.get(actual)
+        if permitidos is None:
+            raise HTTPException(status_code=409, detail=f"Estado actual inválido en DB: {actual!r}")
+        if estado not in permitidos:
+            raise HTTPException(status_code=409, detail=f"Transición inválida: {actual} -> {estado}")
+        return None
+
+    pedido, error = _accion_estado(db, pedido_id, estado, validar=validar, usuario=usuario)
+    if error:
         raise HTTPException(status_code=404, detail="Pedido no encontrado")
+    return pedido
 
-    actual = (pedido.estado or "").strip().upper()
-    permitidos = TRANSICIONES.get(actual)
 
-    if permitidos is None:
-        raise HTTPException(status_code=409, detail=f"Estado actual inválido en DB: {actual!r}")
+@router.post("/estado/bulk", response_model=schemas.PedidosEstadoBulkResponse)
+def cambiar_estado_masivo(
+    payload: schemas.PedidosEstadoBulk,
+    db: Session = Depends(get_db),
+    usuario: str | None = Depends(usuario_actual),
+):
+    """
+    Cambia el estado de muchos pedidos a la vez (despacho confirma o entrega
+    50+ juntos): una query valida todos contra TRANSICIONES, un UPDATE
+    masivo por estado de origen aplica el cambio (con un evento por pedido
+    en pedido_eventos) y hay un solo commit. El resumen de WhatsApp
+    se arma sólo con incluir_resumen=true.
+    """
+    destino = normalizar_estado(payload.estado)
+    ids = list(dict.fromkeys(payload.ids))  # sin repetidos, en el orden pedido
 
-    if estado not in permitidos:
-        raise HTTPException(status_code=409, detail=f"Transición inválida: {actual} -> {estado}")
+    nota = _motivo(payload)
 
-    pedido.estado = estado
-    db.add(pedido)
-    db.commit()
-    db.refresh(pedido)
-    return pedido
+    def trabajo(s: Session) -> dict[int, schemas.PedidoEstadoBulkResultado]:
+        actuales = dict(
+            s.query(models.Pedido.id, models.Pedido.estado).filter(models.Pedido.id.in_(ids))
+        )
+
+        resultados: dict[int, schemas.PedidoEstadoBulkResultado] = {}
+        validos: list[int] = []
+        for pedido_id in ids:
+            if pedido_id not in actuales:
+                resultados[pedido_id] = schemas.PedidoEstadoBulkResultado(
+                    pedido_id=pedido_id, ok=False, error="Pedido no encontrado"
+                )
+                continue
+            actual = (actuales[pedido_id] or "").strip().upper()
+            permitidos = TRANSICIONES.get(actual, set())
+            resultados[pedido_id] = schemas.PedidoEstadoBulkResultado(
+                pedido_id=pedido_id, ok=destino in permitidos, estado_anterior=actual
+            )
+            if destino in permitidos:
+                validos.append(pedido_id)
+            else:
+                resultados[pedido_id].error = f"Transición inválida: {actual} -> {destino}"
+                resultados[pedido_id].permitidos = sorted(permitidos)
+
+        if not validos:
+            return resultados
+
+        # Un UPDATE por estado de origen, con el estado leído en el WHERE: si
+        # otro request cambió el pedido después de la lectura, no se pisa (y
+        # el rollup y el evento nunca usan un estado_anterior viejo)
+        por_leido: dict[str, list[int]] = {}
+        for pedido_id in validos:
+            por_leido.setdefault(actuales[pedido_id], []).append(pedido_id)
+        aplicados: set[int] = set()
+        for leido, ids_leido in por_leido.items():
+            aplicados.update(
+                s.scalars(
+                    update(models.Pedido)
+                    .where(models.Pedido.id.in_(ids_leido), models.Pedido.estado == leido)
+                    .values(estado=destino, actualizado_en=datetime.utcnow())
+                    .returning(models.Pedido.id)
+                )
+            )
+        if aplicados:
+            por_origen: dict[str, list[int]] = {}
+            for pedido_id in aplicados:
+                por_origen.setdefault(resultados[pedido_id].estado_anterior, []).append(pedido_id)
+            for anterior, ids_origen in por_origen.items():
+                mover_estado(s, ids_origen, anterior, destino)
+            s.execute(
+                insert(models.PedidoEvento),
+                [
+                    {
+                        "pedido_id": pedido_id,
+                        "tipo": "estado",
+                        "estado_anterior": resultados[pedido_id].estado_anterior,
+                        "estado_nuevo": destino,
+                        "nota": nota,
+                        "usuario": usuario,
+                    }
+                    for pedido_id in validos
+                    if pedido_id in aplicados
+                ],
+            )
+        for pedido_id in validos:
+            if pedido_id in aplicados:
+                resultados[pedido_id].estado = destino
+            else:
+                resultados[pedido_id].ok = False
+                resultados[pedido_id].error = "El pedido cambió de estado mientras se procesaba"
+        return resultados
+
+    resultados = escribir(db, trabajo)
+
+    aplicados = [r.pedido_id for r in resultados.values() if r.ok]
+    for pedido_id in aplicados:
+        _invalidar_resumen(pedido_id)
+
+    if payload.incluir_resumen and aplicados:
+        pedidos = db.query(models.Pedido).filter(models.Pedido.id.in_(aplicados)).all()
+        for pedido_id, texto in _build_resumenes(db, pedidos).items():
+            resultados[pedido_id].resumen = texto
+
+    return schemas.PedidosEstadoBulkResponse(
+        ok=len(aplicados) == len(ids),
+        estado=destino,
+        actualizados=len(aplicados),
+        con_error=len(ids) - len(aplicados),
+        resultados=[resultados[pedido_id] for pedido_id in ids],
+    )
 
 
 @router.post("/{pedido_id}/confirmar")
-def confirmar_pedido(pedido_id: int, db: Session = Depends(get_db)):
-    pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
-    if not pedido:
-        return {"ok": False, "error": "Pedido no encontrado", "pedido_id": pedido_id}
-
-    actual = (pedido.estado or "").strip().upper()
-    if "CONFIRMADO" not in TRANSICIONES.get(actual, set()):
-        return {
-            "ok": False,
-            "error": f"Transición inválida: {actual} -> CONFIRMADO",
-            "pedido_id": pedido.id,
-            "estado_actual": actual,
-            "permitidos": sorted(list(TRANSICIONES.get(actual, set()))),
-        }
-
-    pedido.estado = "CONFIRMADO"
-    db.add(pedido)
-    db.commit()
-    db.refresh(pedido)
+def confirmar_pedido(
+    pedido_id: int,
+    db: Session = Depends(get_db),
+    usuario: str | None = Depends(usuario_actual),
+):
+    pedido, error = _accion_estado(db, pedido_id, "CONFIRMADO", usuario=usuario)
+    if error:
+        return error
 
     resumen = _build_resumen_texto(pedido, db)
     return {"ok": True, "pedido_id": pedido.id, "estado": pedido.estado, "resumen": resumen, "pedido": pedido}
 
 
 @router.post("/{pedido_id}/entregar")
-def entregar_pedido(pedido_id: int, db: Session = Depends(get_db)):
-    pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
-    if not pedido:
-        return {"ok": False, "error": "Pedido no encontrado", "pedido_id": pedido_id}
-
-    actual = (pedido.estado or "").strip().upper()
-    if "ENTREGADO" not in TRANSICIONES.get(actual, set()):
-        return {
-            "ok": False,
-            "error": f"Transición inválida: {actual} -> ENTREGADO",
-            "pedido_id": pedido.id,
-            "estado_actual": actual,
-            "permitidos": sorted(list(TRANSICIONES.get(actual, set()))),
-        }
-
-    pedido.estado = "ENTREGADO"
-    db.add(pedido)
-    db.commit()
-    db.refresh(pedido)
+def entregar_pedido(
+    pedido_id: int,
+    db: Session = Depends(get_db),
+    usuario: str | None = Depends(usuario_actual),
+):
+    pedido, error = _accion_estado(db, pedido_id, "ENTREGADO", usuario=usuario)
+    if error:
+        return error
 
     resumen = _build_resumen_texto(pedido, db)
     return {"ok": True, "pedido_id": pedido.id, "estado": pedido.estado, "resumen": resumen}
@@ -336,34 +847,13 @@ def cancelar_pedido_accion(
     pedido_id: int,
     payload: schemas.PedidoCancelar | None = None,  # {"motivo": "..."}
     db: Session = Depends(get_db),
+    usuario: str | None = Depends(usuario_actual),
 ):
-    pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
-    if not pedido:
-        return {"ok": False, "error": "Pedido no encontrado", "pedido_id": pedido_id}
-
-    actual = (pedido.estado or "").strip().upper()
-    if "CANCELADO" not in TRANSICIONES.get(actual, set()):
-        return {
-            "ok": False,
-            "error": f"Transición inválida: {actual} -> CANCELADO",
-            "pedido_id": pedido.id,
-            "estado_actual": actual,
-            "permitidos": sorted(list(TRANSICIONES.get(actual, set()))),
-        }
-
-    motivo = ""
-    if payload and getattr(payload, "motivo", None):
-        motivo = (payload.motivo or "").strip()
-
-    if motivo:
-        _append_obs(pedido, f"[CANCELADO] {motivo}")
-    else:
-        _append_obs(pedido, "[CANCELADO]")
-
-    pedido.estado = "CANCELADO"
-    db.add(pedido)
-    db.commit()
-    db.refresh(pedido)
+    pedido, error = _accion_estado(
+        db, pedido_id, "CANCELADO", nota=_motivo(payload), usuario=usuario
+    )
+    if error:
+        return error
 
     resumen = _build_resumen_texto(pedido, db)
     return {"ok": True, "pedido_id": pedido.id, "estado": pedido.estado, "resumen": resumen}
@@ -374,34 +864,21 @@ def reabrir_pedido(
     pedido_id: int,
     payload: schemas.PedidoCancelar | None = None,  # reuse schema: {"motivo": "..."}
     db: Session = Depends(get_db),
+    usuario: str | None = Depends(usuario_actual),
 ):
-    pedido = db.query(models.Pedido).filter(models.Pedido.id == pedido_id).first()
-    if not pedido:
-        return {"ok": False, "error": "Pedido no encontrado", "pedido_id": pedido_id}
-
-    actual = (pedido.estado or "").strip().upper()
-    if actual != "CANCELADO":
-        return {
-            "ok": False,
-            "error": f"Solo se puede reabrir si está CANCELADO (actual: {actual})",
-            "pedido_id": pedido.id,
-            "estado_actual": actual,
-        }
-
-    motivo = ""
-    if payload and getattr(payload, "motivo", None):
-        motivo = (payload.motivo or "").strip()
-
-    if motivo:
-        _append_obs(pedido, f"[REABIERTO] {motivo}")
-    else:
-        _append_obs(pedido, "[REABIERTO]")
-
-    pedido.estado = "NUEVO"
-    db.add(pedido)
-    db.commit()
-    db.refresh(pedido)
+    def validar(actual: str) -> dict | None:
+        if actual != "CANCELADO":
+            return {
+                "error": f"Solo se puede reabrir si está CANCELADO (actual: {actual})",
+                "estado_actual": actual,
+            }
+        return None
+
+    pedido, error = _accion_estado(
+        db, pedido_id, "NUEVO", nota=_motivo(payload), validar=validar, usuario=usuario
+    )
+    if error:
+        return error
 
     resumen = _build_resumen_texto(pedido, db)
     return {"ok": True, "pedido_id": pedido.id, "estado": pedido.estado, "resumen": resumen}
-
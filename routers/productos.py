@@ -1,30 +1,65 @@
 # routers/productos.py
 
-from fastapi import APIRouter, Depends, Query, HTTPException
+from fastapi import APIRouter, Depends, Query, HTTPException, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import or_
 
 import models
 import schemas
 from database import get_db
+from services.busqueda import fts_activo, fts_query, match_productos
+from services.catalogo import bump_version, obtener_catalogo
+from utils.paginacion import paginar, paginar_lista, set_next_cursor
 
 router = APIRouter(prefix="/productos", tags=["productos"])
 
 
 @router.get("/", response_model=list[schemas.ProductoRead])
 def listar_productos(
-    q: str | None = Query(default=None, description="Buscar por nombre (y opcionales si existen)"),
+    response: Response,
+    q: str | None = Query(default=None, description="Buscar por nombre, presentación, categoría o código"),
+    orden: str = Query(default="reciente", pattern="^(reciente|relevancia)$"),
     solo_activos: bool = Query(default=False),
     limit: int = Query(default=50, ge=1, le=200),
     offset: int = Query(default=0, ge=0),
+    cursor: str | None = Query(default=None, description="Cursor opaco (header X-Next-Cursor de la página anterior)"),
     db: Session = Depends(get_db),
 ):
+    """
+    Lista productos (más nuevos primero). Con `q` busca por palabras al
+    inicio ("panch" encuentra "panchos", no "chos"); si alguna palabra tiene
+    menos de 3 letras busca la subcadena. orden=relevancia se pagina con
+    offset: no acepta cursor ni devuelve X-Next-Cursor.
+    """
+    if cursor and orden == "relevancia":
+        raise HTTPException(
+            status_code=400,
+            detail="orden=relevancia se pagina con offset; cursor sólo vale con orden=reciente",
+        )
+
+    # Sin texto de búsqueda se sirve directo del cache de catálogo
+    if not q:
+        filas = obtener_catalogo(db).listar(solo_activos=solo_activos)
+        productos = paginar_lista(filas, limit, offset, cursor)
+        set_next_cursor(response, productos, limit)
+        return productos
+
     query = db.query(models.Producto)
 
     if solo_activos:
         query = query.filter(models.Producto.activo == True)  # noqa: E712
 
-    if q:
+    if q and fts_activo(db) and fts_query(q):
+        match = match_productos(q.strip())
+        query = query.join(match, match.c.id == models.Producto.id)
+        if orden == "relevancia":
+            return (
+                query.order_by(match.c.rank, models.Producto.id.desc())
+                .offset(offset)
+                .limit(limit)
+                .all()
+            )
+    elif q:
         q2 = q.strip()
         like = f"%{q2}%"
 
@@ -40,7 +75,9 @@ def listar_productos(
 
         query = query.filter(or_(*filtros))
 
-    return query.order_by(models.Producto.id.desc()).offset(offset).limit(limit).all()
+    productos = paginar(query, models.Producto.id, limit, offset, cursor).all()
+    set_next_cursor(response, productos, limit)
+    return productos
 
 
 @router.get("/{producto_id}", response_model=schemas.ProductoRead)
@@ -73,7 +110,13 @@ def editar_producto(
     for k, v in data.items():
         setattr(producto, k, v)
 
+    # Editado a mano: sin hash, la próxima importación vuelve a escribir la
+    # fila del archivo en vez de tomarla como "sin cambios"
+    if data.keys() - {"activo"}:
+        producto.hash_contenido = None
+
     db.add(producto)
+    bump_version(db)
     db.commit()
     db.refresh(producto)
     return producto
@@ -91,6 +134,7 @@ def activar_producto(
 
     producto.activo = True
     db.add(producto)
+    bump_version(db)
     db.commit()
     db.refresh(producto)
 
@@ -108,6 +152,7 @@ def desactivar_producto(
 
     producto.activo = False
     db.add(producto)
+    bump_version(db)
     db.commit()
     db.refresh(producto)
 
@@ -0,0 +1,111 @@
+# routers/reparto.py
+
+import os
+import time
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+import models
+import schemas
+from database import get_db
+from services.reparto import ordenar_paradas
+from services.reportes import inicio_dia_utc
+from utils.geo import parse_coordenadas
+
+router = APIRouter(prefix="/reparto", tags=["reparto"])
+
+# Depósito por defecto ("lat,lng"); sin origen la ruta arranca en un extremo
+REPARTO_ORIGEN = os.getenv("REPARTO_ORIGEN")
+# Paradas (clientes distintos) por ruta
+MAX_PARADAS = 1000
+
+
+@router.get("/ruta", response_model=schemas.RepartoRuta)
+def ruta_reparto(
+    fecha: date | None = Query(default=None, description="Sólo pedidos creados ese día (local); default: todos los CONFIRMADO"),
+    barrio: str | None = Query(default=None),
+    vendedor: str | None = Query(default=None),
+    origen: str | None = Query(default=None, description='Depósito "lat,lng" (default: REPARTO_ORIGEN)'),
+    volver: bool = Query(default=True, description="Cerrar la ruta volviendo al origen"),
+    db: Session = Depends(get_db),
+):
+    """
+    Orden de visita de los pedidos CONFIRMADO (una parada por cliente),
+    con vecino más cercano + 2-opt (services.reparto).
+    """
+    punto_origen = None
+    texto_origen = origen or REPARTO_ORIGEN
+    if texto_origen:
+        punto_origen = parse_coordenadas(texto_origen)
+        if punto_origen is None:
+            raise HTTPException(status_code=422, detail=f"Origen inválido: {texto_origen!r} (usar \"lat,lng\")")
+
+    P, C = models.Pedido, models.Cliente
+    query = (
+        select(P.id, P.cliente_id, C.nombre, C.direccion, C.barrio, C.lat, C.lng)
+        .join(C, C.id == P.cliente_id)
+        .where(P.estado == "CONFIRMADO")
+        .order_by(P.id)
+    )
+    if fecha:
+        query = query.where(
+            P.fecha_creacion >= inicio_dia_utc(fecha),
+            P.fecha_creacion < inicio_dia_utc(fecha + timedelta(days=1)),
+        )
+    if barrio:
+        query = query.where(C.barrio == barrio)
+    if vendedor:
+        query = query.where(C.vendedor == vendedor)
+
+    paradas: dict[int, dict] = {}
+    sin_coordenadas: list[int] = []
+    for fila in db.execute(query):
+        if fila.lat is None or fila.lng is None:
+            sin_coordenadas.append(fila.id)
+            continue
+        parada = paradas.setdefault(
+            fila.cliente_id,
+            {
+                "cliente_id": fila.cliente_id,
+                "nombre": fila.nombre,
+                "direccion": fila.direccion,
+                "barrio": fila.barrio,
+                "lat": fila.lat,
+                "lng": fila.lng,
+                "pedido_ids": [],
+            },
+        )
+        parada["pedido_ids"].append(fila.id)
+
+    if len(paradas) > MAX_PARADAS:
+        raise HTTPException(
+            status_code=422,
+            detail=f"{len(paradas)} paradas (máximo {MAX_PARADAS}): filtrar por fecha, barrio o vendedor",
+        )
+
+    inicio = time.perf_counter()
+    lista = list(paradas.values())
+    orden, tramos = ordenar_paradas([(p["lat"], p["lng"]) for p in lista], punto_origen, volver)
+    calculo_ms = (time.perf_counter() - inicio) * 1000
+
+    resultado: list[schemas.RepartoParada] = []
+    acumulado = 0.0
+    for n, (idx, km) in enumerate(zip(orden, tramos), 1):
+        acumulado += km
+        resultado.append(
+            schemas.RepartoParada(
+                orden=n, **lista[idx], distancia_km=round(km, 3), acumulado_km=round(acumulado, 3)
+            )
+        )
+
+    return schemas.RepartoRuta(
+        origen=list(punto_origen) if punto_origen else None,
+        volver=volver,
+        paradas=resultado,
+        distancia_total_km=round(sum(tramos), 3),
+        sin_coordenadas=sin_coordenadas,
+        calculo_ms=round(calculo_ms, 1),
+    )
@@ -0,0 +1,94 @@
+# routers/reportes.py
+
+from datetime import date, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+import schemas
+from database import get_db
+from services import reportes
+
+router = APIRouter(prefix="/reportes", tags=["reportes"])
+
+# Rango máximo por consulta (días)
+MAX_DIAS = 366
+
+
+def rango_fechas(
+    desde: date | None = Query(default=None, description="Día local (YYYY-MM-DD); default: hasta - 30 días"),
+    hasta: date | None = Query(default=None, description="Día local (YYYY-MM-DD), inclusive; default: hoy"),
+) -> tuple[date, date]:
+    hasta = hasta or reportes.hoy_local()
+    desde = desde or hasta - timedelta(days=30)
+    if desde > hasta:
+        raise HTTPException(status_code=422, detail="desde no puede ser posterior a hasta")
+    if (hasta - desde).days >= MAX_DIAS:
+        raise HTTPException(status_code=422, detail=f"El rango no puede superar {MAX_DIAS} días")
+    return desde, hasta
+
+
+@router.get("/ventas", response_model=schemas.ReporteVentas)
+def reporte_ventas(
+    rango: tuple[date, date] = Depends(rango_fechas),
+    agrupar: str = Query(default="dia", pattern="^(dia|canal|estado|dia_canal|total)$"),
+    canal: str | None = Query(default=None),
+    incluir_cancelados: bool = Query(default=False),
+    db: Session = Depends(get_db),
+):
+    """
+    Ventas por día / canal / estado (rollup ventas_diarias).
+    """
+    desde, hasta = rango
+    filas = reportes.ventas(db, desde, hasta, agrupar, canal, incluir_cancelados)
+    total = schemas.ReporteVentasFila(
+        pedidos=sum(f["pedidos"] for f in filas),
+        unidades=sum(f["unidades"] for f in filas),
+        total_bruto_cent=sum(f["total_bruto_cent"] for f in filas),
+        total_descuento_cent=sum(f["total_descuento_cent"] for f in filas),
+        total_neto_cent=sum(f["total_neto_cent"] for f in filas),
+    )
+    return schemas.ReporteVentas(desde=desde, hasta=hasta, agrupar=agrupar, filas=filas, total=total)
+
+
+@router.get("/productos", response_model=list[schemas.ReporteProductoFila])
+def reporte_productos(
+    rango: tuple[date, date] = Depends(rango_fechas),
+    orden: str = Query(default="total", pattern="^(total|unidades)$"),
+    limit: int = Query(default=50, ge=1, le=500),
+    incluir_cancelados: bool = Query(default=False),
+    db: Session = Depends(get_db),
+):
+    """
+    Ranking de productos del rango (rollup ventas_diarias_producto).
+    """
+    desde, hasta = rango
+    return reportes.productos(db, desde, hasta, orden, limit, incluir_cancelados)
+
+
+@router.get("/clientes", response_model=list[schemas.ReporteClienteFila])
+def reporte_clientes(
+    rango: tuple[date, date] = Depends(rango_fechas),
+    vendedor: str | None = Query(default=None),
+    limit: int = Query(default=50, ge=1, le=500),
+    incluir_cancelados: bool = Query(default=False),
+    db: Session = Depends(get_db),
+):
+    """
+    Ranking de clientes por total neto (rollup ventas_diarias_cliente).
+    """
+    desde, hasta = rango
+    return reportes.clientes(db, desde, hasta, limit, vendedor, incluir_cancelados)
+
+
+@router.get("/vendedores", response_model=list[schemas.ReporteVendedorFila])
+def reporte_vendedores(
+    rango: tuple[date, date] = Depends(rango_fechas),
+    incluir_cancelados: bool = Query(default=False),
+    db: Session = Depends(get_db),
+):
+    """
+    Ventas por vendedor (vendedor actual de cada cliente).
+    """
+    desde, hasta = rango
+    return reportes.vendedores(db, desde, hasta, incluir_cancelados)
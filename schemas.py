@@ -1,7 +1,7 @@
-from datetime import datetime
+from datetime import date, datetime
 from typing import List, Optional, Literal
 from enum import Enum
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, field_validator, model_validator
 
 
 # =========================
@@ -38,6 +38,12 @@ class ClienteRead(BaseModel):
     class Config:
         from_attributes = True  # Pydantic v2 (equivalente a orm_mode=True)
 
+class ClienteCercaRead(ClienteRead):
+    lat: float
+    lng: float
+    distancia_km: float
+    ultimo_pedido: Optional[datetime] = None   # sin contar cancelados
+
 class ClienteUpdate(BaseModel):
     numero_cliente: Optional[int] = None
     nombre: Optional[str] = None
@@ -83,16 +89,53 @@ class ProductoUpdate(BaseModel):
 # PEDIDOS
 # =========================
 class PedidoItemCreate(BaseModel):
-    producto_id: int
+    """
+    Ítem de pedido: el producto se indica por id o por código
+    (el bot manda códigos; la UI manda ids).
+    """
+    producto_id: Optional[int] = None
+    codigo: Optional[str] = None
     cantidad: int
     descripcion_extra: Optional[str] = None
 
+    @model_validator(mode="after")
+    def _producto_id_o_codigo(self):
+        if self.producto_id is None and not (self.codigo or "").strip():
+            raise ValueError("Cada ítem necesita producto_id o codigo")
+        return self
+
 
 class PedidoCreate(BaseModel):
     cliente_id: int
     canal: str
     observaciones: Optional[str] = None
     items: List[PedidoItemCreate]
+    origen_referencia: Optional[str] = Field(default=None, max_length=200)  # clave de idempotencia
+
+
+class PedidosBulkCreate(BaseModel):
+    """
+    Alta masiva de pedidos (carga nocturna de pedidos en papel).
+    """
+    modo: Literal["todo_o_nada", "mejor_esfuerzo"] = "todo_o_nada"
+    pedidos: List[PedidoCreate] = Field(min_length=1, max_length=1000)
+
+
+class PedidoBulkResultado(BaseModel):
+    indice: int  # posición en la lista enviada
+    ok: bool
+    pedido_id: Optional[int] = None
+    total_neto_cent: Optional[int] = None
+    status_code: Optional[int] = None
+    error: Optional[str] = None
+
+
+class PedidosBulkResponse(BaseModel):
+    ok: bool
+    modo: str
+    creados: int
+    con_error: int
+    resultados: List[PedidoBulkResultado]
 
 
 class PedidoItemRead(BaseModel):
@@ -107,7 +150,10 @@ class PedidoItemRead(BaseModel):
         from_attributes = True
 
 
-class PedidoRead(BaseModel):
+class PedidoHeaderRead(BaseModel):
+    """
+    Cabecera del pedido sin ítems (listados livianos: include_items=false).
+    """
     id: int
     cliente_id: int
     fecha_creacion: datetime
@@ -118,11 +164,14 @@ class PedidoRead(BaseModel):
     total_descuento_cent: int
     total_neto_cent: int
     observaciones: Optional[str] = None
-    items: List[PedidoItemRead]
 
     class Config:
         from_attributes = True
 
+
+class PedidoRead(PedidoHeaderRead):
+    items: List[PedidoItemRead]
+
 # Estados permitidos (mantenelo simple)
 class PedidoEstado(str, Enum):
     NUEVO = "NUEVO"
@@ -133,6 +182,44 @@ class PedidoEstado(str, Enum):
 class PedidoEstadoUpdate(BaseModel):
     estado: PedidoEstado
 
+class PedidoEventoRead(BaseModel):
+    id: int
+    pedido_id: int
+    tipo: str
+    estado_anterior: Optional[str] = None
+    estado_nuevo: Optional[str] = None
+    nota: Optional[str] = None
+    usuario: Optional[str] = None
+    creado_en: datetime
+
+    class Config:
+        from_attributes = True
+
+class PedidoNotaCreate(BaseModel):
+    nota: str = Field(min_length=1, max_length=2000)
+
+class PedidosEstadoBulk(BaseModel):
+    ids: List[int] = Field(min_length=1, max_length=500)
+    estado: PedidoEstado
+    motivo: Optional[str] = None  # queda como nota del evento de cambio de estado
+    incluir_resumen: bool = False
+
+class PedidoEstadoBulkResultado(BaseModel):
+    pedido_id: int
+    ok: bool
+    estado_anterior: Optional[str] = None
+    estado: Optional[str] = None
+    error: Optional[str] = None
+    permitidos: Optional[List[str]] = None
+    resumen: Optional[str] = None
+
+class PedidosEstadoBulkResponse(BaseModel):
+    ok: bool
+    estado: str
+    actualizados: int
+    con_error: int
+    resultados: List[PedidoEstadoBulkResultado]
+
 class PedidoUpdate(BaseModel):
     observaciones: Optional[str] = None
 
@@ -146,11 +233,21 @@ class BotItemCreate(BaseModel):
     codigo: str
     cantidad: int
 
+    @field_validator("codigo")
+    @classmethod
+    def _codigo_no_vacio(cls, v: str) -> str:
+        # se valida acá (422) y no al armar PedidoItemCreate en el handler
+        if not v.strip():
+            raise ValueError("codigo no puede estar vacío")
+        return v
+
 
 class BotPedidoFromWhatsApp(BaseModel):
     wa_phone: str                       # ej: "5491155732845"
     observaciones: Optional[str] = None
     items: List[BotItemCreate]          # productos por código
+    # id del mensaje de WhatsApp: si el gateway reintenta, devolvemos el pedido original
+    mensaje_id: Optional[str] = Field(default=None, max_length=190)
 
 
 class BotPedidoResponse(BaseModel):
@@ -158,3 +255,106 @@ class BotPedidoResponse(BaseModel):
     pedido_id: int
     cliente_id: int
     mensaje_respuesta: str
+    duplicado: bool = False             # True si es un reintento de un mensaje ya procesado
+
+
+class BotParseRequest(BaseModel):
+    texto: str                          # mensaje crudo: "2 combo pancho doble, 3 bolsones x15"
+
+
+class BotProductoCandidato(BaseModel):
+    codigo: Optional[str] = None        # Producto.codigo es nullable
+    nombre: str
+    presentacion: Optional[str] = None
+    precio_centavos: int
+    confianza: float
+
+
+class BotItemParseado(BaseModel):
+    linea: str                          # segmento original del mensaje
+    cantidad: int
+    producto: BotProductoCandidato
+    confirmar: bool                     # confianza baja: preguntarle al cliente
+    alternativas: List[BotProductoCandidato] = []
+
+
+class BotParseResponse(BaseModel):
+    items: List[BotItemParseado]
+    no_reconocidos: List[str]
+    total_estimado_cent: int
+
+
+# =========================
+# REPORTES (rollups diarios)
+# =========================
+class ReporteVentasFila(BaseModel):
+    fecha: Optional[date] = None        # según agrupar
+    canal: Optional[str] = None
+    estado: Optional[str] = None
+    pedidos: int
+    unidades: int
+    total_bruto_cent: int
+    total_descuento_cent: int
+    total_neto_cent: int
+
+
+class ReporteVentas(BaseModel):
+    desde: date
+    hasta: date
+    agrupar: str
+    filas: List[ReporteVentasFila]
+    total: ReporteVentasFila
+
+
+class ReporteProductoFila(BaseModel):
+    producto_id: int
+    codigo: Optional[str] = None
+    nombre: str
+    pedidos: int
+    unidades: int
+    total_cent: int                     # a precio de lista (sin descuento del cliente)
+
+
+class ReporteClienteFila(BaseModel):
+    cliente_id: int
+    numero_cliente: Optional[int] = None
+    nombre: str
+    vendedor: Optional[str] = None
+    pedidos: int
+    unidades: int
+    total_bruto_cent: int
+    total_neto_cent: int
+
+
+class ReporteVendedorFila(BaseModel):
+    vendedor: Optional[str] = None      # None = clientes sin vendedor asignado
+    clientes: int
+    pedidos: int
+    unidades: int
+    total_bruto_cent: int
+    total_neto_cent: int
+
+
+# =========================
+# REPARTO
+# =========================
+class RepartoParada(BaseModel):
+    orden: int                          # 1 = primera visita
+    cliente_id: int
+    nombre: str
+    direccion: Optional[str] = None
+    barrio: Optional[str] = None
+    lat: float
+    lng: float
+    pedido_ids: List[int]
+    distancia_km: float                 # desde la parada anterior (o el origen)
+    acumulado_km: float
+
+
+class RepartoRuta(BaseModel):
+    origen: Optional[List[float]] = None    # [lat, lng]
+    volver: bool
+    paradas: List[RepartoParada]
+    distancia_total_km: float           # incluye el regreso si volver=true
+    sin_coordenadas: List[int]          # pedidos cuyo cliente no tiene coordenadas
+    calculo_ms: float
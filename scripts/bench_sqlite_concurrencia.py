@@ -0,0 +1,129 @@
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+# Asegurar imports desde la raíz del proyecto (donde vive models.py)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import models  # noqa: E402
+from database import PERFILES_SQLITE, crear_engine  # noqa: E402
+from services.escritor import EscritorGrupal  # noqa: E402
+
+SEGUNDOS = float(os.getenv('BENCH_SEGUNDOS', '5'))
+ESCRITORES = int(os.getenv('BENCH_ESCRITORES', '4'))
+LECTORES = int(os.getenv('BENCH_LECTORES', '8'))
+
+
+def _preparar(Session):
+    with Session() as db:
+        db.add(models.Cliente(nombre='Bench', numero_cliente=1))
+        db.add_all(
+            models.Producto(codigo=f'BX{i:03d}', nombre=f'Producto {i}', precio_centavos=1000 + i)
+            for i in range(50)
+        )
+        db.commit()
+
+
+def _insertar_pedido(db):
+    pedido = models.Pedido(cliente_id=1, canal='bench', estado='NUEVO')
+    pedido.items = [
+        models.PedidoItem(producto_id=i + 1, cantidad=1, precio_unitario_cent=1000, subtotal_cent=1000)
+        for i in range(3)
+    ]
+    db.add(pedido)
+    db.flush()
+    return pedido.id
+
+
+def _escritor(Session, fin, stats, lock, grupal=None):
+    ok = err = 0
+    while time.monotonic() < fin:
+        try:
+            if grupal is not None:
+                grupal.ejecutar(_insertar_pedido)
+            else:
+                with Session() as db:
+                    _insertar_pedido(db)
+                    db.commit()
+            ok += 1
+        except OperationalError:  # "database is locked"
+            err += 1
+    with lock:
+        stats['escrituras'] += ok
+        stats['errores'] += err
+
+
+def _lector(Session, fin, stats, lock):
+    ok = err = 0
+    while time.monotonic() < fin:
+        try:
+            with Session() as db:
+                db.execute(
+                    select(models.Pedido.id, models.Pedido.estado)
+                    .order_by(models.Pedido.id.desc())
+                    .limit(50)
+                ).all()
+                db.execute(select(func.count(models.PedidoItem.id))).scalar()
+            ok += 1
+        except OperationalError:
+            err += 1
+    with lock:
+        stats['lecturas'] += ok
+        stats['errores'] += err
+
+
+def correr(perfil: str, grupal: bool = False) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = crear_engine(f'sqlite:///{tmp}/bench.db', perfil=perfil)
+        models.Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        _preparar(Session)
+
+        stats = {'escrituras': 0, 'lecturas': 0, 'errores': 0}
+        lock = threading.Lock()
+        escritor = EscritorGrupal(Session) if grupal else None
+        fin = time.monotonic() + SEGUNDOS
+        hilos = [
+            threading.Thread(target=_escritor, args=(Session, fin, stats, lock, escritor))
+            for _ in range(ESCRITORES)
+        ]
+        hilos += [threading.Thread(target=_lector, args=(Session, fin, stats, lock)) for _ in range(LECTORES)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        engine.dispose()
+    return stats
+
+
+def main():
+    """
+    Compara los perfiles de SQLite de database.py con escritores (pedidos de
+    3 items) y lectores (listado) concurrentes, y el perfil de producción con
+    el escritor grupal de services.escritor (ESCRITOR_GRUPAL=1). Uso:
+
+        BENCH_SEGUNDOS=10 BENCH_ESCRITORES=4 BENCH_LECTORES=8 \
+            python scripts/bench_sqlite_concurrencia.py
+    """
+    print(f'{SEGUNDOS:g}s, {ESCRITORES} escritores, {LECTORES} lectores')
+    print(f'{"perfil":<22}{"escrituras/s":>14}{"lecturas/s":>12}{"errores":>9}')
+    casos = [(perfil, False) for perfil in PERFILES_SQLITE] + [('produccion', True)]
+    for perfil, grupal in casos:
+        s = correr(perfil, grupal)
+        nombre = f'{perfil}+grupal' if grupal else perfil
+        print(
+            f'{nombre:<22}{s["escrituras"] / SEGUNDOS:>14.0f}'
+            f'{s["lecturas"] / SEGUNDOS:>12.0f}{s["errores"]:>9}'
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+import os
+import sys
+
+from sqlalchemy import create_engine, inspect, text
+
+# Asegurar imports desde la raíz del proyecto (donde vive models.py)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import models  # noqa: E402  (carga Base.metadata)
+from services.busqueda import crear_indices_fts  # noqa: E402
+
+DB_PATH = os.getenv('SQLITE_PATH', '/app/data/nortsur.db')
+
+
+def referencias_repetidas(conn) -> int:
+    """
+    Cantidad de origen_referencia no nulas repetidas en pedidos (con alguna,
+    el índice UNIQUE no se puede crear).
+    """
+    if 'origen_referencia' not in {c['name'] for c in inspect(conn).get_columns('pedidos')}:
+        return 0
+    return conn.execute(text("""
+        SELECT COUNT(*) FROM (
+            SELECT origen_referencia FROM pedidos
+            WHERE origen_referencia IS NOT NULL
+            GROUP BY origen_referencia HAVING COUNT(*) > 1
+        )
+    """)).scalar()
+
+
+def main():
+    """
+    create_all() no agrega índices a tablas que ya existen: este script crea
+    los índices declarados en models.py que falten y (re)arma las tablas FTS5.
+    Correr después de migrate_sqlite_add_missing_columns.py.
+    """
+    if not os.path.exists(DB_PATH):
+        raise SystemExit(f'DB no existe: {DB_PATH}')
+
+    engine = create_engine(f'sqlite:///{DB_PATH}')
+
+    # Tablas nuevas (si las hay) con sus índices
+    models.Base.metadata.create_all(bind=engine)
+
+    total = 0
+    omitidos = []
+    with engine.begin() as conn:
+        repetidas = referencias_repetidas(conn)
+        for table in models.Base.metadata.sorted_tables:
+            for index in table.indexes:
+                if index.name == 'ix_pedidos_origen_referencia' and repetidas:
+                    omitidos.append(index.name)
+                    continue
+                index.create(conn, checkfirst=True)
+                total += 1
+
+    ok_fts = crear_indices_fts(engine, reconstruir=True)
+
+    print(f'OK: índices verificados: {total} | FTS5: {"OK" if ok_fts else "no disponible"}')
+    if omitidos:
+        raise SystemExit(
+            f'[ERROR] ix_pedidos_origen_referencia NO se creó: hay {repetidas} origen_referencia '
+            'repetidas en pedidos y sin ese índice UNIQUE la idempotencia del bot y de '
+            '/pedidos/bulk no está garantizada. Correr scripts/migrate_sqlite_origen_referencia_unica.py.'
+        )
+
+
+if __name__ == '__main__':
+    main()
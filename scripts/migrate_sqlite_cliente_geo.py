@@ -0,0 +1,63 @@
+import os
+import sys
+import sqlite3
+
+# Asegurar imports desde la raíz del proyecto (donde vive utils/)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from utils.geo import columnas_geo  # noqa: E402
+
+DB_PATH = os.getenv('SQLITE_PATH', '/app/data/nortsur.db')
+
+COLUMNAS = {
+    'lat': 'FLOAT',
+    'lng': 'FLOAT',
+    'geocelda': 'VARCHAR(12)',
+}
+
+
+def get_existing_columns(cur, table: str) -> set[str]:
+    cur.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cur.fetchall()}
+
+
+def main():
+    """
+    Pasa clientes.coordenadas ("lat,lng" en texto) a columnas numéricas
+    lat / lng + geocelda (geohash) indexada, con el mismo parseo que usan
+    la importación y la API. Se puede correr de nuevo sin problema.
+    """
+    if not os.path.exists(DB_PATH):
+        raise SystemExit(f'DB no existe: {DB_PATH}')
+
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    # 1) Columnas nuevas (si todavía no existen)
+    existentes = get_existing_columns(cur, 'clientes')
+    for columna, tipo in COLUMNAS.items():
+        if columna not in existentes:
+            cur.execute(f'ALTER TABLE clientes ADD COLUMN {columna} {tipo}')
+            print(f'[ADD] clientes.{columna}')
+
+    # 2) Índice por celda (mismo nombre que genera SQLAlchemy)
+    cur.execute('CREATE INDEX IF NOT EXISTS ix_clientes_geocelda ON clientes (geocelda)')
+
+    # 3) Backfill
+    cur.execute('SELECT id, coordenadas FROM clientes')
+    updates = []
+    for cliente_id, coordenadas in cur.fetchall():
+        geo = columnas_geo(coordenadas)
+        updates.append((geo['lat'], geo['lng'], geo['geocelda'], cliente_id))
+    cur.executemany('UPDATE clientes SET lat = ?, lng = ?, geocelda = ? WHERE id = ?', updates)
+
+    conn.commit()
+    conn.close()
+    con_coords = sum(1 for u in updates if u[0] is not None)
+    print(f'OK: coordenadas numéricas en {con_coords} de {len(updates)} clientes')
+
+
+if __name__ == '__main__':
+    main()
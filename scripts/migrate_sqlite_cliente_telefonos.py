@@ -0,0 +1,79 @@
+import os
+import sys
+import sqlite3
+
+# Asegurar imports desde la raíz del proyecto (donde vive services/)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+from services.clientes_services import telefonos_de  # noqa: E402
+
+DB_PATH = os.getenv('SQLITE_PATH', '/app/data/nortsur.db')
+
+
+def main():
+    if not os.path.exists(DB_PATH):
+        raise SystemExit(f'DB no existe: {DB_PATH}')
+
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    # 1) Tabla hija + índices (mismos nombres que genera SQLAlchemy)
+    cur.execute("""
+    CREATE TABLE IF NOT EXISTS cliente_telefonos (
+        id INTEGER PRIMARY KEY,
+        cliente_id INTEGER NOT NULL,
+        telefono VARCHAR,
+        telefono_normalizado VARCHAR NOT NULL,
+        FOREIGN KEY(cliente_id) REFERENCES clientes (id)
+    );
+    """)
+    cur.execute('CREATE INDEX IF NOT EXISTS ix_cliente_telefonos_id ON cliente_telefonos (id)')
+    cur.execute(
+        'CREATE INDEX IF NOT EXISTS ix_cliente_telefonos_cliente_id '
+        'ON cliente_telefonos (cliente_id)'
+    )
+    cur.execute(
+        'CREATE INDEX IF NOT EXISTS ix_cliente_telefonos_telefono_normalizado '
+        'ON cliente_telefonos (telefono_normalizado)'
+    )
+
+    # 2) Backfill completo: se regenera a partir de clientes.telefono
+    cur.execute('SELECT id, telefono FROM clientes')
+    filas = []
+    clientes = 0
+    for cliente_id, telefono in cur.fetchall():
+        filas.extend((cliente_id, raw, norm) for raw, norm in telefonos_de(telefono))
+        clientes += 1
+
+    cur.execute('DELETE FROM cliente_telefonos')
+    cur.executemany(
+        'INSERT INTO cliente_telefonos (cliente_id, telefono, telefono_normalizado) VALUES (?, ?, ?)',
+        filas,
+    )
+
+    # 3) clientes.telefono_normalizado (versión anterior, un solo número por
+    #    cliente) ya no se usa: las búsquedas van contra cliente_telefonos
+    cur.execute('DROP INDEX IF EXISTS ix_clientes_telefono_normalizado')
+    cols = {row[1] for row in cur.execute('PRAGMA table_info(clientes)').fetchall()}
+    if 'telefono_normalizado' in cols:
+        if sqlite3.sqlite_version_info >= (3, 35, 0):
+            cur.execute('ALTER TABLE clientes DROP COLUMN telefono_normalizado')
+            print('[DROP] clientes.telefono_normalizado')
+        else:
+            print(
+                f'[WARN] SQLite {sqlite3.sqlite_version} no admite DROP COLUMN (hace falta >= 3.35): '
+                'la columna clientes.telefono_normalizado queda en la base, sin índice y sin uso. '
+                'La app ya no la lee ni la escribe (los datos pueden quedar viejos); '
+                'para sacarla, volver a correr este script con un SQLite más nuevo.',
+                file=sys.stderr,
+            )
+
+    conn.commit()
+    conn.close()
+    print(f'OK: {len(filas)} teléfonos cargados para {clientes} clientes')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+import os
+import sqlite3
+
+DB_PATH = os.getenv('SQLITE_PATH', '/app/data/nortsur.db')
+
+
+def main():
+    """
+    numero_cliente pasa a ser único y a salir de la tabla `secuencias`:
+    1) renumera los repetidos (se queda con el número el cliente más viejo;
+       los demás reciben números nuevos a continuación del mayor),
+    2) reemplaza el índice ix_clientes_numero_cliente por uno UNIQUE,
+    3) crea la secuencia 'numero_cliente' en el mayor número usado.
+    """
+    if not os.path.exists(DB_PATH):
+        raise SystemExit(f'DB no existe: {DB_PATH}')
+
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    cur.execute('SELECT COALESCE(MAX(numero_cliente), 0) FROM clientes')
+    siguiente = cur.fetchone()[0]
+
+    cur.execute("""
+        SELECT id, numero_cliente FROM clientes c
+        WHERE numero_cliente IS NOT NULL
+          AND EXISTS (
+              SELECT 1 FROM clientes o
+              WHERE o.numero_cliente = c.numero_cliente AND o.id < c.id
+          )
+        ORDER BY id
+    """)
+    repetidos = cur.fetchall()
+    for cliente_id, numero in repetidos:
+        siguiente += 1
+        cur.execute('UPDATE clientes SET numero_cliente = ? WHERE id = ?', (siguiente, cliente_id))
+        print(f'[RENUMERADO] cliente id={cliente_id}: {numero} -> {siguiente}')
+
+    cur.execute('DROP INDEX IF EXISTS ix_clientes_numero_cliente')
+    cur.execute('CREATE UNIQUE INDEX ix_clientes_numero_cliente ON clientes (numero_cliente)')
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS secuencias (
+            nombre VARCHAR NOT NULL PRIMARY KEY,
+            valor BIGINT NOT NULL
+        )
+    """)
+    cur.execute(
+        "INSERT INTO secuencias (nombre, valor) VALUES ('numero_cliente', ?) "
+        "ON CONFLICT(nombre) DO UPDATE SET valor = MAX(valor, excluded.valor)",
+        (siguiente,),
+    )
+
+    conn.commit()
+    conn.close()
+    print(f'OK: renumerados: {len(repetidos)} | secuencia numero_cliente = {siguiente}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,51 @@
+import os
+import sqlite3
+
+DB_PATH = os.getenv('SQLITE_PATH', '/app/data/nortsur.db')
+
+
+def main():
+    """
+    pedidos.origen_referencia pasa a ser única (idempotencia del bot y de
+    POST /pedidos/bulk):
+    1) resuelve las referencias repetidas (se queda con la referencia el
+       pedido más viejo; a los demás se les agrega el sufijo "#dup-<id>"),
+    2) reemplaza el índice ix_pedidos_origen_referencia por uno UNIQUE.
+    Correr antes de migrate_sqlite_add_missing_indexes.py (que no crea el
+    índice si hay repetidas).
+    """
+    if not os.path.exists(DB_PATH):
+        raise SystemExit(f'DB no existe: {DB_PATH}')
+
+    conn = sqlite3.connect(DB_PATH)
+    cur = conn.cursor()
+
+    cols = {row[1] for row in cur.execute('PRAGMA table_info(pedidos)').fetchall()}
+    if 'origen_referencia' not in cols:
+        raise SystemExit('Falta pedidos.origen_referencia: correr antes migrate_sqlite_add_missing_columns.py')
+
+    cur.execute("""
+        SELECT id, origen_referencia FROM pedidos p
+        WHERE origen_referencia IS NOT NULL
+          AND EXISTS (
+              SELECT 1 FROM pedidos o
+              WHERE o.origen_referencia = p.origen_referencia AND o.id < p.id
+          )
+        ORDER BY id
+    """)
+    repetidos = cur.fetchall()
+    for pedido_id, ref in repetidos:
+        nueva = f'{ref}#dup-{pedido_id}'
+        cur.execute('UPDATE pedidos SET origen_referencia = ? WHERE id = ?', (nueva, pedido_id))
+        print(f'[RENOMBRADO] pedido id={pedido_id}: {ref!r} -> {nueva!r}')
+
+    cur.execute('DROP INDEX IF EXISTS ix_pedidos_origen_referencia')
+    cur.execute('CREATE UNIQUE INDEX ix_pedidos_origen_referencia ON pedidos (origen_referencia)')
+
+    conn.commit()
+    conn.close()
+    print(f'OK: referencias repetidas resueltas: {len(repetidos)} | ix_pedidos_origen_referencia UNIQUE')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+import os
+import sys
+from datetime import date
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+# Asegurar imports desde la raíz del proyecto (donde vive models.py)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import models  # noqa: E402
+from services.reportes import reconstruir  # noqa: E402
+
+DB_PATH = os.getenv('SQLITE_PATH', '/app/data/nortsur.db')
+
+
+def main():
+    """
+    Rearma los rollups de reportes (ventas_diarias*) desde pedidos. Sirve
+    de backfill la primera vez y después de corregir pedidos a mano. Uso:
+
+        python scripts/reconstruir_reportes.py                  # todo
+        python scripts/reconstruir_reportes.py 2025-01-01       # desde
+        python scripts/reconstruir_reportes.py 2025-01-01 2025-01-31
+
+    Las fechas son días locales (REPORTES_UTC_OFFSET_HORAS, default -3).
+    Todo el rango se rearma en una sola transacción.
+    """
+    if not os.path.exists(DB_PATH):
+        raise SystemExit(f'DB no existe: {DB_PATH}')
+
+    try:
+        fechas = [date.fromisoformat(a) for a in sys.argv[1:3]]
+    except ValueError as exc:
+        raise SystemExit(f'Fecha inválida (usar YYYY-MM-DD): {exc}')
+    desde = fechas[0] if len(fechas) > 0 else None
+    hasta = fechas[1] if len(fechas) > 1 else None
+
+    engine = create_engine(f'sqlite:///{DB_PATH}')
+    # Tablas de rollup (si la base es anterior a los reportes)
+    models.Base.metadata.create_all(bind=engine)
+
+    Session = sessionmaker(bind=engine, autoflush=False)
+    with Session() as db:
+        total = reconstruir(db, desde, hasta)
+        db.commit()
+
+    rango = f'{desde or "inicio"} .. {hasta or "hoy"}'
+    print(f'OK: rollups de reportes reconstruidos ({rango}): {total} pedidos')
+
+
+if __name__ == '__main__':
+    main()
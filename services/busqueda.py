@@ -0,0 +1,196 @@
+# services/busqueda.py
+"""
+Búsqueda full-text con SQLite FTS5.
+
+- clientes_fts: nombre, teléfono (texto original), barrio y todos los
+  teléfonos normalizados de cliente_telefonos.
+- productos_fts: nombre, presentación, categoría y código.
+
+Las tablas FTS usan rowid = id de la tabla original y se mantienen
+sincronizadas con triggers, así cualquier camino de escritura (API,
+importador, scripts) las actualiza. El tokenizer unicode61 con
+remove_diacritics hace que "Martin" encuentre "Martín" y viceversa.
+
+FTS busca palabras por prefijo ("panch" encuentra "panchos"), no
+subcadenas sueltas: "chos" no encuentra "panchos". Las búsquedas con
+alguna palabra de menos de MIN_PREFIJO letras ("a", "pe") van por ILIKE,
+como antes, para no perder resultados.
+
+Si la base no es SQLite (o no tiene FTS5), fts_activo() devuelve False y
+los routers siguen usando ILIKE.
+"""
+import logging
+import re
+
+from sqlalchemy import Float, Integer, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+_TOKENIZER = "unicode61 remove_diacritics 2"
+
+# Largo mínimo de cada palabra para buscar por FTS (si no, ILIKE)
+MIN_PREFIJO = 3
+
+_TELEFONOS_DE = (
+    "(SELECT group_concat(telefono_normalizado, ' ') "
+    "FROM cliente_telefonos WHERE cliente_id = {ref})"
+)
+
+_DDL = [
+    # ---------------- clientes ----------------
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS clientes_fts USING fts5(
+        nombre, telefono, barrio, telefonos,
+        tokenize = '{_TOKENIZER}', prefix = '2 3'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS clientes_fts_ai AFTER INSERT ON clientes BEGIN
+        INSERT INTO clientes_fts(rowid, nombre, telefono, barrio, telefonos)
+        VALUES (new.id, new.nombre, new.telefono, new.barrio, {_TELEFONOS_DE.format(ref="new.id")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS clientes_fts_au AFTER UPDATE OF nombre, telefono, barrio ON clientes BEGIN
+        DELETE FROM clientes_fts WHERE rowid = old.id;
+        INSERT INTO clientes_fts(rowid, nombre, telefono, barrio, telefonos)
+        VALUES (new.id, new.nombre, new.telefono, new.barrio, {_TELEFONOS_DE.format(ref="new.id")});
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS clientes_fts_ad AFTER DELETE ON clientes BEGIN
+        DELETE FROM clientes_fts WHERE rowid = old.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS cliente_telefonos_fts_ai AFTER INSERT ON cliente_telefonos BEGIN
+        UPDATE clientes_fts SET telefonos = {_TELEFONOS_DE.format(ref="new.cliente_id")}
+        WHERE rowid = new.cliente_id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS cliente_telefonos_fts_ad AFTER DELETE ON cliente_telefonos BEGIN
+        UPDATE clientes_fts SET telefonos = {_TELEFONOS_DE.format(ref="old.cliente_id")}
+        WHERE rowid = old.cliente_id;
+    END
+    """,
+    # ---------------- productos ----------------
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS productos_fts USING fts5(
+        nombre, presentacion, categoria, codigo,
+        tokenize = '{_TOKENIZER}', prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS productos_fts_ai AFTER INSERT ON productos BEGIN
+        INSERT INTO productos_fts(rowid, nombre, presentacion, categoria, codigo)
+        VALUES (new.id, new.nombre, new.presentacion, new.categoria, new.codigo);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS productos_fts_au AFTER UPDATE OF nombre, presentacion, categoria, codigo ON productos BEGIN
+        DELETE FROM productos_fts WHERE rowid = old.id;
+        INSERT INTO productos_fts(rowid, nombre, presentacion, categoria, codigo)
+        VALUES (new.id, new.nombre, new.presentacion, new.categoria, new.codigo);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS productos_fts_ad AFTER DELETE ON productos BEGIN
+        DELETE FROM productos_fts WHERE rowid = old.id;
+    END
+    """,
+]
+
+_REBUILD = [
+    "DELETE FROM clientes_fts",
+    f"""
+    INSERT INTO clientes_fts(rowid, nombre, telefono, barrio, telefonos)
+    SELECT c.id, c.nombre, c.telefono, c.barrio, {_TELEFONOS_DE.format(ref="c.id")}
+    FROM clientes c
+    """,
+    "DELETE FROM productos_fts",
+    """
+    INSERT INTO productos_fts(rowid, nombre, presentacion, categoria, codigo)
+    SELECT id, nombre, presentacion, categoria, codigo FROM productos
+    """,
+]
+
+# Se marca en True cuando las tablas/triggers FTS quedaron creados en este proceso
+_FTS_LISTO = False
+
+
+def crear_indices_fts(engine: Engine, reconstruir: bool = False) -> bool:
+    """
+    Crea (si faltan) las tablas FTS5 y sus triggers. Si las tablas son nuevas
+    o se pide reconstruir, las llena a partir de clientes/productos.
+    Devuelve True si FTS quedó disponible.
+    """
+    global _FTS_LISTO
+
+    if engine.dialect.name != "sqlite":
+        return False
+
+    try:
+        with engine.begin() as conn:
+            existentes = {
+                row[0]
+                for row in conn.execute(
+                    text("SELECT name FROM sqlite_master WHERE name IN ('clientes_fts', 'productos_fts')")
+                )
+            }
+            for ddl in _DDL:
+                conn.execute(text(ddl))
+            if reconstruir or len(existentes) < 2:
+                for sql in _REBUILD:
+                    conn.execute(text(sql))
+    except Exception:  # SQLite compilado sin FTS5, DB de solo lectura, etc.
+        logger.warning("FTS5 no disponible; la búsqueda usa ILIKE", exc_info=True)
+        _FTS_LISTO = False
+        return False
+
+    _FTS_LISTO = True
+    return True
+
+
+def fts_activo(db: Session) -> bool:
+    return _FTS_LISTO and db.get_bind().dialect.name == "sqlite"
+
+
+def fts_query(texto: str | None) -> str | None:
+    """
+    Convierte texto libre en una consulta FTS5 segura: cada palabra como
+    prefijo entre comillas, todas requeridas ("panch" "dob" → panchos dobles).
+    Devuelve None (el router usa ILIKE) si no hay palabras o alguna es más
+    corta que MIN_PREFIJO.
+    """
+    tokens = re.findall(r"\w+", texto or "", flags=re.UNICODE)
+    if not tokens or any(len(t) < MIN_PREFIJO for t in tokens):
+        return None
+    return " ".join(f'"{t}"*' for t in tokens)
+
+
+def _match(tabla: str, texto: str):
+    """
+    Subquery (id, rank) con las filas de la tabla FTS que matchean.
+    rank = bm25 (más negativo = más relevante).
+    """
+    param = f"q_{tabla}"
+    return (
+        text(
+            f"SELECT rowid AS id, bm25({tabla}) AS rank "
+            f"FROM {tabla} WHERE {tabla} MATCH :{param}"
+        )
+        .bindparams(**{param: fts_query(texto)})
+        .columns(id=Integer, rank=Float)
+        .subquery(tabla + "_match")
+    )
+
+
+def match_clientes(texto: str):
+    return _match("clientes_fts", texto)
+
+
+def match_productos(texto: str):
+    return _match("productos_fts", texto)
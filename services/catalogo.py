@@ -0,0 +1,148 @@
+# services/catalogo.py
+"""
+Cache del catálogo de productos en memoria del proceso.
+
+El catálogo es chico (decenas de filas) y cambia poco, así que se guarda
+una foto inmutable con índices por id / código y claves de búsqueda ya
+normalizadas. Para que sea correcto con varios workers de uvicorn, la foto
+lleva la versión de la fila catalogo_version; cada CATALOGO_POLL_SEGUNDOS
+se relee esa fila (una query trivial por PK) y si cambió se recarga.
+
+Quien modifique productos debe llamar a bump_version(db) antes del commit.
+Los caminos que escriben con precios del catálogo (alta de pedidos) usan
+obtener_catalogo(db, verificar=True): releen la versión en su transacción,
+así nunca cobran un precio viejo ni aceptan un producto ya desactivado.
+"""
+import os
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+
+from sqlalchemy import event, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import models
+from utils.texto import normalizar_texto
+
+POLL_SEGUNDOS = float(os.getenv("CATALOGO_POLL_SEGUNDOS", "1"))
+
+
+@dataclass(frozen=True)
+class ProductoCat:
+    id: int
+    codigo: str | None
+    nombre: str
+    categoria: str | None
+    presentacion: str | None
+    precio_centavos: int
+    activo: bool
+    clave: str  # nombre + presentación + categoría normalizados
+
+
+@dataclass
+class Catalogo:
+    version: int
+    productos: list[ProductoCat]  # ordenados por id descendente
+    por_id: dict[int, ProductoCat] = field(default_factory=dict)
+    por_codigo: dict[str, ProductoCat] = field(default_factory=dict)
+
+    def __post_init__(self):
+        self.por_id = {p.id: p for p in self.productos}
+        self.por_codigo = {p.codigo: p for p in self.productos if p.codigo}
+
+    def listar(self, solo_activos: bool = False) -> list[ProductoCat]:
+        if solo_activos:
+            return [p for p in self.productos if p.activo]
+        return list(self.productos)
+
+
+_lock = Lock()
+_catalogo: Catalogo | None = None
+_ultimo_chequeo = 0.0
+
+
+def _a_snapshot(p: models.Producto) -> ProductoCat:
+    return ProductoCat(
+        id=p.id,
+        codigo=p.codigo,
+        nombre=p.nombre,
+        categoria=p.categoria,
+        presentacion=p.presentacion,
+        precio_centavos=p.precio_centavos or 0,
+        activo=bool(p.activo),
+        clave=normalizar_texto(" ".join(x for x in (p.nombre, p.presentacion, p.categoria) if x)),
+    )
+
+
+def leer_version(db: Session) -> int:
+    version = (
+        db.query(models.CatalogoVersion.version)
+        .filter(models.CatalogoVersion.id == 1)
+        .scalar()
+    )
+    return version or 0
+
+
+def obtener_catalogo(db: Session, verificar: bool = False) -> Catalogo:
+    """
+    Devuelve la foto vigente del catálogo, recargándola si otro proceso
+    (o este) incrementó la versión. Con verificar=True la versión se relee
+    siempre (sin esperar a POLL_SEGUNDOS), dentro de la transacción de `db`.
+    """
+    global _catalogo, _ultimo_chequeo
+
+    ahora = time.monotonic()
+    cat = _catalogo
+    if cat is not None and not verificar and ahora - _ultimo_chequeo < POLL_SEGUNDOS:
+        return cat
+
+    # Primero la versión y después las filas: la foto nunca es más vieja que su versión
+    version = leer_version(db)
+    if cat is not None and cat.version == version:
+        _ultimo_chequeo = ahora
+        return cat
+
+    filas = db.query(models.Producto).order_by(models.Producto.id.desc()).all()
+    nuevo = Catalogo(version=version, productos=[_a_snapshot(p) for p in filas])
+
+    with _lock:
+        if _catalogo is None or _catalogo.version <= version:
+            _catalogo = nuevo
+        _ultimo_chequeo = ahora
+    return nuevo
+
+
+def invalidar() -> None:
+    """
+    Fuerza a releer la versión en el próximo acceso (cambios de este proceso).
+    """
+    global _ultimo_chequeo
+    _ultimo_chequeo = 0.0
+
+
+def inicializar_version(engine: Engine) -> None:
+    """
+    Crea la fila id=1 de catalogo_version si falta (al arrancar), así
+    bump_version siempre es un UPDATE y nunca compite por el INSERT.
+    """
+    with Session(engine) as db:
+        if db.get(models.CatalogoVersion, 1) is None:
+            db.add(models.CatalogoVersion(id=1, version=0))
+            db.commit()
+
+
+def bump_version(db: Session) -> None:
+    """
+    Incrementa la versión del catálogo dentro de la transacción actual.
+    Al hacer commit se invalida también la foto local de este proceso.
+    """
+    res = db.execute(
+        update(models.CatalogoVersion)
+        .where(models.CatalogoVersion.id == 1)
+        .values(version=models.CatalogoVersion.version + 1)
+    )
+    if res.rowcount == 0:
+        db.add(models.CatalogoVersion(id=1, version=1))
+
+    event.listen(db, "after_commit", lambda _session: invalidar(), once=True)
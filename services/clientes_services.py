@@ -0,0 +1,109 @@
+# services/clientes_services.py
+from datetime import datetime, timedelta
+
+from sqlalchemy import exists, func, select
+from sqlalchemy.orm import Session
+
+import models
+from utils.geo import caja_alrededor, haversine_km
+from utils.telefonos import normalize_phone, split_phones
+
+
+def find_cliente_by_phone(db: Session, telefono: str) -> models.Cliente | None:
+    """
+    Busca el cliente comparando por los últimos 10 dígitos del teléfono.
+    Resuelve contra cualquiera de los números del cliente (cliente_telefonos)
+    con una sola query por igualdad sobre la columna indexada.
+    """
+    objetivo = normalize_phone(telefono or "")
+    if not objetivo:
+        return None
+
+    return (
+        db.query(models.Cliente)
+        .join(models.ClienteTelefono, models.ClienteTelefono.cliente_id == models.Cliente.id)
+        .filter(models.ClienteTelefono.telefono_normalizado == objetivo)
+        .order_by(models.Cliente.id)
+        .first()
+    )
+
+
+def telefonos_de(telefono: str | None) -> list[tuple[str, str]]:
+    """
+    Parte la celda de teléfono en pares (fragmento, normalizado) sin repetidos.
+    Si no reconoce ningún número completo, usa el texto entero normalizado.
+    """
+    pares: list[tuple[str, str]] = []
+    vistos: set[str] = set()
+    for raw in split_phones(telefono):
+        norm = normalize_phone(raw)
+        if norm not in vistos:
+            vistos.add(norm)
+            pares.append((raw, norm))
+
+    if not pares:
+        norm = normalize_phone(telefono or "")
+        if norm:
+            pares.append(((telefono or "").strip(), norm))
+    return pares
+
+
+def set_telefonos(cliente: models.Cliente, telefono: str | None) -> None:
+    """
+    Sincroniza la tabla cliente_telefonos a partir del texto de teléfono
+    del cliente.
+    """
+    cliente.telefonos = [
+        models.ClienteTelefono(telefono=raw, telefono_normalizado=norm)
+        for raw, norm in telefonos_de(telefono)
+    ]
+
+
+def buscar_cercanos(
+    db: Session,
+    lat: float,
+    lng: float,
+    radio_km: float,
+    sin_pedidos_dias: int | None = None,
+    solo_activos: bool = True,
+    limit: int = 100,
+) -> list[tuple[models.Cliente, float, datetime | None]]:
+    """
+    Clientes a menos de radio_km de (lat, lng), del más cercano al más
+    lejano: (cliente, distancia_km, fecha del último pedido).
+
+    La caja que contiene el círculo se resuelve con ix_clientes_lat_lng y
+    sólo a esos candidatos se les calcula la distancia exacta. Con
+    sin_pedidos_dias quedan los que no pidieron en ese lapso (los pedidos
+    cancelados no cuentan): el NOT EXISTS y el último pedido se buscan por
+    ix_pedidos_cliente_id_fecha_creacion, sin recorrer pedidos.
+    """
+    lat_min, lat_max, lng_min, lng_max = caja_alrededor(lat, lng, radio_km)
+    C, P = models.Cliente, models.Pedido
+    no_cancelado = P.estado != "CANCELADO"
+
+    ultimo_pedido = (
+        select(func.max(P.fecha_creacion))
+        .where(P.cliente_id == C.id, no_cancelado)
+        .correlate(C)
+        .scalar_subquery()
+    )
+    query = db.query(C, ultimo_pedido).filter(
+        C.lat.between(lat_min, lat_max),
+        C.lng.between(lng_min, lng_max),
+    )
+    if solo_activos:
+        query = query.filter(C.activo == True)  # noqa: E712
+    if sin_pedidos_dias:
+        corte = datetime.utcnow() - timedelta(days=sin_pedidos_dias)
+        query = query.filter(
+            ~exists().where(P.cliente_id == C.id, P.fecha_creacion >= corte, no_cancelado)
+        )
+
+    cercanos = []
+    for cliente, ultimo in query:
+        distancia = haversine_km(lat, lng, cliente.lat, cliente.lng)
+        if distancia <= radio_km:
+            cercanos.append((cliente, distancia, ultimo))
+    cercanos.sort(key=lambda c: (c[1], c[0].id))
+    return cercanos[:limit]
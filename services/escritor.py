@@ -0,0 +1,175 @@
+# services/escritor.py
+"""
+Escritor único con group commit (opcional, ESCRITOR_GRUPAL=1).
+
+SQLite admite un solo escritor a la vez: con muchos requests escribiendo
+en paralelo cada uno pelea por el lock y hace su propio fsync. Con el
+escritor activo, los requests encolan "trabajos" fn(session) -> resultado
+y un hilo dedicado los ejecuta en lote:
+
+    BEGIN IMMEDIATE
+      SAVEPOINT  trabajo 1  RELEASE
+      SAVEPOINT  trabajo 2  ROLLBACK TO (falló: sólo se deshace ese)
+      ...
+    COMMIT  (un solo fsync para todo el lote)
+
+Cada llamador recibe su propio resultado o su propia excepción (p. ej. el
+HTTPException de validación). Los trabajos deben devolver valores simples
+(ids, dicts), no objetos ORM: la sesión del escritor no es la del request.
+
+El escritor es uno por proceso: conviene con un solo worker de uvicorn
+(varios workers vuelven a competir entre sí por el lock de SQLite).
+
+Sin la variable de entorno, escribir() corre el trabajo sobre la sesión del
+request y hace commit, como siempre.
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, sessionmaker
+
+from database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+ESCRITOR_GRUPAL = os.getenv("ESCRITOR_GRUPAL", "0").lower() in ("1", "true", "si", "on")
+# Máximo de trabajos por transacción
+MAX_LOTE = int(os.getenv("ESCRITOR_MAX_LOTE", "64"))
+
+Trabajo = Callable[[Session], Any]
+
+
+class EscritorGrupal:
+    def __init__(self, session_factory: sessionmaker, max_lote: int = MAX_LOTE):
+        self.session_factory = session_factory
+        self.max_lote = max_lote
+        self._cola: queue.Queue[tuple[Trabajo, Future]] = queue.Queue()
+        self._hilo: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def encolar(self, fn: Trabajo) -> Future:
+        """
+        Encola el trabajo; el Future se resuelve cuando su lote hace commit.
+        """
+        self._arrancar()
+        futuro: Future = Future()
+        self._cola.put((fn, futuro))
+        return futuro
+
+    def ejecutar(self, fn: Trabajo) -> Any:
+        """
+        Encola el trabajo, espera a que su lote haga commit y devuelve su
+        resultado (o relanza su excepción).
+        """
+        return self.encolar(fn).result()
+
+    def _arrancar(self) -> None:
+        if self._hilo is not None:
+            return
+        with self._lock:
+            if self._hilo is None:
+                self._hilo = threading.Thread(target=self._loop, name="escritor-grupal", daemon=True)
+                self._hilo.start()
+
+    def _loop(self) -> None:
+        while True:
+            # Bloquea hasta el primer trabajo y se lleva todo lo que se juntó
+            # mientras se commiteaba el lote anterior (sin esperas artificiales).
+            lote = [self._cola.get()]
+            while len(lote) < self.max_lote:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._procesar(lote)
+            except Exception:  # nunca dejar morir el hilo
+                logger.exception("Error inesperado en el escritor grupal")
+                for _, futuro in lote:
+                    if not futuro.done():
+                        futuro.set_exception(RuntimeError("Error interno del escritor"))
+
+    def _procesar(self, lote: list[tuple[Trabajo, Future]]) -> None:
+        resultados: list[tuple[Future, Any, BaseException | None]] = []
+
+        with self.session_factory() as db:
+            _begin_immediate(db)
+            for fn, futuro in lote:
+                try:
+                    with db.begin_nested():
+                        r = fn(db)
+                        db.flush()
+                    resultados.append((futuro, r, None))
+                except Exception as exc:  # el savepoint ya se deshizo
+                    resultados.append((futuro, None, exc))
+
+            try:
+                db.commit()
+            except Exception:
+                db.rollback()
+                if len(lote) == 1:
+                    raise
+                logger.warning("Falló el commit de un lote de %d; reintento uno por uno", len(lote), exc_info=True)
+                for fn, futuro in lote:
+                    self._procesar([(fn, futuro)])
+                return
+
+        for futuro, r, exc in resultados:
+            if exc is not None:
+                futuro.set_exception(exc)
+            else:
+                futuro.set_result(r)
+
+
+def _begin_immediate(db: Session) -> None:
+    """
+    En SQLite, pysqlite no abre transacción antes de un SAVEPOINT, y el
+    RELEASE del primero haría commit. Abrimos la transacción a mano (y ya
+    tomando el lock de escritura, así el lote no falla a mitad de camino).
+    """
+    conn = db.connection()
+    if conn.dialect.name == "sqlite":
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+_escritor: EscritorGrupal | None = None
+
+
+def obtener_escritor() -> EscritorGrupal:
+    global _escritor
+    if _escritor is None:
+        _escritor = EscritorGrupal(SessionLocal)
+    return _escritor
+
+
+def escribir(db: Session, fn: Trabajo) -> Any:
+    """
+    Ejecuta el trabajo de escritura: por el escritor grupal si está activo,
+    o sobre la sesión del request con su propio commit.
+    """
+    if ESCRITOR_GRUPAL:
+        return obtener_escritor().ejecutar(fn)
+
+    resultado = fn(db)
+    db.commit()
+    return resultado
+
+
+async def escribir_async(db: AsyncSession, fn: Trabajo) -> Any:
+    """
+    Versión async de escribir(): con el escritor grupal se espera el Future
+    sin bloquear el event loop; si no, el trabajo (sync) corre sobre la
+    sesión async vía run_sync y se hace commit.
+    """
+    if ESCRITOR_GRUPAL:
+        return await asyncio.wrap_future(obtener_escritor().encolar(fn))
+
+    resultado = await db.run_sync(fn)
+    await db.commit()
+    return resultado
@@ -0,0 +1,233 @@
+# services/matcher.py
+"""
+Matcher difuso de productos para el bot ("panchos dobles x3", "mayo 500").
+
+Se arma una vez por versión del catálogo (ver services.catalogo) con:
+- un índice invertido token -> productos, con peso IDF por token;
+- un índice de trigramas sobre el vocabulario, para tolerar errores de tipeo;
+- sinónimos / jerga de clientes que se expanden antes de buscar.
+
+buscar() devuelve (producto, confianza) con confianza en [0, 1]: cuánto del
+texto del cliente quedó explicado por el producto (y, en menor medida,
+cuánto del nombre del producto quedó cubierto).
+"""
+import math
+import re
+from collections import defaultdict
+from threading import Lock
+
+from sqlalchemy.orm import Session
+
+from services.catalogo import Catalogo, ProductoCat, obtener_catalogo
+from utils.cache import LRUCache
+from utils.texto import normalizar_texto
+
+# Debajo de esto conviene que el bot pida confirmación al cliente
+CONFIANZA_ALTA = 0.75
+
+_STOPWORDS = {
+    "de", "del", "la", "el", "los", "las", "con", "c", "y", "o", "x", "u",
+    "un", "uni", "unid", "unidades", "para", "en", "por", "cm", "a", "al",
+}
+
+# Jerga de clientes -> palabras del catálogo (ya normalizadas y en singular).
+# Sólo jerga real: plurales y errores de tipeo ya los resuelven _singular()
+# y los trigramas; elegir un producto puntual no es un sinónimo.
+SINONIMOS = {
+    "hotdog": "pancho",
+    "hot dog": "pancho",
+    "superpancho": "super pancho",
+    "mayo": "mayonesa",
+    "catsup": "ketchup",
+    "parme": "parmesano",
+    "porta": "portapancho",
+    "burger": "hamburguesa",
+    "hambur": "hamburguesa",
+    "salchi": "salchicha",
+}
+
+_NUMERO = re.compile(r"^x?(\d+)(?:u|un|uni|unid)?$")
+_TOKEN = re.compile(r"[a-z0-9]+")
+_PARENTESIS = re.compile(r"\([^)]*\)")
+# Sinónimos de varias palabras: se reemplazan sobre el texto antes de tokenizar
+_FRASES = re.compile(
+    r"\b(" + "|".join(re.escape(k) for k in SINONIMOS if " " in k) + r")\b"
+)
+
+
+def _singular(token: str) -> str:
+    if token.isdigit() or len(token) <= 3:
+        return token
+    if token.endswith("nes") and len(token) > 4:  # panes -> pan, bolsones -> bolson
+        return token[:-2]
+    if token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def tokenizar(texto: str | None) -> list[str]:
+    """
+    Texto -> tokens canónicos: sin acentos, en singular, cantidades tipo
+    "x15" / "4u" como número, sin stopwords y con sinónimos expandidos.
+    """
+    tokens: list[str] = []
+    normal = _FRASES.sub(lambda m: SINONIMOS[m.group(1)], normalizar_texto(texto))
+    for raw in _TOKEN.findall(normal):
+        m = _NUMERO.match(raw)
+        tok = m.group(1) if m else _singular(raw)
+        if tok in _STOPWORDS:
+            continue
+        if tok in SINONIMOS:
+            tokens.extend(SINONIMOS[tok].split())
+        else:
+            tokens.append(tok)
+    return tokens
+
+
+def _trigramas(token: str) -> set[str]:
+    t = f"  {token} "
+    return {t[i:i + 3] for i in range(len(t) - 2)}
+
+
+class MatcherProductos:
+    def __init__(self, catalogo: Catalogo):
+        self.catalogo = catalogo
+        self.productos: list[ProductoCat] = [p for p in catalogo.productos if p.activo]
+        self.tokens_producto: list[set[str]] = []
+        self.indice: dict[str, list[int]] = defaultdict(list)
+
+        # Tokens "núcleo" (sin el detalle entre paréntesis ni la categoría):
+        # son los que cuentan para premiar al producto que el texto cubre entero.
+        self.nucleo_producto: list[set[str]] = []
+
+        for idx, p in enumerate(self.productos):
+            toks = set(tokenizar(" ".join(x for x in (p.nombre, p.presentacion) if x)))
+            toks.update(tokenizar(p.categoria))
+            self.tokens_producto.append(toks)
+            nombre_corto = _PARENTESIS.sub(" ", p.nombre or "")
+            self.nucleo_producto.append(
+                set(tokenizar(" ".join(x for x in (nombre_corto, p.presentacion) if x)))
+            )
+            for tok in toks:
+                self.indice[tok].append(idx)
+
+        n = max(len(self.productos), 1)
+        self.idf = {tok: math.log(1 + n / len(idxs)) for tok, idxs in self.indice.items()}
+
+        self.trigramas: dict[str, set[str]] = defaultdict(set)
+        for tok in self.indice:
+            if not tok.isdigit():
+                for tri in _trigramas(tok):
+                    self.trigramas[tri].add(tok)
+
+        self._peso_producto = [sum(self.idf[t] for t in toks) or 1.0 for toks in self.nucleo_producto]
+
+        # Frases exactas (código, nombre, nombre + presentación) -> producto.
+        # Las frases que comparten varios productos ("mayonesa") no son exactas.
+        frases: dict[str, set[int]] = defaultdict(set)
+        for idx, p in enumerate(self.productos):
+            claves = {normalizar_texto(p.codigo), normalizar_texto(p.nombre)}
+            if p.presentacion:
+                claves.add(normalizar_texto(f"{p.nombre} {p.presentacion}"))
+            for clave in claves:
+                if clave:
+                    frases[clave].add(idx)
+        self.exactos = {k: next(iter(v)) for k, v in frases.items() if len(v) == 1}
+
+        # Memo de textos ya resueltos (los clientes repiten siempre lo mismo)
+        self._memo = LRUCache(maxsize=2048)
+
+    def _similares(self, token: str) -> dict[str, float]:
+        """
+        Tokens del vocabulario parecidos a `token` con su similitud (0..1].
+        Los números sólo matchean exacto (3 no es 36).
+        """
+        if token in self.indice:
+            return {token: 1.0}
+        if token.isdigit() or len(token) < 3:
+            return {}
+
+        tris = _trigramas(token)
+        conteo: dict[str, int] = defaultdict(int)
+        for tri in tris:
+            for cand in self.trigramas.get(tri, ()):
+                conteo[cand] += 1
+
+        similares: dict[str, float] = {}
+        for cand, comunes in conteo.items():
+            sim = comunes / len(tris | _trigramas(cand))
+            if cand.startswith(token):  # prefijo: "parmes" -> "parmesano"
+                sim = max(sim, 0.9)
+            if sim >= 0.4:
+                similares[cand] = sim
+        return similares
+
+    def buscar(self, texto: str, limit: int = 5) -> list[tuple[ProductoCat, float]]:
+        consulta = tokenizar(texto)
+        if not consulta:
+            return []
+
+        # por producto: {token de la consulta: (similitud, token del vocabulario)}
+        aciertos: dict[int, dict[int, tuple[float, str]]] = defaultdict(dict)
+        pesos_consulta: list[float] = []
+
+        for qi, tok in enumerate(consulta):
+            similares = self._similares(tok)
+            pesos_consulta.append(max((self.idf[c] for c in similares), default=1.0))
+            for cand, sim in similares.items():
+                for idx in self.indice[cand]:
+                    previo = aciertos[idx].get(qi)
+                    if previo is None or sim > previo[0]:
+                        aciertos[idx][qi] = (sim, cand)
+
+        total_consulta = sum(pesos_consulta) or 1.0
+        resultados: list[tuple[float, int]] = []
+        for idx, por_token in aciertos.items():
+            cubierto_q = sum(sim * pesos_consulta[qi] for qi, (sim, _) in por_token.items())
+            nucleo = self.nucleo_producto[idx]
+            cubierto_p = sum(self.idf[cand] for cand in {c for _, c in por_token.values()} if cand in nucleo)
+            score = 0.8 * (cubierto_q / total_consulta) + 0.2 * min(cubierto_p / self._peso_producto[idx], 1.0)
+            resultados.append((score, idx))
+
+        resultados.sort(key=lambda r: (-r[0], self.productos[r[1]].nombre))
+        return [(self.productos[idx], round(score, 3)) for score, idx in resultados[:limit]]
+
+    def resolver(self, texto: str, limit: int = 3) -> list[tuple[ProductoCat, float]]:
+        """
+        Como buscar(), pero primero prueba match exacto por código / nombre
+        (confianza 1.0) y memoriza el resultado por texto normalizado.
+        """
+        clave = (normalizar_texto(texto), limit)
+        cacheado = self._memo.get(clave)
+        if cacheado is not None:
+            return cacheado
+
+        idx = self.exactos.get(clave[0])
+        if idx is not None:
+            resultado = [(self.productos[idx], 1.0)]
+        else:
+            resultado = self.buscar(texto, limit=limit)
+
+        self._memo.set(clave, resultado)
+        return resultado
+
+
+_lock = Lock()
+_matcher: MatcherProductos | None = None
+
+
+def obtener_matcher(db: Session) -> MatcherProductos:
+    """
+    Matcher para la foto vigente del catálogo; se rearma sólo si el catálogo cambió.
+    """
+    global _matcher
+
+    catalogo = obtener_catalogo(db)
+    m = _matcher
+    if m is not None and m.catalogo is catalogo:
+        return m
+
+    with _lock:
+        if _matcher is None or _matcher.catalogo is not catalogo:
+            _matcher = MatcherProductos(catalogo)
+        return _matcher
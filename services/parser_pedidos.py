@@ -0,0 +1,95 @@
+# services/parser_pedidos.py
+"""
+Parser de pedidos en texto libre de WhatsApp:
+
+    "2 combo pancho doble, 3 bolsones x15
+     1 mayo 3kg"
+
+Cada renglón (o segmento separado por coma / punto y coma / "y 3 ...")
+se separa en cantidad + descripción, y la descripción se resuelve con el
+matcher del catálogo (services.matcher): primero match exacto por código
+o nombre, después el matcher difuso.
+"""
+import re
+from dataclasses import dataclass, field
+
+from services.catalogo import ProductoCat
+from services.matcher import CONFIANZA_ALTA, MatcherProductos
+
+# Debajo de esto el segmento se considera "no reconocido" (saludos, etc.)
+CONFIANZA_MINIMA = 0.3
+
+_SEGMENTOS = re.compile(r"[\n;,]+|\s+y\s+(?=\d)", re.IGNORECASE)
+_RELLENO = re.compile(
+    r"^\s*(?:[-*•·]\s*)?(?:(?:hola|buenas|quiero|necesito|mandame|mándame|enviame|envíame|"
+    r"pido|dame|me\s+das|me\s+mandas|por\s+favor)[\s:!,]+)*",
+    re.IGNORECASE,
+)
+_CANTIDAD = re.compile(
+    r"^(?:x\s*)?(\d{1,4})\s*(?:x|u|un|uds?|unid(?:ades)?)?\.?\s+(\S.*)$",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class ItemParseado:
+    linea: str
+    cantidad: int
+    producto: ProductoCat
+    confianza: float
+    alternativas: list[tuple[ProductoCat, float]] = field(default_factory=list)
+
+    @property
+    def confirmar(self) -> bool:
+        return self.confianza < CONFIANZA_ALTA
+
+
+def separar_cantidad(segmento: str) -> tuple[int, str]:
+    """
+    "3 bolsones x15" -> (3, "bolsones x15"); sin número al principio -> (1, texto).
+    El "x15" del final es presentación, no cantidad.
+    """
+    texto = _RELLENO.sub("", segmento).strip()
+    m = _CANTIDAD.match(texto)
+    if m:
+        return int(m.group(1)), m.group(2).strip()
+    return 1, texto
+
+
+def parsear_pedido(
+    matcher: MatcherProductos,
+    texto: str,
+) -> tuple[list[ItemParseado], list[str]]:
+    """
+    Devuelve (items reconocidos, segmentos no reconocidos).
+    """
+    items: list[ItemParseado] = []
+    no_reconocidos: list[str] = []
+
+    for segmento in _SEGMENTOS.split(texto or ""):
+        segmento = segmento.strip()
+        if not segmento:
+            continue
+
+        cantidad, descripcion = separar_cantidad(segmento)
+        if not descripcion or cantidad <= 0:
+            no_reconocidos.append(segmento)
+            continue
+
+        candidatos = matcher.resolver(descripcion, limit=3)
+        if not candidatos or candidatos[0][1] < CONFIANZA_MINIMA:
+            no_reconocidos.append(segmento)
+            continue
+
+        producto, confianza = candidatos[0]
+        items.append(
+            ItemParseado(
+                linea=segmento,
+                cantidad=cantidad,
+                producto=producto,
+                confianza=confianza,
+                alternativas=candidatos[1:] if confianza < CONFIANZA_ALTA else [],
+            )
+        )
+
+    return items, no_reconocidos
@@ -1,18 +1,35 @@
 # services/pedidos_services.py
+import logging
+from datetime import datetime
 
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect, insert, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from fastapi import HTTPException
 
 import models
 import schemas
+from services.catalogo import ProductoCat, obtener_catalogo
+from services.escritor import escribir, escribir_async
+from services.reportes import contabilizar
 
+logger = logging.getLogger(__name__)
 
-def create_pedido(db: Session, pedido_in: schemas.PedidoCreate) -> models.Pedido:
-    cliente = (
-        db.query(models.Cliente)
-        .filter(models.Cliente.id == pedido_in.cliente_id)
-        .first()
-    )
+
+def resolver_productos(db: Session) -> tuple[dict[int, ProductoCat], dict[str, ProductoCat]]:
+    """
+    Devuelve los índices {id: producto} y {codigo: producto} para resolver
+    los ítems. Salen del cache de catálogo (services.catalogo): en el caso
+    normal la única query es la de catalogo_version, que corre en la
+    transacción de escritura para que precio y activo estén al día.
+    """
+    catalogo = obtener_catalogo(db, verificar=True)
+    return catalogo.por_id, catalogo.por_codigo
+
+
+def validar_cliente(cliente: models.Cliente | None) -> models.Cliente:
     if not cliente:
         raise HTTPException(status_code=404, detail="Cliente no encontrado")
 
@@ -21,23 +38,36 @@ def create_pedido(db: Session, pedido_in: schemas.PedidoCreate) -> models.Pedido
             status_code=409,
             detail=f"El cliente '{cliente.nombre}' está inactivo y no puede crear pedidos",
         )
+    return cliente
 
+
+def calcular_pedido(
+    cliente: models.Cliente,
+    pedido_in: schemas.PedidoCreate,
+    por_id: dict[int, ProductoCat],
+    por_codigo: dict[str, ProductoCat],
+) -> tuple[dict, list[dict]]:
+    """
+    Resuelve los productos, calcula subtotales, descuento del cliente y
+    totales. Devuelve (columnas del pedido, columnas de cada ítem) sin tocar
+    la base; lanza HTTPException si un producto no existe o está inactivo.
+    """
     total_bruto = 0
-    items_models: list[models.PedidoItem] = []
+    items: list[dict] = []
 
     for item_in in pedido_in.items:
-        producto = (
-            db.query(models.Producto)
-            .filter(models.Producto.id == item_in.producto_id)
-            .first()
-        )
+        if item_in.producto_id is not None:
+            producto = por_id.get(item_in.producto_id)
+        else:
+            producto = por_codigo.get(item_in.codigo.strip())
 
         # 1) Producto no existe
         if not producto:
-            raise HTTPException(
-                status_code=404,
-                detail=f"Producto id={item_in.producto_id} no encontrado",
-            )
+            if item_in.producto_id is not None:
+                detail = f"Producto id={item_in.producto_id} no encontrado"
+            else:
+                detail = f"Producto con código '{item_in.codigo}' no encontrado"
+            raise HTTPException(status_code=404, detail=detail)
 
         # 2) Producto inactivo
         if not producto.activo:
@@ -50,34 +80,273 @@ def create_pedido(db: Session, pedido_in: schemas.PedidoCreate) -> models.Pedido
         subtotal = precio_unitario * item_in.cantidad
         total_bruto += subtotal
 
-        item_model = models.PedidoItem(
-            producto_id=producto.id,
-            cantidad=item_in.cantidad,
-            precio_unitario_cent=precio_unitario,
-            subtotal_cent=subtotal,
-            descripcion_extra=item_in.descripcion_extra,
+        items.append(
+            {
+                "producto_id": producto.id,
+                "cantidad": item_in.cantidad,
+                "precio_unitario_cent": precio_unitario,
+                "subtotal_cent": subtotal,
+                "descripcion_extra": item_in.descripcion_extra,
+            }
         )
-        items_models.append(item_model)
 
     descuento_porcentaje = float(cliente.descuento_porcentaje or 0)
     total_descuento = int(total_bruto * descuento_porcentaje / 100)
     total_neto = total_bruto - total_descuento
 
-    pedido = models.Pedido(
-        cliente_id=cliente.id,
-        canal=pedido_in.canal,
-        estado="NUEVO",
-        total_bruto_cent=total_bruto,
-        descuento_cliente=descuento_porcentaje or None,
-        total_descuento_cent=total_descuento,
-        total_neto_cent=total_neto,
-        observaciones=pedido_in.observaciones,
-        items=items_models,
+    pedido = {
+        "cliente_id": cliente.id,
+        "canal": pedido_in.canal,
+        "estado": "NUEVO",
+        "total_bruto_cent": total_bruto,
+        "descuento_cliente": descuento_porcentaje or None,
+        "total_descuento_cent": total_descuento,
+        "total_neto_cent": total_neto,
+        "observaciones": pedido_in.observaciones,
+        "origen_referencia": pedido_in.origen_referencia,
+    }
+    return pedido, items
+
+
+def insertar_pedido(db: Session, pedido_in: schemas.PedidoCreate) -> int:
+    """
+    Valida e inserta el pedido en la sesión dada (sin commit) y lo suma a
+    los rollups de reportes. Devuelve el id. Es el trabajo que corre el
+    escritor grupal (services.escritor).
+    """
+    cliente = validar_cliente(
+        db.query(models.Cliente)
+        .filter(models.Cliente.id == pedido_in.cliente_id)
+        .first()
     )
 
+    por_id, por_codigo = resolver_productos(db)
+    cabecera, items = calcular_pedido(cliente, pedido_in, por_id, por_codigo)
+
+    pedido = models.Pedido(**cabecera, items=[models.PedidoItem(**it) for it in items])
     db.add(pedido)
-    db.commit()
-    db.refresh(pedido)
+    db.flush()
+    contabilizar(db, [pedido.id])
+    return pedido.id
+
+
+def verificar_referencia_unica(engine: Engine) -> bool:
+    """
+    La idempotencia por origen_referencia depende del índice UNIQUE (dos
+    requests a la vez). Al arrancar avisa si falta: en una base existente lo
+    crea scripts/migrate_sqlite_origen_referencia_unica.py.
+    """
+    insp = inspect(engine)
+    unicos = [ix["column_names"] for ix in insp.get_indexes("pedidos") if ix["unique"]]
+    unicos += [uc["column_names"] for uc in insp.get_unique_constraints("pedidos")]
+    if ["origen_referencia"] in unicos:
+        return True
+    logger.warning(
+        "pedidos.origen_referencia no tiene índice UNIQUE: pedidos repetidos posibles "
+        "ante reintentos concurrentes; correr scripts/migrate_sqlite_origen_referencia_unica.py"
+    )
+    return False
+
+
+def _query_pedido_completo():
+    # Pedido con ítems + productos en 2 queries (evita lazy-load por ítem)
+    return select(models.Pedido).options(
+        selectinload(models.Pedido.items).joinedload(models.PedidoItem.producto)
+    )
+
+
+def create_pedido(db: Session, pedido_in: schemas.PedidoCreate) -> models.Pedido:
+    """
+    Crea el pedido. Con origen_referencia es idempotente: si ya existe un
+    pedido con esa clave (reintento, o dos requests a la vez) lo devuelve.
+    """
+    ref = pedido_in.origen_referencia
+    if ref:
+        existente = db.scalars(_query_pedido_completo().where(models.Pedido.origen_referencia == ref)).first()
+        if existente:
+            return existente
+
+    try:
+        pedido_id = escribir(db, lambda s: insertar_pedido(s, pedido_in))
+    except IntegrityError:
+        db.rollback()
+        existente = ref and db.scalars(
+            _query_pedido_completo().where(models.Pedido.origen_referencia == ref)
+        ).first()
+        if not existente:
+            raise
+        return existente
+
+    return db.scalars(_query_pedido_completo().where(models.Pedido.id == pedido_id)).one()
+
+
+async def crear_o_recuperar_pedido_async(
+    db: AsyncSession,
+    pedido_in: schemas.PedidoCreate,
+) -> tuple[models.Pedido, bool]:
+    """
+    Igual que create_pedido() para las rutas async: la validación y el
+    cálculo son los mismos (insertar_pedido corre vía run_sync).
+    Devuelve (pedido, creado); creado=False si otro request con la misma
+    origen_referencia lo creó primero.
+    """
+    try:
+        pedido_id = await escribir_async(db, lambda s: insertar_pedido(s, pedido_in))
+    except IntegrityError:
+        await db.rollback()
+        ref = pedido_in.origen_referencia
+        existente = ref and (
+            await db.scalars(_query_pedido_completo().where(models.Pedido.origen_referencia == ref))
+        ).first()
+        if not existente:
+            raise
+        return existente, False
 
+    pedido = (await db.scalars(_query_pedido_completo().where(models.Pedido.id == pedido_id))).one()
+    return pedido, True
+
+
+async def create_pedido_async(db: AsyncSession, pedido_in: schemas.PedidoCreate) -> models.Pedido:
+    pedido, _ = await crear_o_recuperar_pedido_async(db, pedido_in)
     return pedido
 
+
+# ---------------------------------------------------------------------
+# Alta masiva (POST /pedidos/bulk)
+# ---------------------------------------------------------------------
+LOTE_INSERT = 500
+
+
+def _referencias_tomadas(db: Session, pedidos_in: list[schemas.PedidoCreate]) -> dict[str, int]:
+    refs = {p.origen_referencia for p in pedidos_in if p.origen_referencia}
+    if not refs:
+        return {}
+    return dict(
+        db.execute(
+            select(models.Pedido.origen_referencia, models.Pedido.id)
+            .where(models.Pedido.origen_referencia.in_(refs))
+        ).all()
+    )
+
+
+def _validar_referencia(ref: str | None, existentes: dict[str, int], lote: dict[str, int]) -> None:
+    if not ref:
+        return
+    if ref in existentes:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Ya existe el pedido #{existentes[ref]} con origen_referencia '{ref}'",
+        )
+    if ref in lote:
+        raise HTTPException(
+            status_code=409,
+            detail=f"origen_referencia '{ref}' repetida en el lote (pedido en la posición {lote[ref]})",
+        )
+
+
+def insertar_pedidos_bulk(
+    db: Session,
+    pedidos_in: list[schemas.PedidoCreate],
+    modo: str = "todo_o_nada",
+) -> list[schemas.PedidoBulkResultado]:
+    """
+    Valida y calcula todos los pedidos con una query de clientes (los
+    productos salen del cache de catálogo) y los inserta con INSERT masivos
+    de cabeceras (RETURNING id) e ítems, en lotes de LOTE_INSERT, y los suma
+    a los rollups de reportes. Sin commit.
+
+    - todo_o_nada: si algún pedido tiene error no se inserta ninguno.
+    - mejor_esfuerzo: se insertan los válidos y se informa el error del resto.
+
+    Un pedido cuya origen_referencia ya existe en la base, o en un pedido
+    anterior del lote, es un error 409 (no se inserta dos veces).
+    """
+    ids_cliente = {p.cliente_id for p in pedidos_in}
+    clientes = {
+        c.id: c
+        for c in db.query(models.Cliente).filter(models.Cliente.id.in_(ids_cliente))
+    } if ids_cliente else {}
+    por_id, por_codigo = resolver_productos(db)
+    refs_existentes = _referencias_tomadas(db, pedidos_in)
+    refs_lote: dict[str, int] = {}  # origen_referencia -> índice del pedido válido que la usa
+
+    resultados: list[schemas.PedidoBulkResultado] = []
+    validos: list[tuple[schemas.PedidoBulkResultado, dict, list[dict]]] = []
+    for indice, pedido_in in enumerate(pedidos_in):
+        try:
+            cliente = validar_cliente(clientes.get(pedido_in.cliente_id))
+            cabecera, items = calcular_pedido(cliente, pedido_in, por_id, por_codigo)
+            _validar_referencia(pedido_in.origen_referencia, refs_existentes, refs_lote)
+        except HTTPException as exc:
+            resultados.append(
+                schemas.PedidoBulkResultado(
+                    indice=indice, ok=False, status_code=exc.status_code, error=exc.detail
+                )
+            )
+            continue
+        if pedido_in.origen_referencia:
+            refs_lote[pedido_in.origen_referencia] = indice
+        res = schemas.PedidoBulkResultado(
+            indice=indice, ok=True, total_neto_cent=cabecera["total_neto_cent"]
+        )
+        resultados.append(res)
+        validos.append((res, cabecera, items))
+
+    if modo == "todo_o_nada" and len(validos) < len(pedidos_in):
+        for res, _, _ in validos:
+            res.ok = False
+            res.total_neto_cent = None
+            res.error = "No se creó: otro pedido del lote tiene errores (modo todo_o_nada)"
+        return resultados
+
+    ahora = datetime.utcnow()
+    for inicio in range(0, len(validos), LOTE_INSERT):
+        lote = validos[inicio:inicio + LOTE_INSERT]
+        ids = db.scalars(
+            insert(models.Pedido).returning(models.Pedido.id, sort_by_parameter_order=True),
+            [{**cab, "fecha_creacion": ahora, "creado_en": ahora, "actualizado_en": ahora} for _, cab, _ in lote],
+        ).all()
+
+        filas_items = []
+        for (res, _, items), pedido_id in zip(lote, ids):
+            res.pedido_id = pedido_id
+            filas_items.extend({**it, "pedido_id": pedido_id} for it in items)
+        if filas_items:
+            db.execute(insert(models.PedidoItem), filas_items)
+
+    contabilizar(db, [res.pedido_id for res, _, _ in validos])
+    return resultados
+
+
+def crear_pedidos_bulk(
+    db: Session,
+    data: schemas.PedidosBulkCreate,
+) -> schemas.PedidosBulkResponse:
+    """
+    Si otro request crea un pedido con la misma origen_referencia entre la
+    validación y el commit, el índice único salta: con todo_o_nada es un
+    409; con mejor_esfuerzo se reintenta una vez y esos pedidos quedan como
+    error 409 en su resultado.
+    """
+    try:
+        resultados = escribir(db, lambda s: insertar_pedidos_bulk(s, data.pedidos, data.modo))
+    except IntegrityError:
+        db.rollback()
+        tomadas = _referencias_tomadas(db, data.pedidos)
+        if not tomadas:
+            raise
+        if data.modo == "todo_o_nada":
+            detalle = ", ".join(f"'{ref}' (pedido #{pid})" for ref, pid in sorted(tomadas.items()))
+            raise HTTPException(
+                status_code=409,
+                detail=f"Ya existen pedidos con origen_referencia {detalle}",
+            )
+        resultados = escribir(db, lambda s: insertar_pedidos_bulk(s, data.pedidos, data.modo))
+    creados = sum(1 for r in resultados if r.ok)
+    return schemas.PedidosBulkResponse(
+        ok=creados == len(resultados),
+        modo=data.modo,
+        creados=creados,
+        con_error=len(resultados) - creados,
+        resultados=resultados,
+    )
@@ -0,0 +1,130 @@
+# services/reparto.py
+"""
+Orden de visita para el reparto: vecino más cercano + 2-opt sobre una
+matriz de distancias haversine calculada en una sola pasada con numpy.
+
+La ruta sale del origen (depósito) si hay uno; sin origen arranca en la
+parada más alejada del centro del recorrido. Con volver=False la ruta
+termina en la última parada: se resuelve como un tour cerrado agregando
+un nodo "fin" ficticio, que después se descarta.
+
+El 2-opt evalúa, para cada tramo, todos los cortes posibles a la vez
+(vectorizado) y aplica el mejor: con 500 paradas termina en decenas de
+milisegundos. TIEMPO_MAX_2OPT lo corta igual si no converge.
+"""
+import time
+
+import numpy as np
+
+from utils.geo import RADIO_TIERRA_KM
+
+# Segundos máximos del 2-opt (la ruta siempre es válida, sólo menos pulida)
+TIEMPO_MAX_2OPT = 0.5
+
+
+def matriz_distancias(puntos: np.ndarray) -> np.ndarray:
+    """
+    puntos: (n, 2) con (lat, lng) en grados -> matriz (n, n) de km.
+    """
+    rad = np.radians(puntos)
+    lat, lng = rad[:, :1], rad[:, 1:]
+    a = (
+        np.sin((lat - lat.T) / 2) ** 2
+        + np.cos(lat) * np.cos(lat.T) * np.sin((lng - lng.T) / 2) ** 2
+    )
+    return 2 * RADIO_TIERRA_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def vecino_mas_cercano(dist: np.ndarray, inicio: int = 0) -> list[int]:
+    n = len(dist)
+    visitado = np.zeros(n, dtype=bool)
+    visitado[inicio] = True
+    ruta = [inicio]
+    actual = inicio
+    for _ in range(n - 1):
+        actual = int(np.argmin(np.where(visitado, np.inf, dist[actual])))
+        visitado[actual] = True
+        ruta.append(actual)
+    return ruta
+
+
+def dos_opt(ruta: list[int], dist: np.ndarray, tiempo_max: float = TIEMPO_MAX_2OPT) -> list[int]:
+    """
+    Mejora el tour cerrado ruta[0] -> ... -> ruta[-1] -> ruta[0] invirtiendo
+    tramos mientras alguna inversión lo acorte. ruta[0] queda fijo.
+    """
+    r = np.array(ruta)
+    n = len(r)
+    if n < 4:
+        return list(ruta)
+
+    limite = time.perf_counter() + tiempo_max
+    mejoro = True
+    while mejoro and time.perf_counter() < limite:
+        mejoro = False
+        for i in range(n - 2):
+            a, b = r[i], r[i + 1]
+            c = r[i + 2:]
+            d = np.append(r[i + 3:], r[0])
+            # Cambiar (a,b) + (c,d) por (a,c) + (b,d), para todos los c a la vez
+            delta = dist[a, c] + dist[b, d] - dist[a, b] - dist[c, d]
+            k = int(np.argmin(delta))
+            if delta[k] < -1e-9:
+                j = i + 2 + k
+                r[i + 1:j + 1] = r[i + 1:j + 1][::-1].copy()
+                mejoro = True
+    return r.tolist()
+
+
+def ordenar_paradas(
+    puntos: list[tuple[float, float]],
+    origen: tuple[float, float] | None = None,
+    volver: bool = True,
+) -> tuple[list[int], list[float]]:
+    """
+    Devuelve (orden de visita como índices de `puntos`, km de cada tramo).
+    El primer tramo es desde el origen (0 si no hay origen); con volver=True
+    se agrega al final el tramo de regreso al inicio.
+    """
+    if not puntos:
+        return [], []
+
+    coords = np.array(([origen] if origen else []) + list(puntos), dtype=float)
+    dist = matriz_distancias(coords)
+    m = len(coords)
+
+    if origen:
+        inicio = 0
+    else:
+        centro = matriz_distancias(np.vstack([coords.mean(axis=0), coords]))[0, 1:]
+        inicio = int(np.argmax(centro))
+
+    ruta = vecino_mas_cercano(dist, inicio)
+    if volver:
+        ruta = dos_opt(ruta, dist)
+    else:
+        # Nodo "fin" (índice m) a distancia 0 de todos: el tour cerrado
+        # óptimo sin sus dos tramos en 0 es la ruta abierta óptima. Con
+        # origen, el fin sólo está "cerca" del origen, así la ruta sale de ahí.
+        extendida = np.zeros((m + 1, m + 1))
+        extendida[:m, :m] = dist
+        if origen:
+            lejos = 1.0 + 2 * m * float(dist.max())
+            extendida[m, 1:m] = extendida[1:m, m] = lejos
+        ciclo = dos_opt(ruta + [m], extendida)
+        k = ciclo.index(m)
+        ruta = ciclo[k + 1:] + ciclo[:k]
+        if origen and ruta[0] != 0:
+            ruta.reverse()
+
+    offset = 1 if origen else 0
+    orden = [x - offset for x in ruta if x >= offset]
+
+    tramos: list[float] = []
+    anterior = 0 if origen else None
+    for x in ruta[offset:]:
+        tramos.append(0.0 if anterior is None else float(dist[anterior, x]))
+        anterior = x
+    if volver and len(ruta) > 1:
+        tramos.append(float(dist[anterior, ruta[0]]))
+    return orden, tramos
@@ -0,0 +1,321 @@
+# services/reportes.py
+"""
+Rollups diarios de ventas (models.VentaDiaria*) y consultas de /reportes.
+
+Cada alta o cambio de estado de pedidos aplica su aporte a los tres rollups
+con un upsert incremental (fila += delta), dentro del mismo trabajo de
+escritura que toca los pedidos: el rollup nunca queda desfasado.
+
+    alta:              contabilizar(db, ids)
+    cambio de estado:  mover_estado(db, ids, anterior, nuevo)
+
+reconstruir() los rearma desde pedidos para un rango (backfill, o después
+de tocar pedidos a mano): scripts/reconstruir_reportes.py.
+
+Los reportes leen sólo los rollups (una fila por día × clave), así un mes
+se responde igual de rápido con mil o con un millón de pedidos.
+"""
+import os
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import case, delete, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+import models
+
+# Los días del reporte son locales (Argentina, UTC-3); fecha_creacion es UTC
+UTC_OFFSET_HORAS = int(os.getenv("REPORTES_UTC_OFFSET_HORAS", "-3"))
+# Pedidos por query al contabilizar / reconstruir
+LOTE = 2000
+
+ROLLUPS = (models.VentaDiaria, models.VentaDiariaProducto, models.VentaDiariaCliente)
+
+
+def dia_local(fecha_utc: datetime) -> date:
+    return (fecha_utc + timedelta(hours=UTC_OFFSET_HORAS)).date()
+
+
+def hoy_local() -> date:
+    return dia_local(datetime.utcnow())
+
+
+def inicio_dia_utc(dia: date) -> datetime:
+    return datetime.combine(dia, time()) - timedelta(hours=UTC_OFFSET_HORAS)
+
+
+# ---------------------------------------------------------------------
+# Actualización incremental
+# ---------------------------------------------------------------------
+def contabilizar(
+    db: Session,
+    pedido_ids: list[int],
+    signo: int = 1,
+    estado: str | None = None,
+) -> None:
+    """
+    Suma (signo=1) o resta (signo=-1) el aporte de los pedidos a los
+    rollups. `estado` pisa el estado leído de la base (para restar con el
+    estado anterior cuando el pedido ya cambió en la sesión). Sin commit.
+    """
+    _aplicar(db, pedido_ids, [(signo, estado)])
+
+
+def mover_estado(db: Session, pedido_ids: list[int], anterior: str, nuevo: str) -> None:
+    """
+    Pasa el aporte de los pedidos de `anterior` a `nuevo` (una lectura y un
+    upsert por rollup). Sin commit.
+    """
+    if anterior != nuevo:
+        _aplicar(db, pedido_ids, [(-1, anterior), (1, nuevo)])
+
+
+def _aplicar(db: Session, pedido_ids: list[int], movimientos: list[tuple[int, str | None]]) -> None:
+    ids = list(dict.fromkeys(pedido_ids))
+    for inicio in range(0, len(ids), LOTE):
+        _aplicar_lote(db, ids[inicio:inicio + LOTE], movimientos)
+
+
+def _aplicar_lote(db: Session, ids: list[int], movimientos: list[tuple[int, str | None]]) -> None:
+    P, I = models.Pedido, models.PedidoItem
+    cabeceras = db.execute(
+        select(
+            P.id, P.fecha_creacion, P.canal, P.cliente_id, P.estado,
+            P.total_bruto_cent, P.total_descuento_cent, P.total_neto_cent,
+        ).where(P.id.in_(ids))
+    ).all()
+    if not cabeceras:
+        return
+    # Una fila por pedido × producto: cuenta como un pedido para el producto
+    items = db.execute(
+        select(I.pedido_id, I.producto_id, func.sum(I.cantidad), func.sum(I.subtotal_cent))
+        .where(I.pedido_id.in_(ids))
+        .group_by(I.pedido_id, I.producto_id)
+    ).all()
+
+    unidades_pedido: dict[int, int] = defaultdict(int)
+    items_pedido: dict[int, list] = defaultdict(list)
+    for pedido_id, producto_id, unidades, total in items:
+        unidades_pedido[pedido_id] += unidades or 0
+        items_pedido[pedido_id].append((producto_id, unidades or 0, total or 0))
+
+    ventas: dict[tuple, list[int]] = defaultdict(lambda: [0] * 5)
+    por_producto: dict[tuple, list[int]] = defaultdict(lambda: [0] * 3)
+    por_cliente: dict[tuple, list[int]] = defaultdict(lambda: [0] * 4)
+
+    for c in cabeceras:
+        fecha = dia_local(c.fecha_creacion)
+        unidades = unidades_pedido[c.id]
+        for signo, estado in movimientos:
+            estado = estado or c.estado
+            _sumar(ventas[(fecha, c.canal, estado)], signo, 1, unidades,
+                   c.total_bruto_cent, c.total_descuento_cent, c.total_neto_cent)
+            _sumar(por_cliente[(fecha, c.cliente_id, estado)], signo, 1, unidades,
+                   c.total_bruto_cent, c.total_neto_cent)
+            for producto_id, cantidad, total in items_pedido[c.id]:
+                _sumar(por_producto[(fecha, producto_id, estado)], signo, 1, cantidad, total)
+
+    _upsert(db, models.VentaDiaria, ("fecha", "canal", "estado"),
+            ("pedidos", "unidades", "total_bruto_cent", "total_descuento_cent", "total_neto_cent"), ventas)
+    _upsert(db, models.VentaDiariaProducto, ("fecha", "producto_id", "estado"),
+            ("pedidos", "unidades", "total_cent"), por_producto)
+    _upsert(db, models.VentaDiariaCliente, ("fecha", "cliente_id", "estado"),
+            ("pedidos", "unidades", "total_bruto_cent", "total_neto_cent"), por_cliente)
+
+
+def _sumar(acumulado: list[int], signo: int, *valores: int | None) -> None:
+    for i, v in enumerate(valores):
+        acumulado[i] += signo * (v or 0)
+
+
+def _upsert(db: Session, modelo, claves: tuple[str, ...], columnas: tuple[str, ...], deltas: dict) -> None:
+    """
+    INSERT ... ON CONFLICT (claves) DO UPDATE SET col = col + excluded.col,
+    una sentencia (executemany) por rollup.
+    """
+    filas = [
+        {**dict(zip(claves, clave)), **dict(zip(columnas, valores))}
+        for clave, valores in deltas.items()
+        if any(valores)  # +1/-1 del mismo pedido en la misma clave se anulan
+    ]
+    if not filas:
+        return
+
+    tabla = modelo.__table__
+    dialecto = db.get_bind().dialect.name
+    if dialecto == "sqlite":
+        stmt = sqlite.insert(tabla)
+    elif dialecto == "postgresql":
+        stmt = postgresql.insert(tabla)
+    else:
+        raise RuntimeError(f"Rollups de reportes no soportados para {dialecto}")
+
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(claves),
+        set_={c: tabla.c[c] + stmt.excluded[c] for c in columnas},
+    )
+    db.execute(stmt, filas)
+
+
+# ---------------------------------------------------------------------
+# Reconstrucción (backfill)
+# ---------------------------------------------------------------------
+def reconstruir(db: Session, desde: date | None = None, hasta: date | None = None) -> int:
+    """
+    Borra los rollups del rango [desde, hasta] (días locales; None = sin
+    límite) y los vuelve a calcular desde pedidos. Devuelve la cantidad de
+    pedidos contabilizados. Sin commit: conviene una sola transacción para
+    que los reportes nunca vean el rango a medio armar.
+    """
+    filtros = []
+    for modelo in ROLLUPS:
+        borrar = delete(modelo)
+        if desde:
+            borrar = borrar.where(modelo.fecha >= desde)
+        if hasta:
+            borrar = borrar.where(modelo.fecha <= hasta)
+        db.execute(borrar)
+
+    if desde:
+        filtros.append(models.Pedido.fecha_creacion >= inicio_dia_utc(desde))
+    if hasta:
+        filtros.append(models.Pedido.fecha_creacion < inicio_dia_utc(hasta + timedelta(days=1)))
+
+    ids = db.scalars(select(models.Pedido.id).where(*filtros).order_by(models.Pedido.id)).all()
+    contabilizar(db, ids)
+    return len(ids)
+
+
+# ---------------------------------------------------------------------
+# Consultas (/reportes)
+# ---------------------------------------------------------------------
+def _filtros(modelo, desde: date, hasta: date, incluir_cancelados: bool) -> list:
+    filtros = [modelo.fecha >= desde, modelo.fecha <= hasta]
+    if not incluir_cancelados:
+        filtros.append(modelo.estado != "CANCELADO")
+    return filtros
+
+
+AGRUPACIONES_VENTAS = {
+    "dia": ("fecha",),
+    "canal": ("canal",),
+    "estado": ("estado",),
+    "dia_canal": ("fecha", "canal"),
+    "total": (),
+}
+
+
+def ventas(
+    db: Session,
+    desde: date,
+    hasta: date,
+    agrupar: str = "dia",
+    canal: str | None = None,
+    incluir_cancelados: bool = False,
+) -> list[dict]:
+    V = models.VentaDiaria
+    grupo = [getattr(V, c) for c in AGRUPACIONES_VENTAS[agrupar]]
+    query = (
+        select(
+            *grupo,
+            func.sum(V.pedidos).label("pedidos"),
+            func.sum(V.unidades).label("unidades"),
+            func.sum(V.total_bruto_cent).label("total_bruto_cent"),
+            func.sum(V.total_descuento_cent).label("total_descuento_cent"),
+            func.sum(V.total_neto_cent).label("total_neto_cent"),
+        )
+        .where(*_filtros(V, desde, hasta, incluir_cancelados))
+        .group_by(*grupo)
+        .having(func.sum(V.pedidos) > 0)
+        .order_by(*grupo)
+    )
+    if canal:
+        query = query.where(V.canal == canal)
+    return [dict(fila._mapping) for fila in db.execute(query)]
+
+
+def productos(
+    db: Session,
+    desde: date,
+    hasta: date,
+    orden: str = "total",
+    limit: int = 50,
+    incluir_cancelados: bool = False,
+) -> list[dict]:
+    V, P = models.VentaDiariaProducto, models.Producto
+    unidades = func.sum(V.unidades).label("unidades")
+    total = func.sum(V.total_cent).label("total_cent")
+    query = (
+        select(
+            V.producto_id, P.codigo, P.nombre,
+            func.sum(V.pedidos).label("pedidos"), unidades, total,
+        )
+        .join(P, P.id == V.producto_id)
+        .where(*_filtros(V, desde, hasta, incluir_cancelados))
+        .group_by(V.producto_id, P.codigo, P.nombre)
+        .having(func.sum(V.pedidos) > 0)
+        .order_by((unidades if orden == "unidades" else total).desc(), V.producto_id)
+        .limit(limit)
+    )
+    return [dict(fila._mapping) for fila in db.execute(query)]
+
+
+def clientes(
+    db: Session,
+    desde: date,
+    hasta: date,
+    limit: int = 50,
+    vendedor: str | None = None,
+    incluir_cancelados: bool = False,
+) -> list[dict]:
+    V, C = models.VentaDiariaCliente, models.Cliente
+    neto = func.sum(V.total_neto_cent).label("total_neto_cent")
+    query = (
+        select(
+            V.cliente_id, C.numero_cliente, C.nombre, C.vendedor,
+            func.sum(V.pedidos).label("pedidos"),
+            func.sum(V.unidades).label("unidades"),
+            func.sum(V.total_bruto_cent).label("total_bruto_cent"),
+            neto,
+        )
+        .join(C, C.id == V.cliente_id)
+        .where(*_filtros(V, desde, hasta, incluir_cancelados))
+        .group_by(V.cliente_id, C.numero_cliente, C.nombre, C.vendedor)
+        .having(func.sum(V.pedidos) > 0)
+        .order_by(neto.desc(), V.cliente_id)
+        .limit(limit)
+    )
+    if vendedor:
+        query = query.where(C.vendedor == vendedor)
+    return [dict(fila._mapping) for fila in db.execute(query)]
+
+
+def vendedores(
+    db: Session,
+    desde: date,
+    hasta: date,
+    incluir_cancelados: bool = False,
+) -> list[dict]:
+    """
+    Por vendedor actual del cliente (clientes.vendedor).
+    """
+    V, C = models.VentaDiariaCliente, models.Cliente
+    neto = func.sum(V.total_neto_cent).label("total_neto_cent")
+    query = (
+        select(
+            C.vendedor,
+            # las filas que quedaron en 0 (pedido que cambió de estado) no cuentan
+            func.count(func.distinct(case((V.pedidos > 0, V.cliente_id)))).label("clientes"),
+            func.sum(V.pedidos).label("pedidos"),
+            func.sum(V.unidades).label("unidades"),
+            func.sum(V.total_bruto_cent).label("total_bruto_cent"),
+            neto,
+        )
+        .join(C, C.id == V.cliente_id)
+        .where(*_filtros(V, desde, hasta, incluir_cancelados))
+        .group_by(C.vendedor)
+        .having(func.sum(V.pedidos) > 0)
+        .order_by(neto.desc())
+    )
+    return [dict(fila._mapping) for fila in db.execute(query)]
@@ -0,0 +1,71 @@
+# services/secuencias.py
+"""
+Numeradores atómicos sobre la tabla `secuencias`.
+
+siguiente() hace UPDATE valor = valor + 1 ... RETURNING valor: una sola
+sentencia por PK, sin leer MAX() de la tabla numerada y sin que dos altas
+concurrentes obtengan el mismo número (el UPDATE serializa a los escritores).
+"""
+from sqlalchemy import func, select, update
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+import models
+
+NUMERO_CLIENTE = "numero_cliente"
+
+# Secuencia -> columna que numera (para inicializarla desde los datos existentes)
+_COLUMNAS = {
+    NUMERO_CLIENTE: models.Cliente.numero_cliente,
+}
+
+
+def _maximo_actual(db: Session, nombre: str) -> int:
+    columna = _COLUMNAS.get(nombre)
+    if columna is None:
+        return 0
+    return db.scalar(select(func.max(columna))) or 0
+
+
+def inicializar_secuencias(engine: Engine) -> None:
+    """
+    Crea (al arrancar) las filas que falten, partiendo del máximo ya usado.
+    """
+    with Session(engine) as db:
+        for nombre in _COLUMNAS:
+            if db.get(models.Secuencia, nombre) is None:
+                db.add(models.Secuencia(nombre=nombre, valor=_maximo_actual(db, nombre)))
+        db.commit()
+
+
+def siguiente(db: Session, nombre: str) -> int:
+    """
+    Reserva y devuelve el próximo número, dentro de la transacción actual.
+    """
+    valor = db.scalar(
+        update(models.Secuencia)
+        .where(models.Secuencia.nombre == nombre)
+        .values(valor=models.Secuencia.valor + 1)
+        .returning(models.Secuencia.valor)
+    )
+    if valor is None:  # secuencia nueva (inicializar_secuencias no corrió)
+        valor = _maximo_actual(db, nombre) + 1
+        db.add(models.Secuencia(nombre=nombre, valor=valor))
+        db.flush()
+    return valor
+
+
+def ajustar_minimo(db: Session, nombre: str) -> None:
+    """
+    Lleva la secuencia al máximo de la columna si quedó atrás (por ejemplo,
+    después de importar clientes con su numero_cliente del archivo).
+    """
+    maximo = _maximo_actual(db, nombre)
+    res = db.execute(
+        update(models.Secuencia)
+        .where(models.Secuencia.nombre == nombre, models.Secuencia.valor < maximo)
+        .values(valor=maximo)
+    )
+    if res.rowcount == 0 and db.get(models.Secuencia, nombre) is None:
+        db.add(models.Secuencia(nombre=nombre, valor=maximo))
+        db.flush()
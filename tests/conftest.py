@@ -0,0 +1,79 @@
+# tests/conftest.py
+import atexit
+import os
+import shutil
+import sys
+import tempfile
+
+# Base SQLite descartable en un directorio temporal: la ven tanto el engine
+# sync como el async (aiosqlite) de las rutas /bot. En memoria no sirve: el
+# pool de SQLite en memoria es de una conexión por hilo y el TestClient usa
+# varios. Tiene que estar antes de importar la app.
+_DIR = tempfile.mkdtemp(prefix="nortsur-tests-")
+atexit.register(shutil.rmtree, _DIR, ignore_errors=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{_DIR}/nortsur.db"
+os.environ["SQLITE_PERFIL"] = "basico"
+os.environ["ESCRITOR_GRUPAL"] = "0"
+
+# Asegurar imports desde la raíz del proyecto (donde vive main.py)
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if APP_DIR not in sys.path:
+    sys.path.insert(0, APP_DIR)
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import delete  # noqa: E402
+
+import models  # noqa: E402
+from database import SessionLocal  # noqa: E402
+from main import app  # noqa: E402
+from services.catalogo import bump_version  # noqa: E402
+
+# Se conservan entre tests: la versión del catálogo y las secuencias sólo avanzan
+_PERSISTENTES = {models.CatalogoVersion.__table__, models.Secuencia.__table__}
+
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture(autouse=True)
+def base_limpia():
+    yield
+    with SessionLocal() as session:
+        for tabla in reversed(models.Base.metadata.sorted_tables):
+            if tabla not in _PERSISTENTES:
+                session.execute(delete(tabla))
+        bump_version(session)  # la foto del catálogo en memoria queda vieja
+        session.commit()
+
+
+@pytest.fixture
+def client():
+    with TestClient(app) as c:
+        yield c
+
+
+@pytest.fixture
+def producto(db):
+    def crear(codigo: str, precio_centavos: int, nombre: str | None = None) -> models.Producto:
+        p = models.Producto(codigo=codigo, nombre=nombre or f"Producto {codigo}", precio_centavos=precio_centavos)
+        db.add(p)
+        bump_version(db)
+        db.commit()
+        db.refresh(p)
+        return p
+
+    return crear
+
+
+@pytest.fixture
+def cliente(client):
+    def crear(nombre: str = "Almacén Don Pepe", telefono: str = "11 3320-3652") -> dict:
+        r = client.post("/clientes/", json={"nombre": nombre, "telefono": telefono})
+        assert r.status_code == 200, r.text
+        return r.json()
+
+    return crear
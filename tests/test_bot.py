@@ -0,0 +1,63 @@
+# tests/test_bot.py
+WA_PHONE = "5491133203652"  # mismo número que "11 3320-3652"
+
+
+def test_from_whatsapp_codigo_vacio_es_422(client, cliente, producto):
+    cliente()
+    producto("A1", 1000)
+
+    for codigo in ("", "   "):
+        r = client.post(
+            "/bot/pedidos/from-whatsapp",
+            json={"wa_phone": WA_PHONE, "items": [{"codigo": codigo, "cantidad": 3}]},
+        )
+        assert r.status_code == 422, r.text
+
+
+def test_from_whatsapp_resuelve_todos_los_codigos(client, cliente, producto):
+    c = cliente()
+    producto("A1", 1000)
+    producto("B2", 250)
+
+    r = client.post(
+        "/bot/pedidos/from-whatsapp",
+        json={"wa_phone": WA_PHONE, "items": [{"codigo": "A1", "cantidad": 2}, {"codigo": " B2 ", "cantidad": 4}]},
+    )
+
+    assert r.status_code == 200, r.text
+    pedido = client.get(f"/pedidos/{r.json()['pedido_id']}").json()
+    assert pedido["cliente_id"] == c["id"]
+    assert [(i["cantidad"], i["precio_unitario_cent"]) for i in pedido["items"]] == [(2, 1000), (4, 250)]
+    assert pedido["total_neto_cent"] == 3000
+
+
+def test_from_whatsapp_codigo_inexistente_es_404(client, cliente, producto):
+    c = cliente()
+    producto("A1", 1000)
+
+    r = client.post(
+        "/bot/pedidos/from-whatsapp",
+        json={"wa_phone": WA_PHONE, "items": [{"codigo": "A1", "cantidad": 1}, {"codigo": "ZZ", "cantidad": 1}]},
+    )
+
+    assert r.status_code == 404
+    assert r.json()["detail"] == "Producto con código 'ZZ' no encontrado"
+    assert client.get("/pedidos/", params={"cliente_id": c["id"]}).json() == []
+
+
+def test_pedido_mezcla_producto_id_y_codigo(client, cliente, producto):
+    c = cliente()
+    a = producto("A1", 1000)
+    producto("B2", 250)
+
+    r = client.post(
+        "/pedidos/",
+        json={
+            "cliente_id": c["id"],
+            "canal": "web",
+            "items": [{"producto_id": a.id, "cantidad": 1}, {"codigo": "B2", "cantidad": 2}],
+        },
+    )
+
+    assert r.status_code == 200, r.text
+    assert r.json()["total_neto_cent"] == 1500
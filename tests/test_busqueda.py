@@ -0,0 +1,25 @@
+# tests/test_busqueda.py
+from services.busqueda import fts_query
+
+
+def test_fts_query_palabras_cortas_van_por_ilike():
+    assert fts_query("panch dob") == '"panch"* "dob"*'
+    assert fts_query("a") is None
+    assert fts_query("don pe") is None
+
+
+def test_busqueda_por_prefijo_y_subcadena_corta(client, cliente, producto):
+    c = cliente(nombre="Almacén Don Pepe")
+    producto("A1", 1000)
+    client.post("/pedidos/", json={"cliente_id": c["id"], "canal": "web", "items": [{"codigo": "A1", "cantidad": 1}]})
+
+    for q in ("almacen", "pep", "ma", "ep"):  # las dos últimas, mitad de palabra
+        assert [x["id"] for x in client.get("/clientes/", params={"q": q}).json()] == [c["id"]], q
+        assert len(client.get("/pedidos/", params={"q": q}).json()) == 1, q
+
+
+def test_relevancia_no_acepta_cursor(client, cliente):
+    cliente()
+    for ruta in ("/clientes/", "/productos/"):
+        r = client.get(ruta, params={"q": "pepe", "orden": "relevancia", "cursor": "eyJpZCI6OX0"})
+        assert r.status_code == 400, (ruta, r.text)
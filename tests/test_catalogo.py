@@ -0,0 +1,38 @@
+# tests/test_catalogo.py
+def test_precio_editado_se_cobra_en_el_siguiente_pedido(client, cliente, producto):
+    c = cliente()
+    p = producto("A1", 1000)
+    body = {"cliente_id": c["id"], "canal": "web", "items": [{"codigo": "A1", "cantidad": 2}]}
+
+    # Primer pedido: deja el catálogo cargado en el cache del proceso
+    antes = client.post("/pedidos/", json=body)
+    assert antes.json()["items"][0]["precio_unitario_cent"] == 1000
+
+    r = client.patch(f"/productos/{p.id}", json={"precio_centavos": 1500})
+    assert r.status_code == 200, r.text
+
+    despues = client.post("/pedidos/", json=body)
+    assert despues.status_code == 200, despues.text
+    assert despues.json()["items"][0]["precio_unitario_cent"] == 1500
+    assert despues.json()["total_neto_cent"] == 3000
+
+
+def test_producto_desactivado_no_se_puede_pedir(client, cliente, producto):
+    c = cliente()
+    p = producto("A1", 1000)
+    body = {"cliente_id": c["id"], "canal": "web", "items": [{"codigo": "A1", "cantidad": 1}]}
+    assert client.post("/pedidos/", json=body).status_code == 200
+
+    client.patch(f"/productos/{p.id}", json={"activo": False})
+
+    assert client.post("/pedidos/", json=body).status_code >= 400
+
+
+def test_listado_desde_el_cache_ve_la_edicion(client, producto):
+    p = producto("A1", 1000, nombre="Pan de pancho")
+    assert client.get("/productos/").json()[0]["precio_centavos"] == 1000  # carga el cache
+
+    client.patch(f"/productos/{p.id}", json={"nombre": "Pan de pancho x12", "precio_centavos": 1200})
+
+    fila = client.get("/productos/").json()[0]
+    assert (fila["nombre"], fila["precio_centavos"]) == ("Pan de pancho x12", 1200)
@@ -0,0 +1,45 @@
+# tests/test_clientes.py
+import pytest
+
+from services.clientes_services import find_cliente_by_phone
+
+CELDA = "11 3320-3652 / 1154659954"
+
+
+@pytest.mark.parametrize(
+    "telefono",
+    [
+        "11 3320-3652",
+        "+54 9 11 3320-3652",
+        "5491133203652",
+        "(011) 3320.3652",
+        "1154659954",
+        "+54 11 5465-9954",
+    ],
+)
+def test_by_phone_con_numeros_formateados(client, cliente, telefono):
+    c = cliente(telefono=CELDA)
+
+    r = client.get(f"/clientes/by-phone/{telefono}")
+
+    assert r.status_code == 200, r.text
+    assert r.json()["id"] == c["id"]
+
+
+def test_find_cliente_by_phone_resuelve_cualquier_numero_de_la_celda(db, cliente):
+    c = cliente(nombre="Kiosco Micaela", telefono="Micaela: 11 6875-4076   11 5157-9683")
+
+    for telefono in ("1168754076", "11 5157 9683", "+5491151579683"):
+        encontrado = find_cliente_by_phone(db, telefono)
+        assert encontrado is not None and encontrado.id == c["id"], telefono
+
+    assert find_cliente_by_phone(db, "11 0000-0000") is None
+    assert find_cliente_by_phone(db, "") is None
+
+
+def test_no_se_crea_otro_cliente_con_un_telefono_ya_cargado(client, cliente):
+    cliente(telefono=CELDA)
+
+    r = client.post("/clientes/", json={"nombre": "Otro", "telefono": "+54 9 11 5465-9954"})
+
+    assert r.status_code == 400
@@ -0,0 +1,181 @@
+# tests/test_idempotencia.py
+import os
+import runpy
+import sqlite3
+
+import services.pedidos_services as pedidos_services
+from database import engine
+
+WA_PHONE = "5491133203652"  # mismo número que "11 3320-3652"
+
+
+def _pedido(cliente_id: int, ref: str | None = None, codigo: str = "A1", cantidad: int = 1) -> dict:
+    return {
+        "cliente_id": cliente_id,
+        "canal": "web",
+        "items": [{"codigo": codigo, "cantidad": cantidad}],
+        "origen_referencia": ref,
+    }
+
+
+def _contar_pedidos(client, cliente_id: int) -> int:
+    return len(client.get("/pedidos/", params={"cliente_id": cliente_id}).json())
+
+
+def test_from_whatsapp_reintento_devuelve_el_mismo_pedido(client, cliente, producto):
+    c = cliente()
+    producto("A1", 1000)
+    body = {
+        "wa_phone": WA_PHONE,
+        "items": [{"codigo": "A1", "cantidad": 2}],
+        "mensaje_id": "wamid.123",
+    }
+
+    primero = client.post("/bot/pedidos/from-whatsapp", json=body)
+    segundo = client.post("/bot/pedidos/from-whatsapp", json=body)
+
+    assert primero.status_code == 200, primero.text
+    assert segundo.status_code == 200, segundo.text
+    assert primero.json()["duplicado"] is False
+    assert segundo.json()["duplicado"] is True
+    assert segundo.json()["pedido_id"] == primero.json()["pedido_id"]
+    assert segundo.json()["cliente_id"] == c["id"]
+
+    pedidos = client.get("/pedidos/", params={"cliente_id": c["id"]}).json()
+    assert len(pedidos) == 1
+
+
+def test_crear_con_origen_referencia_es_idempotente(client, cliente, producto):
+    c = cliente()
+    producto("A1", 1000)
+
+    primero = client.post("/pedidos/", json=_pedido(c["id"], "planilla:1"))
+    segundo = client.post("/pedidos/", json=_pedido(c["id"], "planilla:1", cantidad=5))
+
+    assert primero.status_code == 200, primero.text
+    assert segundo.status_code == 200, segundo.text
+    assert segundo.json()["id"] == primero.json()["id"]
+    assert segundo.json()["items"][0]["cantidad"] == 1  # no se recalcula con el reintento
+    assert _contar_pedidos(client, c["id"]) == 1
+
+
+def test_bulk_referencia_existente_o_repetida_es_409(client, cliente, producto):
+    c = cliente()
+    producto("A1", 1000)
+    existente = client.post("/pedidos/", json=_pedido(c["id"], "planilla:1")).json()
+
+    r = client.post(
+        "/pedidos/bulk",
+        json={
+            "modo": "mejor_esfuerzo",
+            "pedidos": [
+                _pedido(c["id"], "planilla:1"),
+                _pedido(c["id"], "planilla:2"),
+                _pedido(c["id"], "planilla:2"),
+            ],
+        },
+    )
+
+    assert r.status_code == 200, r.text
+    res = r.json()["resultados"]
+    assert [x["ok"] for x in res] == [False, True, False]
+    assert res[0]["status_code"] == 409
+    assert f"#{existente['id']}" in res[0]["error"]
+    assert res[2]["status_code"] == 409
+    assert _contar_pedidos(client, c["id"]) == 2
+
+
+def test_bulk_todo_o_nada_con_referencia_repetida_no_crea_nada(client, cliente, producto):
+    c = cliente()
+    producto("A1", 1000)
+
+    r = client.post(
+        "/pedidos/bulk",
+        json={"pedidos": [_pedido(c["id"], "planilla:1"), _pedido(c["id"], "planilla:1")]},
+    )
+
+    assert r.status_code == 200, r.text
+    assert r.json()["creados"] == 0
+    assert r.json()["resultados"][1]["status_code"] == 409
+    assert _contar_pedidos(client, c["id"]) == 0
+
+
+def _snapshot_viejo(monkeypatch):
+    """
+    Simula que otro request creó el pedido entre la validación y el commit:
+    la primera lectura de referencias no ve lo que ya está en la base.
+    """
+    real = pedidos_services._referencias_tomadas
+    llamadas = []
+
+    def leer(db, pedidos_in):
+        llamadas.append(1)
+        return {} if len(llamadas) == 1 else real(db, pedidos_in)
+
+    monkeypatch.setattr(pedidos_services, "_referencias_tomadas", leer)
+
+
+def test_bulk_carrera_de_referencia_todo_o_nada_es_409(client, cliente, producto, monkeypatch):
+    c = cliente()
+    producto("A1", 1000)
+    client.post("/pedidos/", json=_pedido(c["id"], "planilla:1"))
+    _snapshot_viejo(monkeypatch)
+
+    r = client.post(
+        "/pedidos/bulk",
+        json={"pedidos": [_pedido(c["id"], "planilla:2"), _pedido(c["id"], "planilla:1")]},
+    )
+
+    assert r.status_code == 409, r.text
+    assert "planilla:1" in r.json()["detail"]
+    assert _contar_pedidos(client, c["id"]) == 1
+
+
+def test_bulk_carrera_de_referencia_mejor_esfuerzo_marca_el_item(client, cliente, producto, monkeypatch):
+    c = cliente()
+    producto("A1", 1000)
+    client.post("/pedidos/", json=_pedido(c["id"], "planilla:1"))
+    _snapshot_viejo(monkeypatch)
+
+    r = client.post(
+        "/pedidos/bulk",
+        json={
+            "modo": "mejor_esfuerzo",
+            "pedidos": [_pedido(c["id"], "planilla:2"), _pedido(c["id"], "planilla:1")],
+        },
+    )
+
+    assert r.status_code == 200, r.text
+    res = r.json()["resultados"]
+    assert res[0]["ok"] is True
+    assert res[1]["ok"] is False and res[1]["status_code"] == 409
+    assert _contar_pedidos(client, c["id"]) == 2
+
+
+def test_la_base_de_la_app_tiene_el_indice_unico():
+    assert pedidos_services.verificar_referencia_unica(engine) is True
+
+
+def test_migracion_resuelve_referencias_repetidas(tmp_path, monkeypatch):
+    ruta = tmp_path / "vieja.db"
+    conn = sqlite3.connect(ruta)
+    conn.execute("CREATE TABLE pedidos (id INTEGER PRIMARY KEY, origen_referencia VARCHAR)")
+    conn.execute("CREATE INDEX ix_pedidos_origen_referencia ON pedidos (origen_referencia)")
+    conn.executemany(
+        "INSERT INTO pedidos VALUES (?, ?)",
+        [(1, "whatsapp:a"), (2, "whatsapp:a"), (3, None), (4, None), (5, "whatsapp:b")],
+    )
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setenv("SQLITE_PATH", str(ruta))
+    script = os.path.join(os.path.dirname(os.path.dirname(__file__)), "scripts", "migrate_sqlite_origen_referencia_unica.py")
+    runpy.run_path(script, run_name="__main__")
+
+    conn = sqlite3.connect(ruta)
+    assert conn.execute("SELECT id, origen_referencia FROM pedidos ORDER BY id").fetchall() == [
+        (1, "whatsapp:a"), (2, "whatsapp:a#dup-2"), (3, None), (4, None), (5, "whatsapp:b"),
+    ]
+    indices = {fila[1]: fila[2] for fila in conn.execute("PRAGMA index_list(pedidos)")}
+    assert indices["ix_pedidos_origen_referencia"] == 1  # UNIQUE
+    conn.close()
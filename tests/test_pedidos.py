@@ -0,0 +1,46 @@
+# tests/test_pedidos.py
+from sqlalchemy import event, update
+
+import models
+from database import engine
+
+
+def _pedido(cliente_id: int, ref: str | None = None, codigo: str = "A1", cantidad: int = 1) -> dict:
+    return {
+        "cliente_id": cliente_id,
+        "canal": "web",
+        "items": [{"codigo": codigo, "cantidad": cantidad}],
+        "origen_referencia": ref,
+    }
+
+
+def test_estado_bulk_no_pisa_un_cambio_concurrente(client, cliente, producto):
+    c = cliente()
+    producto("A1", 1000)
+    a = client.post("/pedidos/", json=_pedido(c["id"])).json()["id"]
+    b = client.post("/pedidos/", json=_pedido(c["id"])).json()["id"]
+
+    # Otro request confirma `a` después de la lectura de validación y antes del UPDATE
+    pendiente = [True]
+
+    def confirmar_a(conn, cursor, statement, parameters, context, executemany):
+        if pendiente and statement.startswith("UPDATE pedidos SET estado"):
+            pendiente.clear()
+            with engine.begin() as otra:
+                otra.execute(update(models.Pedido).where(models.Pedido.id == a).values(estado="CONFIRMADO"))
+
+    event.listen(engine, "before_cursor_execute", confirmar_a)
+    try:
+        r = client.post("/pedidos/estado/bulk", json={"ids": [a, b], "estado": "CANCELADO"})
+    finally:
+        event.remove(engine, "before_cursor_execute", confirmar_a)
+
+    assert r.status_code == 200, r.text
+    res = {x["pedido_id"]: x for x in r.json()["resultados"]}
+    assert res[a]["ok"] is False
+    assert res[b]["ok"] is True and res[b]["estado_anterior"] == "NUEVO"
+
+    assert client.get(f"/pedidos/{a}").json()["estado"] == "CONFIRMADO"
+    assert client.get(f"/pedidos/{a}/eventos").json() == []
+    eventos_b = [e for e in client.get(f"/pedidos/{b}/eventos").json() if e["tipo"] == "estado"]
+    assert [(e["estado_anterior"], e["estado_nuevo"]) for e in eventos_b] == [("NUEVO", "CANCELADO")]
@@ -0,0 +1,78 @@
+# utils/geo.py
+import math
+import re
+
+# Precisión del geohash guardado en clientes.geocelda (6 ≈ celdas de 1,2 x 0,6 km)
+PRECISION_GEOCELDA = 6
+RADIO_TIERRA_KM = 6371.0088
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_NUMERO = re.compile(r"[-+]?\d+(?:\.\d+)?")
+
+
+def parse_coordenadas(texto: str | None) -> tuple[float, float] | None:
+    """
+    "-34.1647, -58.9606" -> (-34.1647, -58.9606). Acepta coma, punto y coma
+    o espacios como separador. None si no son dos números en rango.
+    """
+    numeros = _NUMERO.findall(texto or "")
+    if len(numeros) != 2:
+        return None
+    lat, lng = float(numeros[0]), float(numeros[1])
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180) or (lat == 0 and lng == 0):
+        return None
+    return lat, lng
+
+
+def geohash(lat: float, lng: float, precision: int = PRECISION_GEOCELDA) -> str:
+    """
+    Geohash estándar: clientes cercanos comparten prefijo, así que un índice
+    sobre la celda agrupa por zona (ej. LIKE '69y7p%').
+    """
+    lat_rango, lng_rango = [-90.0, 90.0], [-180.0, 180.0]
+    celda, bits, valor, par = [], 0, 0, True
+    while len(celda) < precision:
+        rango, v = (lng_rango, lng) if par else (lat_rango, lat)
+        medio = (rango[0] + rango[1]) / 2
+        valor <<= 1
+        if v >= medio:
+            valor |= 1
+            rango[0] = medio
+        else:
+            rango[1] = medio
+        par = not par
+        bits += 1
+        if bits == 5:
+            celda.append(_BASE32[valor])
+            bits, valor = 0, 0
+    return "".join(celda)
+
+
+def columnas_geo(coordenadas: str | None) -> dict:
+    """
+    Columnas derivadas de Cliente.coordenadas: lat, lng y geocelda (o None).
+    """
+    punto = parse_coordenadas(coordenadas)
+    if punto is None:
+        return {"lat": None, "lng": None, "geocelda": None}
+    lat, lng = punto
+    return {"lat": lat, "lng": lng, "geocelda": geohash(lat, lng)}
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * RADIO_TIERRA_KM * math.asin(math.sqrt(a))
+
+
+def caja_alrededor(lat: float, lng: float, radio_km: float) -> tuple[float, float, float, float]:
+    """
+    (lat_min, lat_max, lng_min, lng_max) que contiene el círculo de radio_km:
+    prefiltro por índice antes de la distancia exacta (haversine_km).
+    """
+    dlat = math.degrees(radio_km / RADIO_TIERRA_KM)
+    # Cerca de los polos la caja cubre todas las longitudes
+    cos_lat = math.cos(math.radians(min(abs(lat) + dlat, 90.0)))
+    dlng = 180.0 if cos_lat < 1e-6 else min(math.degrees(radio_km / (RADIO_TIERRA_KM * cos_lat)), 180.0)
+    return lat - dlat, lat + dlat, lng - dlng, lng + dlng
@@ -0,0 +1,69 @@
+# utils/paginacion.py
+import base64
+import json
+
+from fastapi import HTTPException, Response
+
+# Header con el cursor de la página siguiente (paginación keyset por id)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    """
+    Cursor opaco a partir del último id devuelto.
+    """
+    raw = json.dumps({"id": int(last_id)}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """
+    Devuelve el último id del cursor. Lanza ValueError si el cursor es inválido.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return int(data["id"])
+    except Exception as exc:  # base64, json, key o int inválidos
+        raise ValueError("cursor inválido") from exc
+
+
+def paginar(query, columna_id, limit: int, offset: int = 0, cursor: str | None = None):
+    """
+    Aplica orden por id descendente + paginación.
+    - Con cursor: keyset (id < último id), no recorre filas descartadas.
+    - Sin cursor: offset/limit de siempre (compatibilidad).
+    """
+    query = query.order_by(columna_id.desc())
+
+    if cursor:
+        try:
+            last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Cursor inválido")
+        return query.filter(columna_id < last_id).limit(limit)
+
+    return query.offset(offset).limit(limit)
+
+
+def paginar_lista(filas: list, limit: int, offset: int = 0, cursor: str | None = None) -> list:
+    """
+    Igual que paginar() pero sobre una lista en memoria ya ordenada por id desc
+    (por ejemplo, el cache de catálogo).
+    """
+    if cursor:
+        try:
+            last_id = decode_cursor(cursor)
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Cursor inválido")
+        return [f for f in filas if f.id < last_id][:limit]
+
+    return filas[offset:offset + limit]
+
+
+def set_next_cursor(response: Response, filas: list, limit: int) -> None:
+    """
+    Si la página vino llena, publica el cursor de la siguiente en X-Next-Cursor.
+    """
+    if filas and len(filas) >= limit:
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(filas[-1].id)
@@ -0,0 +1,105 @@
+# utils/streaming.py
+"""
+Respuestas en streaming (CSV, JSON o NDJSON) a partir de un iterable de
+filas (dicts): se serializa y se envía por bloques, sin armar la respuesta
+entera en memoria. Si el iterable es un generador que lee la base con
+yield_per, tampoco se cargan todas las filas.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Iterable, Iterator
+
+from fastapi.responses import StreamingResponse
+
+# Filas por bloque enviado
+BLOQUE = 500
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _json_default(valor):
+    if isinstance(valor, (datetime, date)):
+        return valor.isoformat()
+    if isinstance(valor, Decimal):
+        return float(valor)
+    raise TypeError(f"No serializable: {type(valor).__name__}")
+
+
+def _dumps(fila: dict) -> str:
+    return json.dumps(fila, ensure_ascii=False, default=_json_default, separators=(",", ":"))
+
+
+def csv_iter(columnas: list[str], filas: Iterable[dict | tuple]) -> Iterator[str]:
+    """
+    Las filas pueden ser dicts o tuplas ya en el orden de `columnas` (más
+    rápido para exports grandes: filas de SQLAlchemy tal cual).
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(columnas)
+    for i, fila in enumerate(filas, 1):
+        writer.writerow([fila.get(c) for c in columnas] if isinstance(fila, dict) else fila)
+        if i % BLOQUE == 0:
+            yield buf.getvalue()
+            buf.seek(0)
+            buf.truncate(0)
+    yield buf.getvalue()
+
+
+def json_iter(filas: Iterable[dict]) -> Iterator[str]:
+    """
+    Un array JSON válido, emitido por partes.
+    """
+    bloque = ["["]
+    for i, fila in enumerate(filas):
+        bloque.append(("," if i else "") + _dumps(fila))
+        if len(bloque) >= BLOQUE:
+            yield "".join(bloque)
+            bloque = []
+    bloque.append("]")
+    yield "".join(bloque)
+
+
+def ndjson_iter(filas: Iterable[dict]) -> Iterator[str]:
+    """
+    Una fila JSON por línea (el cliente puede procesar mientras descarga).
+    """
+    bloque = []
+    for fila in filas:
+        bloque.append(_dumps(fila) + "\n")
+        if len(bloque) >= BLOQUE:
+            yield "".join(bloque)
+            bloque = []
+    if bloque:
+        yield "".join(bloque)
+
+
+def respuesta_streaming(
+    filas: Iterable[dict],
+    formato: str,
+    columnas: list[str],
+    nombre_archivo: str | None = None,
+) -> StreamingResponse:
+    """
+    formato: "csv" | "json" | "ndjson". `columnas` define el encabezado y el
+    orden del CSV.
+    Con nombre_archivo se agrega Content-Disposition (descarga).
+    """
+    if formato == "csv":
+        cuerpo = csv_iter(columnas, filas)
+    elif formato == "ndjson":
+        cuerpo = ndjson_iter(filas)
+    else:
+        cuerpo = json_iter(filas)
+
+    headers = {}
+    if nombre_archivo:
+        headers["Content-Disposition"] = f'attachment; filename="{nombre_archivo}.{formato}"'
+    return StreamingResponse(cuerpo, media_type=MEDIA_TYPES[formato], headers=headers)
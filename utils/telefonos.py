@@ -1,4 +1,12 @@
 # utils/telefonos.py
+import re
+
+# Separadores habituales en las planillas: "11 3320-3652 / 1154659954",
+# "Micaela: 11 6875-4076   11 5157-9683", "11 3626-1235, 11 ..."
+_SEPARADORES = re.compile(r"[/,;|]|\s{2,}|\s+(?:y|o)\s+", re.IGNORECASE)
+_NUMERO = re.compile(r"\+?\d[\d\s().\-]*\d")
+MIN_DIGITOS = 8
+
 
 def normalize_phone(phone: str) -> str:
     """
@@ -9,3 +17,18 @@ def normalize_phone(phone: str) -> str:
     if len(digits) > 10:
         return digits[-10:]
     return digits
+
+
+def split_phones(phone: str | None) -> list[str]:
+    """
+    Separa una celda con varios teléfonos (y etiquetas tipo "mama:", "LOCAL")
+    en los fragmentos que parecen números, tal como vienen escritos.
+    """
+    partes: list[str] = []
+    for chunk in _SEPARADORES.split(phone or ""):
+        for m in _NUMERO.finditer(chunk):
+            raw = m.group().strip()
+            if sum(c.isdigit() for c in raw) >= MIN_DIGITOS:
+                partes.append(raw)
+    return partes
+
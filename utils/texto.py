@@ -0,0 +1,19 @@
+# utils/texto.py
+import re
+import unicodedata
+
+_ESPACIOS = re.compile(r"\s+")
+
+
+def normalizar_texto(texto: str | None) -> str:
+    """
+    Minúsculas, sin acentos y con espacios colapsados:
+    "  Ají  Picante " -> "aji picante". Base para claves de búsqueda.
+    """
+    if not texto:
+        return ""
+    if texto.isascii():  # camino rápido: no hay acentos que sacar
+        return _ESPACIOS.sub(" ", texto.lower()).strip()
+    nfkd = unicodedata.normalize("NFKD", texto)
+    sin_acentos = "".join(c for c in nfkd if not unicodedata.combining(c))
+    return _ESPACIOS.sub(" ", sin_acentos.lower()).strip()